@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # .env 파일 로드 (있는 경우)
@@ -12,6 +13,85 @@ API_CONFIG = {
     "DUR_API_BASE_URL": os.getenv("DUR_API_BASE_URL", "http://apis.data.go.kr/1471000/DURPrdlstInfoService03")
 }
 
+# OCR 설정 - 환경 변수에서 가져오기
+OCR_CONFIG = {
+    "UPSTAGE_OCR_URL": os.getenv("UPSTAGE_OCR_URL", "https://api.upstage.ai/v1/document-digitization"),
+    "OCR_CONNECT_TIMEOUT": float(os.getenv("OCR_CONNECT_TIMEOUT", "5")),
+    "OCR_READ_TIMEOUT": float(os.getenv("OCR_READ_TIMEOUT", "30")),
+    "OCR_POOL_SIZE": int(os.getenv("OCR_POOL_SIZE", "10")),
+    # OCR 엔진 선택 (upstage, tesseract) 및 엔진별 통계 표본 수
+    "OCR_ENGINE": os.getenv("OCR_ENGINE", "upstage"),
+    "OCR_TESSERACT_LANG": os.getenv("OCR_TESSERACT_LANG", "kor+eng"),
+    "OCR_STATS_WINDOW": int(os.getenv("OCR_STATS_WINDOW", "200")),
+    # 헤지 요청 (OCR_ENGINE=hedged) - 주 엔진이 지연시간 백분위 안에 응답하지 않으면 보조 엔진에도 요청
+    "OCR_HEDGE_PRIMARY": os.getenv("OCR_HEDGE_PRIMARY", "upstage"),
+    "OCR_HEDGE_SECONDARY": os.getenv("OCR_HEDGE_SECONDARY", "upstage"),
+    "OCR_HEDGE_PERCENTILE": float(os.getenv("OCR_HEDGE_PERCENTILE", "95")),
+    "OCR_HEDGE_MIN_DELAY": float(os.getenv("OCR_HEDGE_MIN_DELAY", "1.0")),
+    "OCR_HEDGE_MIN_SAMPLES": int(os.getenv("OCR_HEDGE_MIN_SAMPLES", "20")),
+    # 업로드 인코딩 (png, gray, binary, jpeg, webp)
+    "OCR_UPLOAD_FORMAT": os.getenv("OCR_UPLOAD_FORMAT", "jpeg"),
+    "OCR_UPLOAD_QUALITY": int(os.getenv("OCR_UPLOAD_QUALITY", "85")),
+    # 글자 높이에 맞춘 업로드 해상도 (최소 글자 높이 px, 긴 변 상한 px) - 끄면 1000x1000 이내로 축소
+    "OCR_ADAPTIVE_RESOLUTION": os.getenv("OCR_ADAPTIVE_RESOLUTION", "1") == "1",
+    "OCR_MIN_TEXT_HEIGHT": int(os.getenv("OCR_MIN_TEXT_HEIGHT", "20")),
+    "OCR_MAX_SIDE": int(os.getenv("OCR_MAX_SIDE", "3000")),
+    # JPEG 업로드를 디코딩할 최대 긴 변 px (draft 모드 축소 디코딩, 0이면 원본 해상도 - tiled 엔진용)
+    # draft는 1/2, 1/4, 1/8 배율만 있어 이 상한만으로는 4000x3000 사진도 원본 그대로 디코딩되므로,
+    # OCR_DECODE_ADAPTIVE이면 축소 디코딩한 미리보기로 글자 높이를 추정하여 업로드 해상도(글자 OCR_MIN_TEXT_HEIGHT px)까지만 디코딩
+    # (대신 신뢰도 낮은 단어 재인식 조각도 이 해상도에서 잘라 확대함 - 원본의 세부가 필요하면 0)
+    "OCR_DECODE_MAX_SIDE": int(os.getenv("OCR_DECODE_MAX_SIDE", "3000")),
+    "OCR_DECODE_ADAPTIVE": os.getenv("OCR_DECODE_ADAPTIVE", "1") == "1",
+    # 약품 표 영역만 잘라서 OCR (열 제목 포함 여부)
+    "OCR_ROI_CROP": os.getenv("OCR_ROI_CROP", "0") == "1",
+    "OCR_ROI_INCLUDE_HEADER": os.getenv("OCR_ROI_INCLUDE_HEADER", "1") == "1",
+    # 고해상도 스캔 타일 OCR (tiled 엔진 - 기본 엔진, 타일 크기/겹침 px, 동시 요청 수)
+    "OCR_TILE_ENGINE": os.getenv("OCR_TILE_ENGINE", "upstage"),
+    "OCR_TILE_SIZE": int(os.getenv("OCR_TILE_SIZE", "1600")),
+    "OCR_TILE_OVERLAP": int(os.getenv("OCR_TILE_OVERLAP", "200")),
+    "OCR_TILE_CONCURRENCY": int(os.getenv("OCR_TILE_CONCURRENCY", "4")),
+    # 약품 표의 신뢰도 낮은 단어만 확대하여 다시 OCR (기준 신뢰도, 최대 단어 수, 확대 후 글자 높이 px, 엔진 - 비우면 같은 엔진)
+    "OCR_REFINE_ENABLED": os.getenv("OCR_REFINE_ENABLED", "1") == "1",
+    "OCR_REFINE_THRESHOLD": float(os.getenv("OCR_REFINE_THRESHOLD", "0.8")),
+    "OCR_REFINE_MAX_WORDS": int(os.getenv("OCR_REFINE_MAX_WORDS", "8")),
+    "OCR_REFINE_TEXT_HEIGHT": int(os.getenv("OCR_REFINE_TEXT_HEIGHT", "48")),
+    "OCR_REFINE_ENGINE": os.getenv("OCR_REFINE_ENGINE", ""),
+    # OCR 전 품질 검사 (흐림/빛 반사/노출) - 거부 기준에 걸리면 OCR하지 않음
+    "OCR_QUALITY_GATE": os.getenv("OCR_QUALITY_GATE", "1") == "1",
+    # OCR 전 기울기 보정 (최대 탐색 각도, 보정할 최소 각도(도), 추정 시간 예산 ms)
+    "OCR_DESKEW": os.getenv("OCR_DESKEW", "1") == "1",
+    "OCR_DESKEW_MAX_ANGLE": float(os.getenv("OCR_DESKEW_MAX_ANGLE", "10")),
+    "OCR_DESKEW_MIN_ANGLE": float(os.getenv("OCR_DESKEW_MIN_ANGLE", "0.3")),
+    "OCR_DESKEW_BUDGET_MS": float(os.getenv("OCR_DESKEW_BUDGET_MS", "60")),
+    # 화면 미리보기 (표시 너비 px, 형식 webp/jpeg, 압축 품질) - 업로드 원본 대신 줄인 이미지를 브라우저로 전송
+    "PREVIEW_WIDTH": int(os.getenv("PREVIEW_WIDTH", "700")),
+    "PREVIEW_FORMAT": os.getenv("PREVIEW_FORMAT", "webp"),
+    "PREVIEW_QUALITY": int(os.getenv("PREVIEW_QUALITY", "80")),
+    # 의약품 제품 사전 인덱스 파일 (python drug_index.py 제품목록.csv 로 빌드, 없으면 사전 조회 생략)
+    "DRUG_INDEX_PATH": os.getenv("DRUG_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "drug_index.bin")),
+    # 자모 단위 약품명 유사 검색 (최대 편집 거리, 삭제 변형을 색인할 어간 앞 자모 수 - 0이면 전체)
+    "FUZZY_MAX_DISTANCE": int(os.getenv("FUZZY_MAX_DISTANCE", "2")),
+    "FUZZY_PREFIX_LENGTH": int(os.getenv("FUZZY_PREFIX_LENGTH", "9")),
+    # 약품명 추출 규칙 집합 버전 (medication_extraction/rules.py) - Streamlit/FastAPI 공용
+    "EXTRACTION_RULE_SET": os.getenv("EXTRACTION_RULE_SET", "v2"),
+    # 다중 페이지 문서(PDF/TIFF) 처리
+    "OCR_PDF_DPI": int(os.getenv("OCR_PDF_DPI", "200")),
+    "OCR_MAX_PAGES": int(os.getenv("OCR_MAX_PAGES", "50")),
+    "OCR_PAGE_CONCURRENCY": int(os.getenv("OCR_PAGE_CONCURRENCY", "4")),
+    # OCR 결과 디스크 캐시 (워커/세션 공유)
+    "OCR_CACHE_ENABLED": os.getenv("OCR_CACHE_ENABLED", "1") == "1",
+    "OCR_CACHE_PATH": os.getenv("OCR_CACHE_PATH", os.path.join(tempfile.gettempdir(), "prescription_ocr_cache.sqlite3")),
+    "OCR_CACHE_MAX_BYTES": int(os.getenv("OCR_CACHE_MAX_BYTES", str(200 * 1024 * 1024))),
+    "OCR_CACHE_TTL": float(os.getenv("OCR_CACHE_TTL", str(7 * 24 * 3600))),
+    # 다시 찍은 사진의 OCR/분석 결과 재사용 - 지각 해시 해밍 거리 한도 (0이면 사용 안 함)
+    # 주의: 같은 서식에서 약품 한 줄만 다른 처방전도 거리 2~4가 나올 수 있어 기본값은 비활성화
+    "OCR_SIMILAR_DISTANCE": int(os.getenv("OCR_SIMILAR_DISTANCE", "0")),
+}
+
 def get_api_keys():
     """API 키 반환"""
-    return API_CONFIG 
\ No newline at end of file
+    return API_CONFIG
+
+def get_ocr_config():
+    """OCR 설정 반환"""
+    return OCR_CONFIG
\ No newline at end of file
@@ -0,0 +1,186 @@
+# 다중 페이지 문서(PDF/TIFF) 처리
+# 페이지를 하나씩 래스터화하여 제한된 동시성으로 OCR하고, 결과는 페이지 순서대로 합침
+# 동시에 메모리에 올라가는 페이지는 최대 동시 처리 수만큼이라 페이지 수와 무관하게 메모리 사용량이 일정함
+import asyncio
+import io
+import os
+import threading
+from functools import partial
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from PIL import Image
+
+import image_deskew
+import ocr_engines
+from config import get_ocr_config
+from ocr_layout import OcrLayout
+
+OCR_CONFIG = get_ocr_config()
+
+# 다중 페이지 문서로 처리할 형식
+DOCUMENT_CONTENT_TYPES = {"application/pdf", "image/tiff", "image/tif"}
+DOCUMENT_EXTENSIONS = {".pdf", ".tif", ".tiff"}
+
+# pdfium은 스레드 안전하지 않으므로 프로세스 안의 모든 pdfium 호출(열기/렌더링/닫기)을 직렬화
+# 페이지 생성기는 비동기 OCR에서 빈 작업 스레드 아무 곳에서나 진행되고 여러 요청이 동시에 렌더링할 수 있음
+# (다 쓰지 않은 생성기가 잠금 안에서 가비지 컬렉션으로 닫혀도 멈추지 않도록 재진입 가능한 잠금 사용)
+_pdfium_lock = threading.RLock()
+
+
+def is_multipage_document(content_type=None, filename=None):
+    """PDF/TIFF 문서 여부 확인"""
+    if content_type and content_type.lower() in DOCUMENT_CONTENT_TYPES:
+        return True
+    if filename and os.path.splitext(filename)[1].lower() in DOCUMENT_EXTENSIONS:
+        return True
+    return False
+
+
+def _is_pdf(data):
+    return data[:5] == b"%PDF-"
+
+
+def iter_pdf_pages(data, dpi=None, max_pages=None):
+    """PDF 페이지를 한 장씩 래스터화하여 반환 (pypdfium2 필요)"""
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        raise RuntimeError("PDF 처리를 위해 pypdfium2 패키지를 설치해주세요.")
+
+    dpi = dpi or OCR_CONFIG["OCR_PDF_DPI"]
+    max_pages = max_pages or OCR_CONFIG["OCR_MAX_PAGES"]
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(data)
+        count = len(pdf)
+    try:
+        for index in range(min(count, max_pages)):
+            # 잠금은 yield 전에 풀어야 하므로, 비트맵과 메모리를 공유하는 PIL 이미지를 복사하고 비트맵/페이지를 잠금 안에서 닫음
+            with _pdfium_lock:
+                page = pdf[index]
+                try:
+                    bitmap = page.render(scale=dpi / 72, grayscale=True)
+                    try:
+                        image = bitmap.to_pil().copy()
+                    finally:
+                        bitmap.close()
+                finally:
+                    page.close()
+            yield image
+    finally:
+        with _pdfium_lock:
+            pdf.close()
+
+
+def iter_image_pages(data, max_pages=None):
+    """TIFF 등 다중 프레임 이미지를 한 장씩 반환"""
+    max_pages = max_pages or OCR_CONFIG["OCR_MAX_PAGES"]
+    image = Image.open(io.BytesIO(data))
+    for index in range(min(getattr(image, "n_frames", 1), max_pages)):
+        image.seek(index)
+        # 다음 프레임으로 이동해도 OCR 중인 페이지가 바뀌지 않도록 복사
+        yield image.copy()
+
+
+def iter_document_pages(data, dpi=None, max_pages=None):
+    """문서 바이트에서 페이지 이미지를 순서대로 생성"""
+    if _is_pdf(data):
+        return iter_pdf_pages(data, dpi, max_pages)
+    return iter_image_pages(data, max_pages)
+
+
+def first_page(data, dpi=None):
+    """미리보기용 첫 페이지 이미지"""
+    return next(iter_document_pages(data, dpi, max_pages=1))
+
+
+def ocr_pages(pages, ocr_func, max_concurrency=None):
+    """페이지를 제한된 동시성으로 OCR하고 페이지 순서대로 텍스트 목록 반환
+
+    진행 중인 페이지가 max_concurrency개를 넘지 않도록 페이지 생성기를 필요한 만큼만 소비함
+    """
+    max_concurrency = max_concurrency or OCR_CONFIG["OCR_PAGE_CONCURRENCY"]
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        pending = {}
+        for index, page in enumerate(pages):
+            if len(pending) >= max_concurrency:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+            pending[executor.submit(ocr_func, page)] = index
+        for future in list(pending):
+            results[pending.pop(future)] = future.result()
+    return [results[index] for index in range(len(results))]
+
+
+async def ocr_pages_async(pages, ocr_func, max_concurrency=None):
+    """비동기 버전 - 페이지 래스터화는 스레드에서, OCR 호출은 ocr_func 코루틴으로 수행"""
+    max_concurrency = max_concurrency or OCR_CONFIG["OCR_PAGE_CONCURRENCY"]
+    semaphore = asyncio.Semaphore(max_concurrency)
+    iterator = iter(pages)
+    tasks = []
+
+    async def run(page):
+        try:
+            return await ocr_func(page)
+        finally:
+            semaphore.release()
+
+    try:
+        while True:
+            # 슬롯이 빌 때까지 다음 페이지를 래스터화하지 않음
+            await semaphore.acquire()
+            page = await asyncio.to_thread(next, iterator, None)
+            if page is None:
+                semaphore.release()
+                break
+            tasks.append(asyncio.ensure_future(run(page)))
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+def join_pages(texts):
+    """페이지 텍스트를 순서대로 합치기"""
+    return "\n".join(filter(None, texts))
+
+
+def _recognize_page(engine, page):
+    """페이지 기울기를 바로잡은 뒤 OCR - (텍스트, OcrLayout)"""
+    page, skew = image_deskew.deskew_for_ocr(page)
+    text, layout = engine.recognize_with_layout(page)
+    return text, image_deskew.attach_info(layout, skew)
+
+
+async def _recognize_page_async(engine, page):
+    page, skew = await asyncio.to_thread(image_deskew.deskew_for_ocr, page)
+    text, layout = await engine.recognize_with_layout_async(page)
+    return text, image_deskew.attach_info(layout, skew)
+
+
+def ocr_document_with_layout(data, ocr_engine=None, dpi=None, max_concurrency=None):
+    """PDF/TIFF 문서 전체 OCR - (페이지 순서대로 합친 텍스트, 페이지 번호가 붙은 OcrLayout) 반환"""
+    engine = ocr_engines.get_engine(ocr_engine)
+    pages = iter_document_pages(data, dpi)
+    results = ocr_pages(pages, partial(_recognize_page, engine), max_concurrency)
+    return join_pages(text for text, _ in results), OcrLayout.concat(layout for _, layout in results)
+
+
+async def ocr_document_with_layout_async(data, ocr_engine=None, dpi=None, max_concurrency=None):
+    """PDF/TIFF 문서 전체 비동기 OCR - (텍스트, OcrLayout) 반환"""
+    engine = ocr_engines.get_engine(ocr_engine)
+    pages = iter_document_pages(data, dpi)
+    results = await ocr_pages_async(pages, partial(_recognize_page_async, engine), max_concurrency)
+    return join_pages(text for text, _ in results), OcrLayout.concat(layout for _, layout in results)
+
+
+def ocr_document(data, ocr_engine=None, dpi=None, max_concurrency=None):
+    """PDF/TIFF 문서 전체 OCR - 페이지 순서대로 합친 텍스트 반환"""
+    return ocr_document_with_layout(data, ocr_engine, dpi, max_concurrency)[0]
+
+
+async def ocr_document_async(data, ocr_engine=None, dpi=None, max_concurrency=None):
+    """PDF/TIFF 문서 전체 비동기 OCR - 페이지 순서대로 합친 텍스트 반환"""
+    return (await ocr_document_with_layout_async(data, ocr_engine, dpi, max_concurrency))[0]
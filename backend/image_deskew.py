@@ -0,0 +1,113 @@
+# OCR 전 기울기 보정
+# 휴대폰으로 비스듬히 찍은 처방전은 OCR이 표의 줄을 섞어 읽으므로,
+# 축소 이진 마스크의 가로 투영 프로파일이 가장 날카로워지는 각도를 NumPy로 한꺼번에 찾아 회전함
+import time
+
+import numpy as np
+from PIL import Image
+
+import image_preprocess
+from config import get_ocr_config
+
+OCR_CONFIG = get_ocr_config()
+
+# 투영 프로파일 계산에 사용할 최대 잉크 픽셀 수 (넘으면 고정 시드 무작위 표본 추출)
+MAX_POINTS = 20000
+
+# 가장 좋은 각도의 선명도가 0도의 선명도보다 이 비율 이상 높을 때만 기울어진 것으로 봄
+MIN_SCORE_GAIN = 1.02
+
+
+def _profile_scores(ys, xs, angles, height):
+    """각도별 가로 투영 프로파일의 선명도 (이웃 행 차이의 제곱합)
+
+    잉크 픽셀을 각도마다 y - x·tan(각도)로 밀어 행 번호를 구하고 bincount 한 번으로 모든 각도의 프로파일을 만듦
+    """
+    tangents = np.tan(np.radians(angles)).astype(np.float32)
+    pad = int(np.ceil(np.abs(tangents).max() * np.abs(xs).max())) + 1 if len(xs) else 1
+    length = height + 2 * pad
+    rows = np.rint(ys[None, :] - xs[None, :] * tangents[:, None]).astype(np.int64) + pad
+    rows += np.arange(len(angles), dtype=np.int64)[:, None] * length
+    profiles = np.bincount(rows.ravel(), minlength=len(angles) * length).reshape(len(angles), length)
+    return (np.diff(profiles, axis=1).astype(np.float64) ** 2).sum(axis=1)
+
+
+def estimate_skew(image, max_angle=None, budget_ms=None, max_width=800):
+    """기울기 각도(도) 추정 - (각도, 시간 초과 여부), 추정할 수 없으면 (None, 초과 여부)
+
+    1도 간격으로 ±max_angle을 찾은 뒤 가장 좋은 각도 주변을 0.25도, 0.05도 간격으로 좁혀 다시 찾음
+    단계마다 budget_ms를 넘었는지 확인하여 넘으면 중단함
+    결과는 ±max_angle 안으로 제한하고, 0도보다 뚜렷하게 선명한 각도가 없으면 0도로 봄
+    각도가 양수면 글자 줄이 오른쪽으로 내려가는 방향 (image.rotate(각도)로 바로잡힘)
+    """
+    max_angle = max_angle if max_angle is not None else OCR_CONFIG["OCR_DESKEW_MAX_ANGLE"]
+    budget = (budget_ms if budget_ms is not None else OCR_CONFIG["OCR_DESKEW_BUDGET_MS"]) / 1000
+    start = time.perf_counter()
+
+    dark, _ = image_preprocess._downscaled_dark_mask(image, max_width)
+    height, width = dark.shape
+    ys, xs = np.nonzero(dark)
+    if len(ys) < 100:
+        return None, False
+    if len(ys) > MAX_POINTS:
+        # 행 순서대로 N번째마다 고르면 글자 배치와 같은 주기의 무늬가 남아 엉뚱한 각도가 선명해지므로 무작위로 고름
+        sample = np.random.default_rng(0).choice(len(ys), MAX_POINTS, replace=False)
+        ys, xs = ys[sample], xs[sample]
+    ys = ys.astype(np.float32)
+    xs = xs.astype(np.float32) - width / 2
+
+    zero_score = float(_profile_scores(ys, xs, np.zeros(1), height)[0])
+    best, best_score = 0.0, zero_score
+    timeout = False
+    for stage, (step, span) in enumerate(((1.0, max_angle), (0.25, 1.0), (0.05, 0.25))):
+        if time.perf_counter() - start > budget:
+            # 첫 단계도 끝내지 못했으면 추정 실패
+            if not stage:
+                return None, True
+            timeout = True
+            break
+        # 좁혀 찾는 단계에서도 ±max_angle 밖으로 나가지 않게 함
+        angles = np.arange(best - span, best + span + step / 2, step)
+        angles = angles[np.abs(angles) <= max_angle + 1e-6]
+        scores = _profile_scores(ys, xs, angles, height)
+        index = int(np.argmax(scores))
+        best, best_score = float(angles[index]), float(scores[index])
+    # 0도보다 뚜렷하게 선명하지 않으면 기울지 않은 것으로 봄
+    if best_score < zero_score * MIN_SCORE_GAIN:
+        return 0.0, timeout
+    return best, timeout
+
+
+def deskew(image, min_angle=None, max_angle=None, budget_ms=None):
+    """기울기를 추정하여 보정한 이미지와 보정 정보 반환 - (이미지, {"angle", "applied", "timeout", "elapsed_ms"})
+
+    각도가 min_angle 미만이거나 첫 탐색 단계 안에 시간 예산을 다 쓰면 원본 이미지를 그대로 반환
+    (좁혀 찾는 단계에서 예산을 넘으면 그때까지 찾은 각도로 보정)
+    회전은 흑백으로 바꾼 뒤 한 번의 bilinear 변환으로 수행 (OCR 업로드는 어차피 흑백)
+    """
+    min_angle = min_angle if min_angle is not None else OCR_CONFIG["OCR_DESKEW_MIN_ANGLE"]
+    start = time.perf_counter()
+    angle, timeout = estimate_skew(image, max_angle, budget_ms)
+    applied = angle is not None and abs(angle) >= min_angle
+    if applied:
+        image = image_preprocess.to_grayscale(image).rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+    return image, {
+        "angle": round(angle, 2) if angle is not None else None,
+        "applied": applied,
+        "timeout": timeout,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def deskew_for_ocr(image):
+    """OCR_DESKEW 설정에 따라 기울기 보정 - (이미지, 보정 정보 또는 None)"""
+    if not OCR_CONFIG["OCR_DESKEW"]:
+        return image, None
+    return deskew(image)
+
+
+def attach_info(layout, info):
+    """보정 정보를 OCR 결과 메타데이터에 기록 (결과의 단어 좌표는 보정된 이미지 기준)"""
+    if layout is not None and info is not None:
+        layout.meta["deskew"] = info
+    return layout
@@ -0,0 +1,87 @@
+# 지각 해시(perceptual hash) 및 해밍 거리 색인
+# 같은 처방전을 조금 다른 각도로 다시 찍은 사진은 바이트 해시가 달라도 지각 해시는 거의 같으므로
+# BK-트리로 가까운 해시를 찾아 이전 OCR/분석 결과를 재사용함
+import numpy as np
+from PIL import Image
+
+# 32x32 DCT-II 변환 행렬 (pHash용, 한 번만 계산)
+_DCT_SIZE = 32
+_DCT_MATRIX = np.cos(
+    np.pi / _DCT_SIZE * (np.arange(_DCT_SIZE)[:, None]) * (np.arange(_DCT_SIZE)[None, :] + 0.5))
+
+
+def _thumbnail(image, size):
+    """작은 흑백 썸네일 배열 (큰 이미지는 reduce로 먼저 빠르게 축소)"""
+    gray = image.convert("L")
+    factor = min(gray.size[0] // (size[0] * 4), gray.size[1] // (size[1] * 4))
+    if factor > 1:
+        gray = gray.reduce(factor)
+    return np.asarray(gray.resize(size, Image.BILINEAR), dtype=np.float64)
+
+
+def _bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def dhash(image, hash_size=8):
+    """차이 해시 - 인접 픽셀 밝기 비교 (64비트 정수)"""
+    pixels = _thumbnail(image, (hash_size + 1, hash_size))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(image, hash_size=8):
+    """DCT 기반 지각 해시 - 저주파 계수를 중앙값과 비교 (64비트 정수)"""
+    pixels = _thumbnail(image, (_DCT_SIZE, _DCT_SIZE))
+    dct = _DCT_MATRIX @ pixels @ _DCT_MATRIX.T
+    low = dct[:hash_size, :hash_size].ravel()
+    # 직류 성분(평균 밝기)은 제외하고 중앙값 계산
+    return _bits_to_int(low > np.median(low[1:]))
+
+
+def image_hashes(image):
+    """(pHash, dHash) 쌍 반환"""
+    return phash(image), dhash(image)
+
+
+def hamming(a, b):
+    """두 해시의 해밍 거리"""
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """해밍 거리용 BK-트리 - 삼각 부등식으로 탐색 범위를 줄여 가까운 해시 검색"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        node = [value, item, {}]
+        self.size += 1
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming(value, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, value, max_distance):
+        """max_distance 이내 항목을 [(거리, 항목)] 거리순으로 반환"""
+        if self.root is None:
+            return []
+        results = []
+        stack = [self.root]
+        while stack:
+            node_value, item, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= max_distance:
+                results.append((distance, item))
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(child for d, child in children.items() if low <= d <= high)
+        results.sort(key=lambda result: result[0])
+        return results
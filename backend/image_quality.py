@@ -0,0 +1,118 @@
+# OCR 전 이미지 품질 검사
+# 흐림(라플라시안 분산), 빛 반사(포화 픽셀 비율), 노출(밝기 히스토그램)을 축소 흑백 이미지에서 계산하여
+# 읽을 수 없는 사진은 OCR/GPT 호출 전에 거부하거나 경고함
+import time
+
+import numpy as np
+from PIL import Image
+
+from config import get_ocr_config
+
+OCR_CONFIG = get_ocr_config()
+
+# 검사 기준 - (경고 기준, 거부 기준), 512px 너비로 표본 추출한 흑백 이미지 기준
+QUALITY_THRESHOLDS = {
+    # 라플라시안 분산이 작을수록 흐림
+    "blur": (150.0, 20.0),
+    # 종이 밝기(중앙값)가 낮은 사진에서 포화 픽셀(250 이상) 비율이 클수록 빛 반사
+    "glare": (0.05, 0.20),
+    # 종이 밝기(중앙값)가 낮을수록 어두움
+    "dark": (120.0, 80.0),
+    # 밝기 범위(1~99 백분위)가 좁을수록 물빠짐/저대비
+    "low_contrast": (80.0, 50.0),
+}
+
+# 검사 결과 메시지
+QUALITY_MESSAGES = {
+    "blur": "사진이 흐립니다. 초점을 맞춰 다시 찍어주세요.",
+    "glare": "빛 반사가 심합니다. 조명을 피해 다시 찍어주세요.",
+    "dark": "사진이 너무 어둡습니다. 밝은 곳에서 다시 찍어주세요.",
+    "low_contrast": "글자가 흐리게 보입니다. 처방전이 잘 보이도록 다시 찍어주세요.",
+}
+
+
+def _small_gray(image, max_width=512):
+    """검사용 축소 흑백 배열
+
+    평균을 내는 축소(reduce/BOX)는 큰 사진에서 10ms를 넘기므로 최근접 표본 추출로 줄인 뒤 흑백 변환함
+    (흐린 사진은 표본을 추출해도 흐린 상태가 유지됨)
+    """
+    width, height = image.size
+    if width > max_width:
+        image = image.resize((max_width, max(1, round(height * max_width / width))), Image.NEAREST)
+    gray = image if image.mode == "L" else image.convert("L")
+    return np.asarray(gray)
+
+
+def _percentile(cumulative, q):
+    """누적 히스토그램에서 q 백분위 밝기"""
+    return int(np.searchsorted(cumulative, cumulative[-1] * q / 100))
+
+
+def measure_quality(image):
+    """품질 지표 계산 - {blur, glare, dark, low_contrast}"""
+    gray = _small_gray(image)
+    histogram = np.bincount(gray.ravel(), minlength=256)
+    cumulative = np.cumsum(histogram)
+    paper = _percentile(cumulative, 50)
+
+    pixels = gray.astype(np.float32)
+    laplacian = (pixels[1:-1, :-2] + pixels[1:-1, 2:] + pixels[:-2, 1:-1] + pixels[2:, 1:-1]
+                 - 4 * pixels[1:-1, 1:-1])
+    # 스캔처럼 종이 자체가 흰색(240 이상)이면 포화 픽셀은 반사가 아님
+    glare = float(histogram[250:].sum() / cumulative[-1]) if paper < 240 else 0.0
+    return {
+        "blur": float(laplacian.var()) if laplacian.size else 0.0,
+        "glare": glare,
+        "dark": float(paper),
+        "low_contrast": float(_percentile(cumulative, 99) - _percentile(cumulative, 1)),
+    }
+
+
+def assess_quality(image):
+    """품질 검사 결과 반환
+
+    {"status": "ok"|"warn"|"reject", "reasons": [{"code", "severity", "value", "threshold", "message"}],
+     "metrics": {...}, "elapsed_ms": float}
+    """
+    start = time.perf_counter()
+    metrics = measure_quality(image)
+    reasons = []
+    for code, (warn, reject) in QUALITY_THRESHOLDS.items():
+        value = metrics[code]
+        # glare는 클수록 나쁘고, 나머지는 작을수록 나쁨
+        worse = (lambda limit: value > limit) if code == "glare" else (lambda limit: value < limit)
+        if worse(reject):
+            severity, threshold = "reject", reject
+        elif worse(warn):
+            severity, threshold = "warn", warn
+        else:
+            continue
+        reasons.append({
+            "code": code,
+            "severity": severity,
+            "value": round(value, 3),
+            "threshold": threshold,
+            "message": QUALITY_MESSAGES[code],
+        })
+
+    severities = {reason["severity"] for reason in reasons}
+    status = "reject" if "reject" in severities else "warn" if severities else "ok"
+    return {
+        "status": status,
+        "reasons": reasons,
+        "metrics": {code: round(value, 3) for code, value in metrics.items()},
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def gate_enabled():
+    """OCR 전 품질 검사 사용 여부"""
+    return OCR_CONFIG["OCR_QUALITY_GATE"]
+
+
+def check_quality(image):
+    """OCR_QUALITY_GATE 설정에 따라 품질 검사 - 끄면 None"""
+    if not gate_enabled():
+        return None
+    return assess_quality(image)
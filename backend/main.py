@@ -2,21 +2,31 @@ from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
-from PIL import Image
-import io
+import asyncio
 import base64
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import tempfile
 import os
 
 # 기존 함수들 import
 from config import get_api_keys
+import ocr_client
+import ocr_cache
+import document_pages
+import ocr_engines
+import prescription_table
+import image_quality
+import image_preprocess
+import drug_index
+import fuzzy_matcher
 from medical_functions import (
-    upstage_ocr, 
+    ocr_image_with_layout_async, 
+    ocr_document_with_layout_async,
     extract_medications, 
     analyze_medical_record,
     get_drug_safety_info,
-    text_to_speech
+    text_to_speech,
+    MEDICATION_EXTRACTOR
 )
 
 app = FastAPI(title="Medical Prescription API", version="1.0.0")
@@ -30,45 +40,104 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("shutdown")
+async def close_ocr_client():
+    """OCR 연결 풀 정리"""
+    await ocr_client.aclose()
+
 @app.get("/")
 async def root():
     return {"message": "Medical Prescription Analysis API"}
 
+def assess_upload_quality(image, image_data):
+    """업로드 이미지(문서는 첫 페이지) 품질 검사 - 이미지 디코딩을 포함하므로 이벤트 루프 밖에서 호출"""
+    checked_image = image if image is not None else document_pages.first_page(image_data)
+    return image_quality.assess_quality(checked_image)
+
 @app.post("/api/analyze-prescription")
-async def analyze_prescription(file: UploadFile = File(...)):
-    """처방전 이미지를 분석하여 약품 정보와 설명을 반환"""
+async def analyze_prescription(file: UploadFile = File(...), ocr_engine: Optional[str] = None, include_layout: bool = False):
+    """처방전 이미지(또는 PDF/TIFF 문서)를 분석하여 약품 정보와 설명을 반환 (include_layout이면 단어 위치/신뢰도 포함)"""
     try:
+        # OCR 엔진 이름 검증 (알 수 없는 이름은 OCR 단계의 일반 오류 대신 사용 가능한 엔진 목록과 함께 바로 거부)
+        if ocr_engine is not None and ocr_engine not in ocr_engines.OCR_ENGINES:
+            raise HTTPException(status_code=400, detail={
+                "message": f"알 수 없는 OCR 엔진입니다: {ocr_engine}",
+                "engines": list(ocr_engines.OCR_ENGINES),
+            })
+        
         # 파일 검증
-        if not file.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="이미지 파일만 업로드 가능합니다.")
+        is_document = document_pages.is_multipage_document(file.content_type, file.filename)
+        if not (is_document or file.content_type.startswith('image/')):
+            raise HTTPException(status_code=400, detail="이미지 또는 PDF/TIFF 파일만 업로드 가능합니다.")
         
-        # 이미지 읽기
+        # 파일 읽기
         image_data = await file.read()
-        image = Image.open(io.BytesIO(image_data))
         
-        # OCR로 텍스트 추출
-        extracted_text = upstage_ocr(image)
+        # OCR 전 품질 검사 (문서는 첫 페이지) - 거부 기준에 걸리면 OCR/GPT 호출 없이 바로 반환
+        # JPEG 사진은 OCR에 필요한 해상도/흑백으로만 디코딩 (OCR 업로드는 흑백으로 인코딩됨)
+        # 디코딩 해상도를 정하는 미리보기 디코딩이 이벤트 루프를 막지 않도록 스레드에서 실행
+        image = None if is_document else await asyncio.to_thread(
+            image_preprocess.open_image, image_data, image_preprocess.decode_max_side(ocr_engine), "L")
+        quality = None
+        if image_quality.gate_enabled():
+            # open_image는 처음 사용할 때 디코딩하므로 디코딩과 품질 검사를 함께 스레드에서 실행
+            quality = await asyncio.to_thread(assess_upload_quality, image, image_data)
+        if quality is not None and quality["status"] == "reject":
+            raise HTTPException(status_code=422, detail={"message": "이미지 품질이 낮아 처리할 수 없습니다.", "quality": quality})
+        
+        # OCR로 텍스트 추출 (ocr_engine 미지정 시 OCR_ENGINE 설정값 사용)
+        if is_document:
+            # PDF/TIFF 문서는 페이지별로 동시에 OCR
+            extracted_text, layout = await ocr_document_with_layout_async(image_data, ocr_engine)
+        else:
+            extracted_text, layout = await ocr_image_with_layout_async(image, image_data, ocr_engine)
         if not extracted_text:
             raise HTTPException(status_code=400, detail="텍스트 추출에 실패했습니다.")
         
+        # 약품 표 복원 (단어 좌표가 있으면) - 약품명 추출과 응답의 행 단위 정보에 함께 사용
+        table_rows = prescription_table.read_medication_table(layout)
+        
         # 약품명 추출
-        medications = extract_medications(extracted_text)
+        medications = extract_medications(extracted_text, layout, table_rows)
         medication_list = [name for _, name in medications]
         
-        # AI 분석
-        analysis = analyze_medical_record(extracted_text, medication_list)
+        # AI 분석 (분석 결과 캐시 조회/저장과 GPT 호출이 이벤트 루프를 막지 않도록 스레드에서 실행)
+        analysis = await asyncio.to_thread(analyze_medical_record, extracted_text, medication_list)
         if not analysis:
             raise HTTPException(status_code=500, detail="분석에 실패했습니다.")
         
+        data = {
+            "extracted_text": extracted_text,
+            "medications": medication_list,
+            "analysis": analysis
+        }
+        # 품질 경고가 있으면 함께 반환
+        if quality is not None:
+            data["quality"] = quality
+        # 요청별 OCR 입력 크기 (글자 높이로 고른 업로드 해상도)
+        if layout is not None and layout.meta:
+            data["ocr"] = layout.meta
+        # 보험 코드로 제품 사전에서 찾은 약품은 제품 정보(EDI 코드/주성분코드/제형) 포함
+        products = [drug_index.lookup_code(code) for code, _ in medications if code != "UNKNOWN"]
+        if any(products):
+            data["medication_products"] = [product._asdict() for product in products if product]
+        # 약품 표를 복원한 경우 행 단위 정보(코드/명칭/1회 투약량/1일 투여횟수/총 투약일수) 포함
+        if table_rows:
+            data["medication_table"] = [row._asdict() for row in table_rows]
+        if include_layout and layout is not None:
+            data["words"] = [
+                {"text": text, "box": [round(float(v), 4) for v in box], "confidence": confidence, "page": page}
+                for text, box, confidence, page in layout.words()
+            ]
+        
         return {
             "success": True,
-            "data": {
-                "extracted_text": extracted_text,
-                "medications": medication_list,
-                "analysis": analysis
-            }
+            "data": data
         }
         
+    except HTTPException:
+        # 검증/품질 검사 오류는 상태 코드 그대로 전달
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"처리 중 오류가 발생했습니다: {str(e)}")
 
@@ -88,18 +157,64 @@ async def convert_text_to_speech(text: str):
         raise HTTPException(status_code=500, detail=f"음성 변환 중 오류: {str(e)}")
 
 @app.get("/api/drug-info/{drug_name}")
-async def get_drug_info(drug_name: str):
-    """특정 약품의 안전 정보 조회"""
+async def get_drug_info(drug_name: str, code: Optional[str] = None):
+    """특정 약품의 안전 정보 조회 (9자리 보험 코드를 주면 제품 사전에서 찾은 제품으로 정확히 조회)"""
     try:
-        safety_info = get_drug_safety_info(drug_name)
+        product = drug_index.lookup_code(code) if code else None
+        safety_info = get_drug_safety_info(drug_name, product)
         return {
             "success": True,
             "drug_name": drug_name,
+            "product": product._asdict() if product else None,
             "safety_info": safety_info
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"약품 정보 조회 중 오류: {str(e)}")
 
+@app.get("/api/drug-index/search")
+async def search_drug_index(q: str, limit: int = 20):
+    """의약품 제품 사전에서 제품명 정확 일치/접두어 조회"""
+    index = drug_index.get_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="의약품 제품 사전 인덱스가 없습니다")
+    product = index.get(q)
+    return {
+        "success": True,
+        "query": q,
+        "exact": product._asdict() if product else None,
+        "prefix": [item._asdict() for item in index.prefix(q, min(max(limit, 1), 100))]
+    }
+
+@app.get("/api/drug-name/suggest")
+async def suggest_drug_name(q: str, k: int = 5):
+    """OCR로 읽은 약품명과 자모 편집 거리가 가까운 약품명 후보 조회"""
+    # 보정표를 쓰는 규칙 집합(v1)은 유사 검색기가 없으므로 제품 사전만으로 검색
+    matcher = MEDICATION_EXTRACTOR.matcher or fuzzy_matcher.get_matcher()
+    candidates = matcher.lookup(q, min(max(k, 1), 20))
+    return {
+        "success": True,
+        "query": q,
+        "candidates": [candidate._asdict() for candidate in candidates]
+    }
+
+@app.get("/api/ocr-cache/stats")
+async def ocr_cache_stats():
+    """OCR 캐시 적중/미적중 통계 조회"""
+    return {
+        "success": True,
+        "stats": ocr_cache.stats()
+    }
+
+@app.get("/api/ocr-engines")
+async def list_ocr_engines():
+    """사용 가능한 OCR 엔진과 엔진별 지연시간/신뢰도 통계 조회"""
+    return {
+        "success": True,
+        "default": ocr_engines.OCR_CONFIG["OCR_ENGINE"],
+        "available": ocr_engines.available_engines(),
+        "stats": ocr_engines.engine_stats()
+    }
+
 @app.get("/health")
 async def health_check():
     """서버 상태 확인"""
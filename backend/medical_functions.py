@@ -1,5 +1,4 @@
 import os
-from PIL import Image
 import openai
 import json
 import requests
@@ -8,9 +7,8 @@ import tempfile
 from gtts import gTTS
 import base64
 import re
-from unicodedata import normalize
-import io
 import ssl
+import asyncio
 from urllib3.exceptions import InsecureRequestWarning
 
 # SSL 경고 메시지 억제
@@ -22,6 +20,15 @@ except AttributeError: pass
 
 # API 설정 - config.py에서 가져오기
 from config import get_api_keys
+import ocr_cache
+import ocr_engines
+import document_pages
+from ocr_layout import from_cache_value, to_cache_value
+import medication_extraction
+import text_normalizer
+import drug_index
+import ocr_refine
+import image_deskew
 
 # API 키 설정
 API_KEYS = get_api_keys()
@@ -48,148 +55,157 @@ DUR_ENDPOINTS = {
     "getPwnmTabooInfoList03": "/getPwnmTabooInfoList03",
 }
 
-def upstage_ocr(image):
-    """업스테이지 OCR API를 사용하여 이미지에서 텍스트 추출"""
+def ocr_image_with_layout(image, image_bytes=None, ocr_engine=None):
+    """선택한 OCR 엔진으로 텍스트와 단어 위치/신뢰도 추출 - (텍스트, OcrLayout) (실패 시 (None, None))"""
     try:
-        api_key = API_KEYS["UPSTAGE_API_KEY"]
-        
-        # 이미지 크기 조정
-        img_width, img_height = image.size
-        
-        # 이미지가 너무 크면 크기 조정
-        max_size = (1000, 1000)
-        if img_width > max_size[0] or img_height > max_size[1]:
-            try:
-                image.thumbnail(max_size, Image.LANCZOS)
-            except AttributeError:
-                image.thumbnail(max_size, Image.ANTIALIAS)
-        
-        # 이미지를 바이트로 변환
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG', optimize=True, quality=80)
-        img_bytes = img_byte_arr.getvalue()
+        engine = ocr_engines.get_engine(ocr_engine)
+        namespace = ocr_cache.ocr_namespace(engine.name)
         
-        # API 호출 설정
-        url = "https://api.upstage.ai/v1/document-digitization"
-        headers = {"Authorization": f"Bearer {api_key}"}
-        
-        # API 호출
-        response = requests.post(
-            url, 
-            headers=headers, 
-            files={"document": ("image.png", img_bytes, "image/png")},
-            data={"model": "ocr"})
-        
-        if response.status_code == 200:
-            result = response.json()
-            
-            # 결과에서 텍스트 추출
-            recognized_text = result.get("text", "")
-            
-            # 페이지별 텍스트가 있으면 합치기
-            if "pages" in result:
-                pages_text = [page.get("text", "") for page in result["pages"]]
-                if any(pages_text):
-                    recognized_text = "\n".join(filter(None, pages_text))
-            
-            return recognized_text
+        # 디스크 캐시 조회 (원본 바이트가 없으면 픽셀 데이터로 키 생성)
+        if image_bytes is not None:
+            cache_key = ocr_cache.make_key(image_bytes, namespace)
         else:
-            print(f"업스테이지 OCR API 오류: {response.status_code}")
-            return None
+            cache_key = ocr_cache.key_for_image(image, namespace)
+        cached = ocr_cache.get(cache_key)
+        if cached is not None:
+            return from_cache_value(cached)
+        
+        # 다시 찍은 사진이면 이전 OCR 결과 재사용 (OCR_SIMILAR_DISTANCE 설정 시)
+        hashes = ocr_cache.image_hashes(image)
+        similar = ocr_cache.get_similar(hashes, namespace)
+        if similar is not None:
+            return from_cache_value(similar)
+        
+        # 비스듬히 찍은 사진은 기울기를 바로잡은 뒤 OCR (단어 좌표는 보정된 이미지 기준)
+        image, skew = image_deskew.deskew_for_ocr(image)
+        recognized_text, layout = engine.recognize_with_layout(image)
+        # 약품 표의 신뢰도 낮은 단어만 확대하여 다시 OCR
+        recognized_text, layout = ocr_refine.refine(image, recognized_text, layout, engine.name)
+        layout = image_deskew.attach_info(layout, skew)
+        if recognized_text:
+            ocr_cache.put(cache_key, to_cache_value(recognized_text, layout))
+            ocr_cache.put_image_hashes(cache_key, hashes)
+        return recognized_text, layout
             
     except Exception as e:
-        print(f"업스테이지 OCR 처리 중 오류 발생: {str(e)}")
-        return None
+        print(f"OCR 처리 중 오류 발생: {str(e)}")
+        return None, None
 
-def clean_text(text: str) -> str:
-    """OCR 텍스트 정제"""
+async def ocr_image_with_layout_async(image, image_bytes=None, ocr_engine=None):
+    """선택한 OCR 엔진으로 비동기 텍스트/단어 위치 추출 (FastAPI용)"""
     try:
-        # 불필요한 공백 및 특수문자 제거
-        text = re.sub(r'[^\w\s\.,\(\)\/%-]+', ' ', text)
+        engine = ocr_engines.get_engine(ocr_engine)
+        namespace = ocr_cache.ocr_namespace(engine.name)
         
-        # 연속된 공백 제거
-        text = re.sub(r'\s+', ' ', text)
+        # 디스크 캐시 조회 (SQLite 잠금 대기가 이벤트 루프를 막지 않도록 스레드에서 수행)
+        if image_bytes is not None:
+            cache_key = ocr_cache.make_key(image_bytes, namespace)
+        else:
+            cache_key = await asyncio.to_thread(ocr_cache.key_for_image, image, namespace)
+        cached = await asyncio.to_thread(ocr_cache.get, cache_key)
+        if cached is not None:
+            return from_cache_value(cached)
+        
+        # 다시 찍은 사진이면 이전 OCR 결과 재사용 (OCR_SIMILAR_DISTANCE 설정 시)
+        hashes = await asyncio.to_thread(ocr_cache.image_hashes, image)
+        similar = await asyncio.to_thread(ocr_cache.get_similar, hashes, namespace)
+        if similar is not None:
+            return from_cache_value(similar)
+        
+        image, skew = await asyncio.to_thread(image_deskew.deskew_for_ocr, image)
+        recognized_text, layout = await engine.recognize_with_layout_async(image)
+        # 약품 표의 신뢰도 낮은 단어만 확대하여 다시 OCR
+        recognized_text, layout = await ocr_refine.refine_async(image, recognized_text, layout, engine.name)
+        layout = image_deskew.attach_info(layout, skew)
+        if recognized_text:
+            await asyncio.to_thread(ocr_cache.put, cache_key, to_cache_value(recognized_text, layout))
+            await asyncio.to_thread(ocr_cache.put_image_hashes, cache_key, hashes)
+        return recognized_text, layout
+            
+    except Exception as e:
+        print(f"OCR 처리 중 오류 발생: {str(e)}")
+        return None, None
+
+def ocr_image(image, image_bytes=None, ocr_engine=None):
+    """선택한 OCR 엔진으로 이미지에서 텍스트 추출 (미지정 시 OCR_ENGINE 설정값)"""
+    return ocr_image_with_layout(image, image_bytes, ocr_engine)[0]
+
+async def ocr_image_async(image, image_bytes=None, ocr_engine=None):
+    """선택한 OCR 엔진으로 비동기 텍스트 추출 (FastAPI용)"""
+    return (await ocr_image_with_layout_async(image, image_bytes, ocr_engine))[0]
+
+def upstage_ocr(image, image_bytes=None):
+    """업스테이지 OCR API를 사용하여 이미지에서 텍스트 추출"""
+    return ocr_image(image, image_bytes, "upstage")
+
+async def upstage_ocr_async(image, image_bytes=None):
+    """업스테이지 OCR API 비동기 호출 (FastAPI용)"""
+    return await ocr_image_async(image, image_bytes, "upstage")
+
+def ocr_document_with_layout(document_bytes, ocr_engine=None):
+    """PDF/TIFF 문서 OCR - 페이지별로 동시에 OCR하여 (페이지 순서대로 합친 텍스트, OcrLayout) 반환"""
+    try:
+        engine = ocr_engines.get_engine(ocr_engine)
+        namespace = ocr_cache.ocr_namespace(engine.name)
+        cache_key = ocr_cache.make_key(document_bytes, namespace)
+        cached = ocr_cache.get(cache_key)
+        if cached is not None:
+            return from_cache_value(cached)
+        
+        recognized_text, layout = document_pages.ocr_document_with_layout(document_bytes, engine.name)
+        if recognized_text:
+            ocr_cache.put(cache_key, to_cache_value(recognized_text, layout))
+        return recognized_text, layout
         
-        # 줄바꿈 정리
-        lines = []
-        for line in text.split('\n'):
-            line = line.strip()
-            if line and len(line) > 1:
-                if re.search(r'\d', line) or re.search(r'[A-Z]\d', line):
-                    lines.append(line)
-                else:
-                    line = normalize('NFKC', line)
-                    lines.append(line)
+    except Exception as e:
+        print(f"문서 OCR 처리 중 오류 발생: {str(e)}")
+        return None, None
+
+async def ocr_document_with_layout_async(document_bytes, ocr_engine=None):
+    """PDF/TIFF 문서 비동기 OCR (FastAPI용)"""
+    try:
+        engine = ocr_engines.get_engine(ocr_engine)
+        namespace = ocr_cache.ocr_namespace(engine.name)
+        cache_key = ocr_cache.make_key(document_bytes, namespace)
+        cached = await asyncio.to_thread(ocr_cache.get, cache_key)
+        if cached is not None:
+            return from_cache_value(cached)
+        
+        recognized_text, layout = await document_pages.ocr_document_with_layout_async(document_bytes, engine.name)
+        if recognized_text:
+            await asyncio.to_thread(ocr_cache.put, cache_key, to_cache_value(recognized_text, layout))
+        return recognized_text, layout
         
-        return '\n'.join(lines)
+    except Exception as e:
+        print(f"문서 OCR 처리 중 오류 발생: {str(e)}")
+        return None, None
+
+def ocr_document(document_bytes, ocr_engine=None):
+    """PDF/TIFF 문서 OCR - 페이지별로 동시에 OCR하여 페이지 순서대로 합침"""
+    return ocr_document_with_layout(document_bytes, ocr_engine)[0]
+
+async def ocr_document_async(document_bytes, ocr_engine=None):
+    """PDF/TIFF 문서 비동기 OCR (FastAPI용)"""
+    return (await ocr_document_with_layout_async(document_bytes, ocr_engine))[0]
+
+def clean_text(text: str) -> str:
+    """OCR 텍스트 정제 - 줄 구조를 유지하며 줄 단위로 정제"""
+    try:
+        return text_normalizer.normalize_text(text)
     except Exception as e:
         print(f"텍스트 정제 중 오류 발생: {str(e)}")
         return text
 
-def extract_medications(text):
-    """약품명 추출"""
+# 약품명 추출은 Streamlit 앱과 같은 공용 엔진으로 처리 (규칙 집합은 EXTRACTION_RULE_SET 설정값, 프로세스마다 한 번만 만듦)
+MEDICATION_EXTRACTOR = medication_extraction.get_extractor()
+
+# GPT 분석 결과 캐시 이름공간 - 진입점마다 프롬프트와 출력 형식이 다르므로 따로 두고, 프롬프트나 모델을 바꾸면 버전을 올림
+ANALYSIS_CACHE_NAMESPACE = "analysis:fastapi:v1:gpt-4o"
+
+def extract_medications(text, layout=None, table_rows=None):
+    """약품명 추출 (layout이 있으면 약품 표를 열 단위로 읽음 - 이미 읽은 표 행은 table_rows로 전달)"""
     try:
-        medications = set()
-        
-        # 약품 정보 영역 식별
-        med_section_pattern = r'처\s*방\s*의\s*약\s*품\s*의\s*명\s*칭.*?(?=동일성분|주사제|$)'
-        med_section_match = re.search(med_section_pattern, text, re.DOTALL)
-        
-        med_section = ""
-        if med_section_match:
-            med_section = med_section_match.group(0)
-        else:
-            med_section = text
-        
-        # 다양한 패턴으로 약품명 추출
-        patterns = [
-            r'(\d{9})\s+(?:\([가-힣A-Za-z]+\))?([\w가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치)?)',
-            r'(?:^|\s)(?:\([가-힣A-Za-z]+\))?((?:[가-힣A-Za-z]{2,})+(?:정|캡슐|주사액|시럽|겔|크림|액|패치))',
-            r'\(\s*(\d+)\s*\)\s*([가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치)?)'
-        ]
-        
-        for pattern in patterns:
-            for match in re.finditer(pattern, med_section):
-                if len(match.groups()) >= 2:
-                    med_name = match.group(2).strip()
-                    med_name = re.sub(r'\d+mg|\d+\.\d+mg', '', med_name)
-                    
-                    if med_name and len(med_name) > 1:
-                        if not any(keyword in med_name for keyword in ["사유코드", "코드"]):
-                            medications.add(("EXTRACTED", med_name))
-        
-        # 약품명 정제 및 표준화
-        medication_mapping = {
-            '노바人크': '노바스크', '노H스크': '노바스크', '노바스코': '노바스크',
-            '트라젠E': '트라젠타', '트라센타': '트라젠타', '트라전타': '트라젠타',
-            '티지패논': '티지페논', '티지례논': '티지페논', '타피페논': '티지페논',
-            '아토맨': '아토렌', '아토렌지': '아토렌',
-            '피오글리치': '피오글리', '피아글리': '피오글리',
-            '크로나': '크로미정', '크로미': '크로미정', '크로미나': '크로미나정',
-            '크래밍': '크래밍정', '스티렌투엑스': '스티렌투엑스정',
-            '모티리톤': '모티리톤정', '인데놀': '인데놀정'
-        }
-        
-        result = []
-        for code, name in medications:
-            clean_name = name.strip()
-            
-            # 매핑 테이블 적용
-            for wrong, correct in medication_mapping.items():
-                if wrong in clean_name:
-                    clean_name = clean_name.replace(wrong, correct)
-                    break
-            
-            # 숫자 제거 및 표준화
-            clean_name = re.sub(r'\d+', '', clean_name)
-            
-            if not re.search(r'(정|캡슐|주사액|시럽|겔|크림|액|패치)$', clean_name):
-                clean_name += '정'
-            
-            result.append(("UNKNOWN", clean_name))
-        
-        return list(set(result))
-        
+        return MEDICATION_EXTRACTOR.extract(text, layout, table_rows).medications
     except Exception as e:
         print(f"약품명 추출 중 오류 발생: {str(e)}")
         return []
@@ -207,6 +223,12 @@ def analyze_medical_record(text, medication_list=None):
             meds = extract_medications(text)
             medication_list = [name for _, name in meds]
         
+        # 같은 처방전 내용이면 이전 분석 결과 재사용
+        analysis_key = ocr_cache.make_key("\n".join([text] + medication_list).encode("utf-8"), ANALYSIS_CACHE_NAMESPACE)
+        cached_analysis = ocr_cache.get(analysis_key)
+        if cached_analysis is not None:
+            return cached_analysis
+        
         # ChatGPT로 약품 정보 분석
         med_list_str = ", ".join(medication_list)
         
@@ -251,22 +273,29 @@ def analyze_medical_record(text, medication_list=None):
             max_tokens=2500
         )
         
-        return completion.choices[0].message.content
+        analysis = completion.choices[0].message.content
+        if analysis:
+            ocr_cache.put(analysis_key, analysis)
+        return analysis
         
     except Exception as e:
         print(f"AI 해석 오류: {str(e)}")
         return None
 
-def get_drug_safety_info(drug_name):
+def get_drug_safety_info(drug_name, product=None):
     """의약품 안전정보 검색"""
     safety_results = {}
     
     # 약품명 전처리
     cleaned_name = re.sub(r'\([^)]*\)', '', drug_name).strip()
-    cleaned_name = re.sub(r'^[^\w가-힣]+|[^\w가-힣]+$', '', cleaned_name)
+    cleaned_name = re.sub(r'^[^\w가-힣]+|(?<![^\w가-힣])[^\w가-힣]+$', '', cleaned_name)
     cleaned_name = re.sub(r'\s+', '', cleaned_name)
     search_name = re.sub(r'(정|캡슐|주사액|시럽|겔|크림|액|패치)$', '', cleaned_name)
-    search_name = re.sub(r'\d+mg|\d+\.\d+mg', '', search_name)
+    search_name = re.sub(r'(?<!\d)\d+(?:\.\d+)?mg', '', search_name)
+    
+    # 보험 코드로 찾은 제품은 제형을 떼지 않은 사전 제품명으로 검색하고, 같은 제품의 항목만 사용
+    if product is not None:
+        search_name = drug_index.base_name(product.name)
     
     # 각 엔드포인트에 대해 검색 수행
     for endpoint_name, endpoint_path in DUR_ENDPOINTS.items():
@@ -302,6 +331,10 @@ def get_drug_safety_info(drug_name):
                             if not isinstance(items, list):
                                 items = [items]
                         
+                        if product is not None:
+                            # 검색어를 포함하는 다른 제품의 항목 제외
+                            items = [item for item in items if drug_index.same_product(item.get('ITEM_NAME', ''), product)]
+                        
                         safety_results[info_type] = items
                         
         except Exception:
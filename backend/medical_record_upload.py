@@ -7,7 +7,6 @@ st.set_page_config(
     initial_sidebar_state="collapsed")
 
 import os
-from PIL import Image
 import json
 import requests
 from datetime import datetime
@@ -15,10 +14,19 @@ import tempfile
 from gtts import gTTS
 import base64
 import re
-from unicodedata import normalize
-import io
 import ssl
 from urllib3.exceptions import InsecureRequestWarning
+import ocr_cache
+import ocr_engines
+import document_pages
+from ocr_layout import from_cache_value, to_cache_value
+import medication_extraction
+import text_normalizer
+import drug_index
+import ocr_refine
+import image_quality
+import image_preprocess
+import image_deskew
 
 # 버전에 따라 OpenAI 임포트 방식 변경
 import openai
@@ -44,6 +52,9 @@ API_CONFIG = {
 def get_api_keys(): return API_CONFIG
 API_KEYS = get_api_keys()
 
+# Streamlit Secrets의 업스테이지 키를 사용하는 OCR 엔진 등록
+ocr_engines.register_engine(ocr_engines.UpstageEngine(api_key=API_KEYS["UPSTAGE_API_KEY"]))
+
 # OpenAI 클라이언트 초기화 - 극도로 단순화
 client = None
 if API_KEYS["OPENAI_API_KEY"]:
@@ -75,66 +86,58 @@ DUR_ENDPOINTS = {
     # 특수 상황 금기 정보
     "getPwnmTabooInfoList03": "/getPwnmTabooInfoList03",}  # 임부금기 정보
 
+def ocr_image_with_layout(image, ocr_engine=None):
+    """선택한 OCR 엔진으로 텍스트와 단어 위치/신뢰도 추출 - (텍스트, OcrLayout)"""
+    try:
+        engine = ocr_engines.get_engine(ocr_engine)
+        # 비스듬히 찍은 사진은 기울기를 바로잡은 뒤 OCR (단어 좌표는 보정된 이미지 기준)
+        image, skew = image_deskew.deskew_for_ocr(image)
+        text, layout = engine.recognize_with_layout(image)
+        # 약품 표의 신뢰도 낮은 단어만 확대하여 다시 OCR
+        text, layout = ocr_refine.refine(image, text, layout, engine.name)
+        return text, image_deskew.attach_info(layout, skew)
+            
+    except Exception as e:
+        st.error(f"OCR 처리 중 오류 발생: {str(e)}")
+        return None, None
+
+def ocr_image(image, ocr_engine=None):
+    """선택한 OCR 엔진으로 이미지에서 텍스트 추출 (미지정 시 OCR_ENGINE 설정값)"""
+    return ocr_image_with_layout(image, ocr_engine)[0]
+
 def upstage_ocr(image):
     """업스테이지 OCR API를 사용하여 이미지에서 텍스트 추출"""
+    return ocr_image(image, "upstage")
+
+def extract_text_from_image(image, ocr_engine=None, image_bytes=None):
+    """이미지에서 텍스트 추출"""
     try:
-        api_key = API_KEYS["UPSTAGE_API_KEY"]
-        
-        # 이미지 크기 조정
-        img_width, img_height = image.size
+        engine = ocr_engines.get_engine(ocr_engine)
+        namespace = ocr_cache.ocr_namespace(engine.name)
         
-        # 이미지가 너무 크면 크기 조정
-        max_size = (1000, 1000)
-        if img_width > max_size[0] or img_height > max_size[1]:
-            # PIL 버전에 따른 호환성 처리
-            try:
-                image.thumbnail(max_size, Image.LANCZOS)
-            except AttributeError:
-                # 구버전 PIL 대응
-                image.thumbnail(max_size, Image.ANTIALIAS)
+        # 디스크 캐시 조회 (원본 바이트가 없으면 픽셀 데이터로 키 생성)
+        if image_bytes is not None:
+            cache_key = ocr_cache.make_key(image_bytes, namespace)
+        else:
+            cache_key = ocr_cache.key_for_image(image, namespace)
+        cached = ocr_cache.get(cache_key)
         
-        # 이미지를 바이트로 변환
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG', optimize=True, quality=80)
-        img_bytes = img_byte_arr.getvalue()
+        if cached is None:
+            # 다시 찍은 사진이면 이전 OCR 결과 재사용 (OCR_SIMILAR_DISTANCE 설정 시)
+            hashes = ocr_cache.image_hashes(image)
+            cached = ocr_cache.get_similar(hashes, namespace)
+        extracted_text, layout = from_cache_value(cached)
         
-        # API 호출 설정
-        url = "https://api.upstage.ai/v1/document-digitization"
-        headers = {"Authorization": f"Bearer {api_key}"}
+        if extracted_text is None:
+            # 선택한 OCR 엔진 사용
+            extracted_text, layout = ocr_image_with_layout(image, engine.name)
+            if extracted_text:
+                ocr_cache.put(cache_key, to_cache_value(extracted_text, layout))
+                ocr_cache.put_image_hashes(cache_key, hashes)
         
-        # API 호출
-        response = requests.post(
-            url, 
-            headers=headers, 
-            files={"document": ("image.png", img_bytes, "image/png")},
-            data={"model": "ocr"})
+        # 단어 위치/신뢰도는 후속 단계에서 OCR 재호출 없이 사용
+        st.session_state.ocr_layout = layout
         
-        if response.status_code == 200:
-            result = response.json()
-            
-            # 결과에서 텍스트 추출
-            recognized_text = result.get("text", "")
-            
-            # 페이지별 텍스트가 있으면 합치기
-            if "pages" in result:
-                pages_text = [page.get("text", "") for page in result["pages"]]
-                if any(pages_text):
-                    recognized_text = "\n".join(filter(None, pages_text))
-            
-            return recognized_text
-        else:
-            st.error(f"업스테이지 OCR API 오류: {response.status_code}")
-            return None
-            
-    except Exception as e:
-        st.error(f"업스테이지 OCR 처리 중 오류 발생: {str(e)}")
-        return None
-
-def extract_text_from_image(image, ocr_engine="upstage"):
-    """이미지에서 텍스트 추출"""
-    try:
-        # 업스테이지 OCR API 사용
-        extracted_text = upstage_ocr(image)
         if extracted_text:
             # 텍스트 정제
             cleaned_text = clean_text(extracted_text)
@@ -147,271 +150,59 @@ def extract_text_from_image(image, ocr_engine="upstage"):
         st.error(f"텍스트 추출 중 오류 발생: {str(e)}")
         return ""
 
-def clean_text(text: str) -> str:
-    """OCR 텍스트 정제"""
+def extract_text_from_document(document_bytes, ocr_engine=None):
+    """PDF/TIFF 문서에서 텍스트 추출 - 페이지별로 동시에 OCR하여 페이지 순서대로 합침"""
     try:
-        # 불필요한 공백 및 특수문자 제거
-        text = re.sub(r'[^\w\s\.,\(\)\/%-]+', ' ', text)
+        engine = ocr_engines.get_engine(ocr_engine)
+        namespace = ocr_cache.ocr_namespace(engine.name)
         
-        # 연속된 공백 제거
-        text = re.sub(r'\s+', ' ', text)
+        # 디스크 캐시 조회
+        cache_key = ocr_cache.make_key(document_bytes, namespace)
+        extracted_text, layout = from_cache_value(ocr_cache.get(cache_key))
         
-        # 줄바꿈 정리
-        lines = []
-        for line in text.split('\n'):
-            line = line.strip()
-            if line and len(line) > 1:  # 의미 있는 텍스트만 유지
-                # 숫자나 코드가 포함된 라인은 그대로 유지
-                if re.search(r'\d', line) or re.search(r'[A-Z]\d', line):
-                    lines.append(line)
-                # 일반 텍스트 라인은 추가 정제
-                else:
-                    # 한글 자모 결합 오류 수정
-                    line = normalize('NFKC', line)
-                    lines.append(line)
+        if extracted_text is None:
+            extracted_text, layout = document_pages.ocr_document_with_layout(document_bytes, engine.name)
+            if extracted_text:
+                ocr_cache.put(cache_key, to_cache_value(extracted_text, layout))
+        
+        st.session_state.ocr_layout = layout
+        
+        if extracted_text:
+            # 텍스트 정제
+            return clean_text(extracted_text)
+        else:
+            st.error("텍스트 추출에 실패했습니다. 다른 파일을 시도해주세요.")
+            return ""
         
-        return '\n'.join(lines)
+    except Exception as e:
+        st.error(f"문서 텍스트 추출 중 오류 발생: {str(e)}")
+        return ""
+
+def clean_text(text: str) -> str:
+    """OCR 텍스트 정제 - 줄 구조를 유지하며 줄 단위로 정제"""
+    try:
+        return text_normalizer.normalize_text(text)
     except Exception as e:
         st.error(f"텍스트 정제 중 오류 발생: {str(e)}")
         return text
 
-def extract_medications(text):
-    """약품명 추출 - 처방전에서 약품명 부분만 집중적으로 추출"""
+# 약품명 추출은 FastAPI와 같은 공용 엔진으로 처리 (규칙 집합은 EXTRACTION_RULE_SET 설정값, 프로세스마다 한 번만 만듦)
+MEDICATION_EXTRACTOR = medication_extraction.get_extractor()
+
+# GPT 분석 결과 캐시 이름공간 - 진입점마다 프롬프트와 출력 형식이 다르므로 따로 두고, 프롬프트나 모델을 바꾸면 버전을 올림
+ANALYSIS_CACHE_NAMESPACE = "analysis:streamlit:v1:gpt-4o"
+
+def extract_medications(text, layout=None):
+    """약품명 추출 - 처방전에서 약품명 부분만 집중적으로 추출 (layout이 있으면 약품 표를 열 단위로 읽음)"""
     try:
-        medications = set()
-        
-        # 약품 정보 영역 식별을 위한 패턴
-        # "처 방 의 약 품 의 명 칭" 섹션과 "동일성분 중복처방 사유" 섹션 전까지만 탐색
-        med_section_pattern = r'처\s*방\s*의\s*약\s*품\s*의\s*명\s*칭.*?(?=동일성분|주사제|$)'
-        med_section_match = re.search(med_section_pattern, text, re.DOTALL)
-        
-        # 약품 정보 영역이 식별된 경우
-        med_section = ""
-        if med_section_match:
-            med_section = med_section_match.group(0)
-        else:
-            med_section = text  # 섹션을 찾지 못하면 전체 텍스트 사용
-        
-        # 1. 약품 코드(9자리 숫자)와 함께 있는 약품명 추출 패턴
-        pattern1 = r'(\d{9})\s+(?:\([가-힣A-Za-z]+\))?([\w가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치)?)'
+        extraction = MEDICATION_EXTRACTOR.extract(text, layout)
         
-        # 2. 코드 없이 약품명만 있는 경우 (더 광범위한 약품명 패턴)
-        pattern2 = r'(?:^|\s)(?:\([가-힣A-Za-z]+\))?((?:[가-힣A-Za-z]{2,})+(?:정|캡슐|주사액|시럽|겔|크림|액|패치))'
+        # 테스트 / 디버깅용 - 세션 상태에 발견된 모든 약품명, 가장 가까운 약품명이 여럿인 후보, 코드로 찾은 제품 저장
+        st.session_state.all_medications = [name for _, name in extraction.medications]
+        st.session_state.medication_candidates = extraction.candidates
+        st.session_state.medication_products = extraction.products
         
-        # 3. 특정 접두어로 시작하는 약품명 패턴
-        pattern3 = r'(?:^|\s)(?:\([가-힣A-Za-z]+\))?((?:크로|트라|노바|티지|아토|피오|라미|네시|메트|글리|아스|카나|리|엔|코|다|자)[가-힣A-Za-z]+)'
-        
-        # 4. 줄 시작 부분에 있는 숫자로 시작하는 약품명 패턴
-        pattern4 = r'^\s*\(\s*([0-9]+)\s*\)\s*([가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치)?)'
-        
-        # 5. 괄호로 둘러싸인 코드 + 약품명 패턴 (예: (65730340)크로미나정625mg)
-        pattern5 = r'\(\s*(\d+)\s*\)\s*([가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치)?)'
-        
-        # 6. 줄 시작에 있는 약품명 패턴 (처방전에서 자주 발견됨)
-        pattern6 = r'^\s*([가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치))+'
-        
-        # 모든 패턴 적용하여 약품명 추출
-        # 패턴 1: 코드 + 약품명
-        for match in re.finditer(pattern1, med_section):
-            med_code = match.group(1).strip()
-            med_name = match.group(2).strip()
-            
-            # 기본적인 정제 - 용량 정보 제거
-            med_name = re.sub(r'\d+mg|\d+\.\d+mg', '', med_name)
-            
-            if med_name and len(med_name) > 1:
-                # "사유코드" 같은 텍스트는 약품명에서 제외
-                if not any(keyword in med_name for keyword in ["사유코드", "코드"]):
-                    medications.add(("CODE", med_name))
-        
-        # 패턴 2: 일반적인 약품명 형식
-        for match in re.finditer(pattern2, med_section):
-            med_name = match.group(1).strip()
-            
-            # 기본적인 정제 - 용량 정보 제거
-            med_name = re.sub(r'\d+mg|\d+\.\d+mg', '', med_name)
-            
-            if med_name and len(med_name) > 1:
-                # "사유코드" 같은 텍스트는 약품명에서 제외
-                if not any(keyword in med_name for keyword in ["사유코드", "코드"]):
-                    medications.add(("NAME", med_name))
-        
-        # 패턴 3: 특정 접두어로 시작하는 약품명
-        for match in re.finditer(pattern3, med_section):
-            med_name = match.group(1).strip()
-            
-            # 기본적인 정제 - 용량 정보 제거
-            med_name = re.sub(r'\d+mg|\d+\.\d+mg', '', med_name)
-            
-            if med_name and len(med_name) > 1:
-                # "사유코드" 같은 텍스트는 약품명에서 제외
-                if not any(keyword in med_name for keyword in ["사유코드", "코드"]):
-                    medications.add(("PREFIX", med_name))
-        
-        # 패턴 4: 줄 시작 부분의 번호 + 약품명
-        for match in re.finditer(pattern4, med_section, re.MULTILINE):
-            med_name = match.group(2).strip()
-            
-            # 기본적인 정제 - 용량 정보 제거
-            med_name = re.sub(r'\d+mg|\d+\.\d+mg', '', med_name)
-            
-            if med_name and len(med_name) > 1:
-                # "사유코드" 같은 텍스트는 약품명에서 제외
-                if not any(keyword in med_name for keyword in ["사유코드", "코드"]):
-                    medications.add(("NUM", med_name))
-        
-        # 패턴 5: 괄호 안의 코드 + 약품명 (예: (65730340)크로미나정625mg)
-        for match in re.finditer(pattern5, med_section):
-                med_name = match.group(2).strip()
-                
-                # 기본적인 정제 - 용량 정보 제거
-                med_name = re.sub(r'\d+mg|\d+\.\d+mg', '', med_name)
-                
-                if med_name and len(med_name) > 1:
-                    # "사유코드" 같은 텍스트는 약품명에서 제외
-                    if not any(keyword in med_name for keyword in ["사유코드", "코드"]):
-                        medications.add(("BRACKET", med_name))
-        
-        # 패턴 6: 줄 시작에 있는 약품명
-        for line in med_section.split('\n'):
-            matches = re.match(pattern6, line)
-            if matches:
-                med_name = matches.group(1).strip()
-                
-                # 기본적인 정제 - 용량 정보 제거
-                med_name = re.sub(r'\d+mg|\d+\.\d+mg', '', med_name)
-                
-                if med_name and len(med_name) > 1:
-                # "사유코드" 같은 텍스트는 약품명에서 제외
-                    if not any(keyword in med_name for keyword in ["사유코드", "코드"]):
-                        medications.add(("LINE", med_name))
-        
-        # 특정 약품명에 대한 보정 매핑
-        medication_mapping = {
-            '노바人크': '노바스크',
-            '노H스크': '노바스크',
-            '노바스코': '노바스크',
-            '트라젠E': '트라젠타',
-            '트라센타': '트라젠타',
-            '티지패논': '티지페논',
-            '티지례논': '티지페논',
-            '아토맨': '아토렌',
-            '아토렌지': '아토렌',
-            '피오글리치': '피오글리',
-            '피아글리': '피오글리',
-            '트라전타': '트라젠타',
-            '타피페논': '티지페논',
-            '크로나': '크로미정',
-            '크로미': '크로미정',
-            '크로미나': '크로미나정',
-            '톡사펜': '톡사펜정',
-            '톡사렌': '톡사렌정',
-            '알도실': '알도실캡슐',
-            '알리나제': '알리나제정',
-            '레커틴': '레커틴정',
-            '레커팅': '레커틴정',
-            # prescription2.jpg를 위한 추가 매핑
-            '크래밍': '크래밍정',
-            '스티렌투엑스': '스티렌투엑스정',
-            '모티리톤': '모티리톤정',
-            '인데놀': '인데놀정'}
-        
-        # 추출된 약품명을 정리하여 반환
-        result = []
-        for code, name in medications:
-            # 약품명 정제 및 매핑 적용
-            clean_name = name.strip()
-            
-            # 매핑 테이블에서 찾기
-            for wrong, correct in medication_mapping.items():
-                if wrong in clean_name:
-                    clean_name = clean_name.replace(wrong, correct)
-                    break
-            
-            # 약품명에서 숫자 제거
-            clean_name = re.sub(r'\d+', '', clean_name)
-            
-            # 표준화된 형식으로 약품명 변환
-            # '정', '캡슐' 등 제형 정보가 없으면 '정'을 기본으로 추가
-            # 이미 해당 제형으로 끝나는지 더 정확하게 확인
-            if not re.search(r'(정|캡슐|주사액|시럽|겔|크림|액|패치)$', clean_name):
-                clean_name += '정'
-            
-            # 복합제 처리 (트라젠타 → 트라젠타듀오정 등)
-            if '트라젠타' in clean_name and not '듀오' in clean_name:
-                clean_name = clean_name.replace('트라젠타', '트라젠타듀오')
-            
-            # 코드는 "UNKNOWN"으로 통일 (약품명만 사용하므로)
-            result.append(("UNKNOWN", clean_name))
-        
-        # 표준화된 약품명 정의 - 올바른 약품명 목록
-        standard_names = {
-            "노바스크정": True,
-            "티지페논정": True,
-            "아토렌정": True,
-            "피오글리정": True,
-            "트라젠타듀오정": True,
-            "크로미나정": True,
-            "크로미정": True,
-            "톡사펜정": True,
-            "톡사렌정": True,
-            "알도실캡슐": True,
-            "알리나제정": True,
-            "레커틴정": True,
-            # prescription2.jpg 약품명 추가
-            "크래밍정": True,
-            "스티렌투엑스정": True,
-            "모티리톤정": True,
-            "인데놀정": True,
-        }
-        
-        # 중복 제거 및 표준화
-        unique_names = {}
-        
-        # 먼저 알려진 표준 약품명만 추출
-        for code, name in result:
-            # 이미 표준화된 약품명인 경우 직접 추가
-            if name in standard_names:
-                unique_names[name] = code
-            # 약품명 정제 시도
-            else:
-                # 중복된 접미사 제거 (예: 알리나제정정 → 알리나제정)
-                for suffix in ["정", "캡슐", "주사액", "시럽", "겔", "크림", "액", "패치"]:
-                    pattern = f"({suffix}){suffix}$"
-                    if re.search(pattern, name):
-                        name = re.sub(pattern, r"\1", name)
-                
-                # 표준화된 약품명에 있는 약품만 선택
-                for std_name in standard_names.keys():
-                    # 약품명 일부가 포함되어 있거나 유사한 경우
-                    if std_name in name or name in std_name:
-                        unique_names[std_name] = code
-                        break
-                else:
-                    # 표준 목록에 없는 약품은 그대로 추가
-                    if len(name) > 2:  # 의미 있는 길이인 경우만
-                        unique_names[name] = code
-        
-        # 결과가 너무 적으면 원본 약품명 사용
-        if len(unique_names) < 2 and len(result) > 0:
-            # 첫 번째 약품 추가
-            unique_names[result[0][1]] = result[0][0]
-            
-            # 추가로 약품 후보 확인
-            for code, name in result[1:]:
-                if name != result[0][1]:  # 첫 번째와 다른 약품만 추가
-                    unique_names[name] = code
-                    break
-        
-        # 결과 재구성
-        final_result = [(code, name) for name, code in unique_names.items()]
-        
-        # 테스트 / 디버깅용 - 세션 상태에 발견된 모든 약품명 저장
-        if 'all_medications' not in st.session_state:
-            st.session_state.all_medications = []
-        st.session_state.all_medications = [name for _, name in final_result]
-        
-        return final_result
+        return extraction.medications
         
     except Exception as e:
         st.error(f"약품명 추출 중 오류 발생: {str(e)}")
@@ -420,21 +211,8 @@ def extract_medications(text):
 def extract_codes(text):
     """의약품 코드 추출"""
     try:
-        codes = set()
-        
-        # 코드 패턴
-        patterns = [
-            r'[A-Z]\d{2}(?:\.\d+)?',  # 질병분류기호
-            r'\d{9}',                  # 의약품 표준코드
-            r'[A-Z]\d{5,8}'           # 의약품 일련번호
-        ]
-        
-        for pattern in patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                codes.add(match.group())
-        
-        return sorted(list(codes))
+        # 질병분류기호, 의약품 표준코드, 의약품 일련번호 (공용 엔진의 미리 컴파일한 패턴 사용)
+        return medication_extraction.extract_codes(text)
         
     except Exception as e:
         st.error(f"코드 추출 중 오류 발생: {str(e)}")
@@ -561,7 +339,7 @@ def analyze_medical_record(text, medication_list=None, medication_codes=None):
             
             for i, med_name in enumerate(api_drug_list, 1):
                 # DUR API에서 약품 정보 가져오기
-                safety_info = get_drug_safety_info(med_name)
+                safety_info = get_drug_safety_info(med_name, st.session_state.get('medication_products', {}).get(med_name))
                 
                 # 기본 약품 정보 템플릿
                 drug_info = {
@@ -721,7 +499,7 @@ def analyze_medical_record(text, medication_list=None, medication_codes=None):
         return None
 
 # DUR 의약품 안전 정보 검색 함수
-def get_drug_safety_info(drug_name):
+def get_drug_safety_info(drug_name, product=None):
     """의약품 안전정보 검색 함수"""
     safety_results = {}
     api_call_logs = []  # API 호출 로그를 저장할 리스트
@@ -732,7 +510,7 @@ def get_drug_safety_info(drug_name):
     cleaned_name = re.sub(r'\([^)]*\)', '', drug_name).strip()
     
     # 2. 약품명 정제 (시작과 끝의 불필요한 문자 제거)
-    cleaned_name = re.sub(r'^[^\w가-힣]+|[^\w가-힣]+$', '', cleaned_name)
+    cleaned_name = re.sub(r'^[^\w가-힣]+|(?<![^\w가-힣])[^\w가-힣]+$', '', cleaned_name)
     
     # 3. 약품명 내의 공백 제거
     cleaned_name = re.sub(r'\s+', '', cleaned_name)
@@ -741,7 +519,11 @@ def get_drug_safety_info(drug_name):
     search_name = re.sub(r'(정|캡슐|주사액|시럽|겔|크림|액|패치)$', '', cleaned_name)
     
     # 5. 용량 정보 제거 (예: "90mg" 같은 내용)
-    search_name = re.sub(r'\d+mg|\d+\.\d+mg', '', search_name)
+    search_name = re.sub(r'(?<!\d)\d+(?:\.\d+)?mg', '', search_name)
+    
+    # 보험 코드로 찾은 제품은 제형을 떼지 않은 사전 제품명으로 검색하고, 같은 제품의 항목만 사용
+    if product is not None:
+        search_name = drug_index.base_name(product.name)
     
     # 디버깅 로그 추가 - 약품명 처리 과정 출력
     # print(f"약품 검색: 원본='{drug_name}' → 정제='{cleaned_name}' → 검색어='{search_name}'")
@@ -813,6 +595,10 @@ def get_drug_safety_info(drug_name):
                             if not isinstance(items, list):
                                 items = [items]
                         
+                        if product is not None:
+                            # 검색어를 포함하는 다른 제품의 항목 제외
+                            items = [item for item in items if drug_index.same_product(item.get('ITEM_NAME', ''), product)]
+                        
                         safety_results[info_type] = items
                         api_log["items_count"] = len(items)
                     else:
@@ -980,6 +766,22 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+@st.cache_resource(max_entries=16, show_spinner=False)
+def load_upload(content_hash, is_document, max_side, _data):
+    """업로드 이미지(문서는 첫 페이지) 디코딩과 품질 검사 - 내용 해시/디코딩 해상도별로 한 번만 실행
+    다시 실행(rerun)할 때는 캐시의 이미지를 그대로 공유 (이후 처리는 이미지를 변경하지 않고 새 이미지를 만듦)"""
+    if is_document:
+        image = document_pages.first_page(_data)
+    else:
+        image = image_preprocess.open_image(_data, max_side)
+    image.load()
+    return image, image_quality.check_quality(image)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def preview_image(content_hash, _image):
+    """업로드 미리보기 바이트 - 내용 해시별로 한 번만 만들고 다시 실행(rerun)할 때는 캐시에서 반환"""
+    return image_preprocess.make_preview(_image)
+
 def main():
     if not API_KEYS["OPENAI_API_KEY"]:
         st.error("OpenAI API 키가 설정되지 않았습니다. .env 파일 또는 Streamlit Secrets를 확인해주세요.")
@@ -1013,30 +815,57 @@ def main():
         - 고정밀 텍스트 위치 분석 및 신뢰도 평가
         - 99% 이상의 인식 정확도
         """)
+        
+        # OCR 엔진 선택 (네트워크가 없으면 로컬 Tesseract 사용 가능)
+        engine_options = ocr_engines.available_engines() or [ocr_engines.OCR_CONFIG["OCR_ENGINE"]]
+        default_engine = ocr_engines.OCR_CONFIG["OCR_ENGINE"]
+        selected_ocr_engine = st.selectbox(
+            "OCR 엔진",
+            engine_options,
+            index=engine_options.index(default_engine) if default_engine in engine_options else 0)
+        st.caption("엔진별 지연시간/신뢰도 통계")
+        st.json(ocr_engines.engine_stats(), expanded=False)
 
     # 파일 업로드
-    uploaded_file = st.file_uploader("처방전 사진을 올려주세요", type=['png', 'jpg', 'jpeg'])
+    uploaded_file = st.file_uploader("처방전 사진을 올려주세요", type=['png', 'jpg', 'jpeg', 'pdf', 'tif', 'tiff'])
     
     if uploaded_file is not None:
         # 이미지 표시
         st.markdown('<div class="section-title">📋 처방전</div>', unsafe_allow_html=True)
-        image = Image.open(uploaded_file)
-        st.image(image, use_container_width=True)
+        is_document = document_pages.is_multipage_document(uploaded_file.type, uploaded_file.name)
+        # PDF/TIFF 문서는 첫 페이지만, JPEG 사진은 OCR에 필요한 해상도까지만 디코딩
+        # 디코딩과 품질 검사는 업로드마다 한 번만 실행 (위젯 조작으로 다시 실행될 때는 캐시 사용)
+        content_hash = ocr_cache.content_hash(uploaded_file.getvalue())
+        max_side = None if is_document else image_preprocess.decode_max_side(selected_ocr_engine)
+        image, quality = load_upload(content_hash, is_document, max_side, uploaded_file.getvalue())
+        # 원본 대신 표시 크기로 줄인 미리보기를 전송 (업로드마다 한 번만 생성)
+        st.image(preview_image(content_hash, image), use_container_width=True)
+        
+        # OCR 전 품질 검사 (흐림/빛 반사/노출) - 거부 기준에 걸리면 OCR하지 않음
+        if quality is not None:
+            show_reason = st.error if quality["status"] == "reject" else st.warning
+            for reason in quality["reasons"]:
+                show_reason(reason["message"])
+        quality_rejected = quality is not None and quality["status"] == "reject"
         
         # 새 이미지가 업로드되면 세션 상태 초기화
-        file_hash = hash(uploaded_file.getvalue())
+        file_hash = f"{selected_ocr_engine}:{content_hash}"
         if 'last_file_hash' not in st.session_state or st.session_state.last_file_hash != file_hash:
             st.session_state.last_file_hash = file_hash
             st.session_state.ocr_result = None
+            st.session_state.ocr_layout = None
             st.session_state.extracted_medications = None
             st.session_state.analysis_result = None
         
-        if st.button("📋 처방전 내용설명"):
+        if st.button("📋 처방전 내용설명", disabled=quality_rejected):
             with st.spinner("처방전 내용을 분석하고 있습니다..."):
                 # OCR 결과 캐싱
                 if st.session_state.ocr_result is None:
-                # 텍스트 추출
-                    extracted_text = extract_text_from_image(image)
+                    # 텍스트 추출 (PDF/TIFF 문서는 전체 페이지)
+                    if is_document:
+                        extracted_text = extract_text_from_document(uploaded_file.getvalue(), selected_ocr_engine)
+                    else:
+                        extracted_text = extract_text_from_image(image, selected_ocr_engine, uploaded_file.getvalue())
                     st.session_state.ocr_result = extracted_text
                 else:
                     extracted_text = st.session_state.ocr_result
@@ -1044,7 +873,7 @@ def main():
                 if extracted_text:
                     # 약품명 및 코드 추출 (캐싱)
                     if st.session_state.extracted_medications is None:
-                        medications = extract_medications(extracted_text)
+                        medications = extract_medications(extracted_text, st.session_state.get("ocr_layout"))
                         st.session_state.extracted_medications = medications
                     else:
                         medications = st.session_state.extracted_medications
@@ -1052,7 +881,8 @@ def main():
                     # 분석 결과 (캐싱)
                     if st.session_state.analysis_result is None:
                         # prescription2.jpg 형식 약품명 직접 추출 (OCR 결과에서)
-                        prescription2_pattern = r'([가-힣A-Za-z]+\s+정(?:\s+\d+mg)?(?:\([^)]+\)))'
+                        # 글자 묶음의 시작에서만 시도하고 괄호 안 길이를 제한하여 긴 OCR 줄에서도 선형 시간으로 탐색
+                        prescription2_pattern = r'((?<![가-힣A-Za-z])[가-힣A-Za-z]+\s+정(?:\s+\d+mg)?(?:\([^)\n]{1,100}\)))'
                         direct_medications = []
                         
                         for match in re.finditer(prescription2_pattern, extracted_text):
@@ -1060,7 +890,7 @@ def main():
                             if med_name and len(med_name) > 1:
                                 # 약품명에서 괄호와 용량 제거하고 공백 제거
                                 clean_name = re.sub(r'\([^)]*\)', '', med_name).strip()
-                                clean_name = re.sub(r'\d+mg|\d+\.\d+mg', '', clean_name)
+                                clean_name = re.sub(r'(?<!\d)\d+(?:\.\d+)?mg', '', clean_name)
                                 clean_name = re.sub(r'\s+', '', clean_name)
                                 
                                 # 원래 형태 보존 (디버깅용)
@@ -1075,7 +905,14 @@ def main():
                             print(f"직접 추출된 약품명 사용: {[name for _, name in direct_medications]}")
                             medications = direct_medications
                         
-                        analysis = analyze_medical_record(extracted_text, [name for _, name in medications])
+                        # 같은 처방전 내용이면 이전 분석 결과 재사용 (다른 세션/다시 찍은 사진 포함)
+                        medication_names = [name for _, name in medications]
+                        analysis_key = ocr_cache.make_key("\n".join([extracted_text] + medication_names).encode("utf-8"), ANALYSIS_CACHE_NAMESPACE)
+                        analysis = ocr_cache.get(analysis_key)
+                        if analysis is None:
+                            analysis = analyze_medical_record(extracted_text, medication_names)
+                            if analysis:
+                                ocr_cache.put(analysis_key, analysis)
                         st.session_state.analysis_result = analysis
                     else:
                         analysis = st.session_state.analysis_result
@@ -1101,6 +938,12 @@ def main():
                             st.markdown("### OCR 결과")
                             st.text(extracted_text)
                             
+                            # 글자 높이로 고른 OCR 업로드 크기
+                            ocr_layout = st.session_state.get("ocr_layout")
+                            if ocr_layout is not None and ocr_layout.meta:
+                                st.markdown("### OCR 입력 크기")
+                                st.json(ocr_layout.meta)
+                            
                             st.markdown("### 추출된 약품명")
                             st.write(extracted_drug_names)
                             
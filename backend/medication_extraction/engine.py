@@ -0,0 +1,206 @@
+# 약품명 추출 엔진
+# Streamlit 앱과 FastAPI가 같은 추출기를 쓰도록 Streamlit에 의존하지 않는 추출 과정만 모아 둠
+# 규칙 집합마다 표준 약품명 오토마톤과 유사 검색 색인을 한 번만 만들어 프로세스 안에서 공유함
+import functools
+import re
+import threading
+from collections import namedtuple
+
+import drug_index
+import fuzzy_matcher
+import medication_tokenizer
+import name_matcher
+import prescription_table
+from config import get_ocr_config
+
+from .rules import DEFAULT_VERSION, RULE_SETS
+
+OCR_CONFIG = get_ocr_config()
+
+# "처 방 의 약 품 의 명 칭" 섹션과 "동일성분 중복처방 사유" 섹션 전까지만 탐색
+MED_SECTION_PATTERN = re.compile(r'처\s*방\s*의\s*약\s*품\s*의\s*명\s*칭.*?(?=동일성분|주사제|$)', re.DOTALL)
+
+FORM_SUFFIXES = ("정", "캡슐", "주사액", "시럽", "겔", "크림", "액", "패치")
+FORM_SUFFIX_PATTERN = re.compile(f"(?:{'|'.join(FORM_SUFFIXES)})$")
+# 중복된 접미사 (예: 알리나제정정 → 알리나제정)
+DOUBLE_SUFFIX_PATTERNS = [re.compile(f"({suffix}){suffix}$") for suffix in FORM_SUFFIXES]
+BRACKET_PATTERN = re.compile(r'\([^)]*\)')
+# 용량은 숫자 묶음의 시작에서만 시도 (긴 숫자열에서 위치마다 다시 읽지 않도록)
+TABLE_NOISE_PATTERN = re.compile(r'(?<!\d)\d+(?:\.\d+)?mg|\s+')
+DIGIT_PATTERN = re.compile(r'\d+')
+
+# 코드 패턴 - 질병분류기호, 의약품 표준코드, 의약품 일련번호
+CODE_PATTERNS = [
+    re.compile(r'[A-Z]\d{2}(?:\.\d+)?'),
+    re.compile(r'\d{9}'),
+    re.compile(r'[A-Z]\d{5,8}'),
+]
+
+# 추출 결과
+# medications: (코드, 약품명) 목록 - 보험 코드로 찾은 제품은 EDI 코드, 그 밖에는 "UNKNOWN"
+# candidates: 가장 가까운 약품명이 여럿인 후보 (원래 이름 -> [(약품명, 거리)])
+# products: 보험 코드로 찾은 제품 (약품명 -> drug_index.DrugProduct)
+Extraction = namedtuple("Extraction", ["medications", "candidates", "products", "rule_set"])
+
+
+class Extractor:
+    """규칙 집합 하나로 만든 약품명 추출기"""
+
+    def __init__(self, rule_set):
+        self.rule_set = rule_set
+        self.standard_names = name_matcher.StandardNames(rule_set.standard_names)
+        # 보정표가 있는 규칙 집합(기존 추출기 재현용)은 유사 검색 대신 보정표 사용
+        self.corrections = name_matcher.CorrectionTable(rule_set.corrections) if rule_set.corrections else None
+        self.matcher = None if self.corrections else fuzzy_matcher.get_matcher(rule_set.known_names)
+        # 같은 후보 이름(약품명, 표 머리글 등)은 처방전마다 반복되므로 보정/표준화 결과를 기억해 둠
+        self._normalized = functools.lru_cache(maxsize=4096)(self._normalize)
+        self._standard_name = functools.lru_cache(maxsize=4096)(self._find_standard_name)
+
+    def scan(self, text, layout=None, table_rows=None):
+        """(유형, 약품명) 후보 집합과 약품명 -> 함께 읽은 9자리 보험(EDI) 코드
+
+        table_rows: 이미 읽은 약품 표 행 (prescription_table.read_medication_table 결과 - 없으면 layout에서 읽음)
+        """
+        section_match = MED_SECTION_PATTERN.search(text)
+        # 섹션을 찾지 못하면 전체 텍스트 사용
+        section = section_match.group(0) if section_match else text
+
+        medications = set()
+        codes = {}
+        # OCR 단어 좌표가 있으면 약품 표를 열 단위로 읽고, 표를 찾지 못한 경우에만 토크나이저로 탐색
+        if table_rows is None:
+            table_rows = prescription_table.read_medication_table(layout)
+        for row in table_rows:
+            # 괄호 안 내용(급여 구분 등)과 용량 정보 제거
+            name = TABLE_NOISE_PATTERN.sub('', BRACKET_PATTERN.sub('', row.name))
+            if name and len(name) > 1:
+                medications.add(("TABLE", name))
+                if row.code:
+                    codes[name] = row.code
+        if not table_rows:
+            medications.update(medication_tokenizer.scan_candidates(section, self.rule_set.candidate_types, codes))
+        return medications, codes
+
+    def normalize(self, name, candidates):
+        """OCR 오인식 보정과 제형/복합제 표준화 - 가장 가까운 약품명이 여럿이면 candidates에 기록"""
+        name = name.strip()
+        normalized, ambiguous = self._normalized(name)
+        if ambiguous:
+            candidates[name] = list(ambiguous)
+        return normalized
+
+    def _normalize(self, name):
+        """(표준화한 약품명, 가장 가까운 약품명이 여럿이면 (약품명, 거리) 후보)"""
+        if self.corrections is not None:
+            name = self.corrections.correct(name)
+            ambiguous = ()
+        else:
+            # 자모 편집 거리 한도 안에서 가장 가까운 사전 약품명으로 보정
+            matched_name, ambiguous = self.matcher.correct(name)
+            ambiguous = tuple((candidate.name, candidate.distance) for candidate in ambiguous)
+            if matched_name is not None:
+                name = matched_name
+
+        # 숫자를 제거하고, '정', '캡슐' 등 제형 정보가 없으면 '정'을 기본으로 추가
+        name = DIGIT_PATTERN.sub('', name)
+        if not FORM_SUFFIX_PATTERN.search(name):
+            name += '정'
+
+        # 복합제 처리 (트라젠타 → 트라젠타듀오정 등)
+        for single, skip, combined in self.rule_set.combinations:
+            if single in name and skip not in name:
+                name = name.replace(single, combined)
+        return name, ambiguous
+
+    def standardize(self, names, products):
+        """약품명 -> 코드 사전 - 표준 약품명으로 모으고, 결과가 너무 적으면 원본 약품명 사용"""
+        unique_names = {}
+        for code, name in names:
+            # 코드로 찾은 제품은 그대로 추가
+            standard_name = name if name in products else self._standard_name(name)
+            if standard_name is not None:
+                unique_names[standard_name] = code
+
+        if len(unique_names) < 2 and names:
+            # 첫 번째 약품과, 그와 다른 약품 하나를 추가
+            first_code, first_name = names[0]
+            unique_names[first_name] = first_code
+            for code, name in names[1:]:
+                if name != first_name:
+                    unique_names[name] = code
+                    break
+        return unique_names
+
+    def _find_standard_name(self, name):
+        """표준화한 약품명 (너무 짧아 버릴 이름이면 None)"""
+        # 이미 표준화된 약품명, 의약품 제품 사전에 있는 제품명은 그대로 사용
+        if name in self.standard_names or drug_index.lookup(name) is not None:
+            return name
+        for pattern in DOUBLE_SUFFIX_PATTERNS:
+            name = pattern.sub(r"\1", name)
+        # 약품명 일부가 포함되어 있거나 약품명을 포함하는 표준 약품명
+        standard_name = self.standard_names.find(name)
+        if standard_name is not None:
+            return standard_name
+        # 표준 목록에 없는 약품은 의미 있는 길이인 경우만 그대로 추가
+        return name if len(name) > 2 else None
+
+    def extract(self, text, layout=None, table_rows=None):
+        """처방전 OCR 텍스트(와 단어 좌표)에서 약품명 추출 - 같은 입력이면 항상 같은 순서의 결과"""
+        medications, codes = self.scan(text, layout, table_rows)
+
+        names = []
+        candidates = {}
+        products = {}
+        # 후보 집합은 순서가 없으므로 정렬하여 처리 (프로세스마다 결과 순서가 달라지지 않게)
+        for kind, name in sorted(medications):
+            # 보험 코드가 제품 사전에 있으면 이름 보정/추정 없이 사전의 제품명 사용
+            code = codes.get(name)
+            product = drug_index.lookup_code(code) if code else None
+            if product is not None:
+                name = drug_index.base_name(product.name)
+                products[name] = product
+            else:
+                name = self.normalize(name, candidates)
+            names.append(("UNKNOWN", name))
+
+        if self.rule_set.standard_names:
+            unique_names = self.standardize(names, products)
+        else:
+            unique_names = dict((name, code) for code, name in names)
+
+        result = [(products[name].edi_code if name in products else code, name) for name, code in unique_names.items()]
+        return Extraction(result, candidates, products, self.rule_set.version)
+
+
+# 규칙 집합 버전별 추출기 (프로세스마다 한 번만 만듦)
+_extractors = {}
+_extractors_lock = threading.Lock()
+
+
+def get_extractor(version=None):
+    """규칙 집합 버전의 추출기 반환 (지정하지 않으면 EXTRACTION_RULE_SET 설정값)"""
+    version = version or OCR_CONFIG["EXTRACTION_RULE_SET"] or DEFAULT_VERSION
+    extractor = _extractors.get(version)
+    if extractor is None:
+        if version not in RULE_SETS:
+            raise ValueError(f"알 수 없는 약품명 추출 규칙 집합입니다: {version}")
+        with _extractors_lock:
+            extractor = _extractors.get(version)
+            if extractor is None:
+                extractor = Extractor(RULE_SETS[version])
+                _extractors[version] = extractor
+    return extractor
+
+
+def extract_medications(text, layout=None, version=None):
+    """기본 추출기로 (코드, 약품명) 목록 추출"""
+    return get_extractor(version).extract(text, layout).medications
+
+
+def extract_codes(text):
+    """질병분류기호/의약품 코드 추출 (정렬된 목록)"""
+    codes = set()
+    for pattern in CODE_PATTERNS:
+        codes.update(match.group() for match in pattern.finditer(text))
+    return sorted(codes)
@@ -0,0 +1,97 @@
+# 처방전 약품명 후보 토크나이저
+# 기존 extract_medications는 정규식 6개(pattern1~6)로 약품 영역을 각각 다시 훑었음
+# 여기서는 미리 컴파일한 정규식 하나로 영역을 한 번만 훑어 후보 자리(9자리 코드, 괄호 코드, 단어 시작)를 찾고,
+# 자리마다 미리보기(lookahead)로 잡아 둔 그룹에서 모든 유형의 후보를 한꺼번에 만듦
+import re
+
+# 한글/영문 한 글자
+_LETTER = "[가-힣A-Za-z]"
+
+# 제형 접미사
+FORM_SUFFIX = "(?:정|캡슐|주사액|시럽|겔|크림|액|패치)"
+
+# 자주 쓰는 약품명 접두어
+NAME_PREFIXES = ("크로", "트라", "노바", "티지", "아토", "피오", "라미", "네시", "메트", "글리", "아스", "카나",
+                 "리", "엔", "코", "다", "자")
+
+# 후보 자리 - 뒤따르는 약품명은 미리보기로만 확인하므로 같은 글자가 다른 유형의 자리로 다시 검사됨
+SITE_PATTERN = re.compile(
+    # 9자리 코드 + 공백 + ('(급여)' 같은 괄호) + 약품명
+    rf"(?P<code>\d{{9}})(?=\s+(?:\({_LETTER}+\))?(?P<code_name>\w+))"
+    # (코드) + 약품명
+    rf"|\((?=\s*(?P<number>\d+)\s*\)\s*(?P<bracket_name>{_LETTER}+))"
+    # 공백 뒤(또는 영역 시작)의 ('(급여)' 같은 괄호) + 한글/영문 단어
+    rf"|(?:(?<=\s)|\A)(?P<paren>\({_LETTER}+\))?(?P<word>{_LETTER}+)"
+)
+
+# 단어가 약품명 형태인지 (단어 시작에 고정하여 검사)
+# NAME: 두 글자 이상 + 제형, LINE: 한 글자 이상 + 제형, PREFIX: 접두어 + 한 글자 이상
+NAME_FORM = re.compile(rf"{_LETTER}{{2,}}{FORM_SUFFIX}")
+LINE_FORM = re.compile(rf"{_LETTER}+{FORM_SUFFIX}")
+PREFIX_FORM = re.compile(rf"(?:{'|'.join(NAME_PREFIXES)}){_LETTER}")
+
+# 숫자 묶음의 시작에서만 시도 (긴 숫자열 뒤에 mg가 없을 때 위치마다 다시 읽지 않도록)
+DOSE_PATTERN = re.compile(r"(?<!\d)\d+(?:\.\d+)?mg")
+
+# 후보 유형
+# CODE: 9자리 코드 + 약품명, NAME: 제형으로 끝나는 약품명, PREFIX: 자주 쓰는 접두어로 시작하는 약품명,
+# NUM: 줄 시작의 (번호) + 약품명, BRACKET: (코드) + 약품명, LINE: 줄 시작의 약품명
+CANDIDATE_TYPES = ("CODE", "NAME", "PREFIX", "NUM", "BRACKET", "LINE")
+
+
+def _accept(name):
+    # "코드"가 들어 있는지만 보면 "사유코드"도 함께 걸러짐
+    return len(name) > 1 and "코드" not in name
+
+
+def _line_start(text, position):
+    """position 앞이 같은 줄의 공백뿐인지 (영역 시작 또는 줄바꿈까지 거슬러 올라감)"""
+    while position and text[position - 1] != "\n" and text[position - 1].isspace():
+        position -= 1
+    return position == 0 or text[position - 1] == "\n"
+
+
+def scan_candidates(section, types=CANDIDATE_TYPES, codes=None):
+    """약품 영역을 한 번 훑어 (유형, 약품명) 후보 집합 반환 - 기존 pattern1~6 정규식 탐색과 같은 결과
+
+    codes(dict)를 주면 CODE 후보의 약품명 -> 9자리 보험 코드를 기록함
+    """
+    want_code, want_name, want_prefix, want_num, want_bracket, want_line = (kind in types for kind in CANDIDATE_TYPES)
+    candidates = set()
+    add = candidates.add
+    # 9자리 코드 뒤 약품명이 끝난 위치 - 그 안에서 시작하는 코드는 건너뜀 (정규식의 겹치지 않는 탐색과 동일)
+    code_end = 0
+    for match in SITE_PATTERN.finditer(section):
+        code, code_name, number, bracket_name, paren, word = match.groups()
+        if word is not None:
+            # 제형 접미사는 최소 한 글자라 세 글자 이상인 단어만 NAME이 될 수 있음
+            if want_name and len(word) > 2:
+                name_match = NAME_FORM.match(word)
+                if name_match and _accept(name_match.group()):
+                    add(("NAME", name_match.group()))
+            if want_prefix and word.startswith(NAME_PREFIXES) and PREFIX_FORM.match(word) and _accept(word):
+                add(("PREFIX", word))
+            # 줄 시작 약품명은 괄호 없이 단어로 시작해야 함
+            # (줄 시작 확인은 파이썬 반복이라 제형으로 끝나는 단어만 확인)
+            if want_line and paren is None:
+                line_match = LINE_FORM.match(word)
+                if line_match and _accept(line_match.group()) and _line_start(section, match.start()):
+                    add(("LINE", line_match.group()))
+
+        elif code is not None:
+            if want_code and match.start() >= code_end:
+                code_end = match.end("code_name")
+                # 숫자가 섞일 수 있는 유형이라 용량 정보 제거
+                name = DOSE_PATTERN.sub("", code_name) if "mg" in code_name else code_name
+                if _accept(name):
+                    add(("CODE", name))
+                    if codes is not None:
+                        codes[name] = code
+
+        elif _accept(bracket_name):
+            if want_bracket:
+                add(("BRACKET", bracket_name))
+            # 줄 시작의 (번호)는 ASCII 숫자만 허용
+            if want_num and number.isascii() and _line_start(section, match.start()):
+                add(("NUM", bracket_name))
+    return candidates
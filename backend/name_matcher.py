@@ -0,0 +1,109 @@
+# 약품명 사전 매칭
+# OCR 오인식 보정표와 표준 약품명 목록을 시작할 때 Aho-Corasick 오토마톤으로 한 번 만들어 두고,
+# 후보 약품명마다 사전 항목을 하나씩 비교하는 대신 후보 글자 수만큼 한 번만 훑어 일치하는 항목을 찾음
+from collections import deque
+
+
+class AhoCorasick:
+    """문자열 집합 다중 검색 - 입력을 한 번 훑어 포함된 항목 중 목록에서 가장 앞선 항목의 번호를 찾음"""
+
+    def __init__(self, words):
+        # 상태별 다음 상태, 실패 링크, 이 상태에서 끝나는(실패 링크로 이어진 것 포함) 항목 중 가장 앞선 번호
+        self.goto = [{}]
+        self.fail = [0]
+        self.first = [None]
+        for index, word in enumerate(words):
+            if not word:
+                continue
+            state = 0
+            for char in word:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.first.append(None)
+                state = next_state
+            if self.first[state] is None:
+                self.first[state] = index
+
+        # 너비 우선으로 실패 링크를 잇고, 실패 링크 쪽 항목 번호를 합침
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                inherited = self.first[self.fail[next_state]]
+                if inherited is not None and (self.first[next_state] is None or inherited < self.first[next_state]):
+                    self.first[next_state] = inherited
+
+    def first_match(self, text):
+        """text에 포함된 항목 중 가장 앞선 번호 (없으면 None)"""
+        goto, fail, first = self.goto, self.fail, self.first
+        state = 0
+        best = None
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            found = first[state]
+            if found is not None and (best is None or found < best):
+                best = found
+                if best == 0:
+                    break
+        return best
+
+
+class CorrectionTable:
+    """OCR 오인식 보정표 - 보정표에서 가장 먼저 나오는 오인식 표기 하나를 찾아 모두 바꿈 (순서대로 비교하던 기존 방식과 같은 결과)"""
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.automaton = AhoCorasick([wrong for wrong, _ in self.items])
+
+    def correct(self, name):
+        index = self.automaton.first_match(name)
+        if index is None:
+            return name
+        wrong, correct = self.items[index]
+        return name.replace(wrong, correct)
+
+
+class StandardNames:
+    """표준 약품명 목록 - 후보에 포함되거나 후보를 포함하는 표준 약품명 중 목록에서 가장 먼저 나오는 것을 찾음
+
+    후보를 포함하는 표준명은 표준명의 모든 부분 문자열 -> 가장 앞선 번호 사전으로 한 번에 찾음
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.exact = set(self.names)
+        self.automaton = AhoCorasick(self.names)
+        # 빈 문자열은 모든 표준명에 포함됨
+        self.containing = {"": 0} if self.names else {}
+        for index, name in enumerate(self.names):
+            for start in range(len(name)):
+                for end in range(start + 1, len(name) + 1):
+                    self.containing.setdefault(name[start:end], index)
+
+    def __contains__(self, name):
+        return name in self.exact
+
+    def __len__(self):
+        return len(self.names)
+
+    def find(self, name):
+        """name에 포함되거나 name을 포함하는 표준 약품명 (없으면 None)"""
+        inside = self.automaton.first_match(name)
+        around = self.containing.get(name)
+        if inside is None and around is None:
+            return None
+        if inside is None or (around is not None and around < inside):
+            return self.names[around]
+        return self.names[inside]
@@ -0,0 +1,104 @@
+# 업스테이지 OCR HTTP 클라이언트
+# 프로세스 단위로 keep-alive 연결 풀을 공유하여 요청마다 TCP/TLS 핸드셰이크를 반복하지 않음
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import get_api_keys, get_ocr_config
+
+API_KEYS = get_api_keys()
+OCR_CONFIG = get_ocr_config()
+
+# 모듈 전역 클라이언트 (지연 생성)
+_session = None
+_session_lock = threading.Lock()
+_async_client = None
+
+
+def get_timeout():
+    """(연결, 읽기) 타임아웃 반환"""
+    return (OCR_CONFIG["OCR_CONNECT_TIMEOUT"], OCR_CONFIG["OCR_READ_TIMEOUT"])
+
+
+def get_session():
+    """keep-alive 연결 풀을 가진 동기 세션 반환"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                pool_size = OCR_CONFIG["OCR_POOL_SIZE"]
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_async_client():
+    """keep-alive 연결 풀을 가진 비동기 클라이언트 반환 (httpx 필요)"""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        import httpx
+
+        pool_size = OCR_CONFIG["OCR_POOL_SIZE"]
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(OCR_CONFIG["OCR_READ_TIMEOUT"], connect=OCR_CONFIG["OCR_CONNECT_TIMEOUT"]),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+    return _async_client
+
+
+def _auth_headers(api_key=None):
+    """인증 헤더 생성 (api_key 미지정 시 config 값 사용)"""
+    return {"Authorization": f"Bearer {api_key or API_KEYS['UPSTAGE_API_KEY']}"}
+
+
+def parse_ocr_text(result):
+    """OCR 응답 JSON에서 텍스트 추출 (페이지별 텍스트가 있으면 합치기)"""
+    recognized_text = result.get("text", "")
+    if "pages" in result:
+        pages_text = [page.get("text", "") for page in result["pages"]]
+        if any(pages_text):
+            recognized_text = "\n".join(filter(None, pages_text))
+    return recognized_text
+
+
+def request_ocr(img_bytes, filename="image.png", mime_type="image/png", api_key=None):
+    """OCR API 동기 호출 - 성공 시 응답 JSON 반환, 실패 시 예외 발생"""
+    response = get_session().post(
+        OCR_CONFIG["UPSTAGE_OCR_URL"],
+        headers=_auth_headers(api_key),
+        files={"document": (filename, img_bytes, mime_type)},
+        data={"model": "ocr"},
+        timeout=get_timeout())
+    response.raise_for_status()
+    return response.json()
+
+
+async def request_ocr_async(img_bytes, filename="image.png", mime_type="image/png", api_key=None):
+    """OCR API 비동기 호출 - 성공 시 응답 JSON 반환, 실패 시 예외 발생"""
+    response = await get_async_client().post(
+        OCR_CONFIG["UPSTAGE_OCR_URL"],
+        headers=_auth_headers(api_key),
+        files={"document": (filename, img_bytes, mime_type)},
+        data={"model": "ocr"})
+    response.raise_for_status()
+    return response.json()
+
+
+def close():
+    """동기 세션 종료"""
+    global _session
+    if _session is not None:
+        _session.close()
+        _session = None
+
+
+async def aclose():
+    """비동기 클라이언트 종료"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
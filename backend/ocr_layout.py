@@ -0,0 +1,175 @@
+# OCR 단어 위치/신뢰도 정보
+# 단어마다 dict를 만들지 않고 NumPy 열(column) 배열로 보관하여 페이지당 메모리 사용량을 작고 예측 가능하게 유지
+# 좌표는 OCR에 넘긴 원본 이미지 기준 0~1 정규화 값 (x0, y0, x1, y1)
+import base64
+
+import numpy as np
+
+
+def _encode(array):
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii")
+
+
+def _decode(data, dtype, shape=None):
+    array = np.frombuffer(base64.b64decode(data), dtype=dtype)
+    return array.reshape(shape) if shape else array
+
+
+class OcrLayout:
+    """단어 단위 OCR 결과 - 텍스트는 하나의 문자열 + 오프셋, 좌표/신뢰도/페이지는 배열"""
+
+    def __init__(self, words_text, offsets, page, boxes, confidence, page_sizes, meta=None):
+        self.words_text = words_text
+        self.offsets = np.asarray(offsets, dtype=np.uint32)
+        self.page = np.asarray(page, dtype=np.uint16)
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.confidence = np.asarray(confidence, dtype=np.float32)
+        self.page_sizes = [tuple(size) for size in page_sizes]
+        # 요청 정보 (업로드 크기, 추정 글자 높이 등)
+        self.meta = meta or {}
+
+    @classmethod
+    def empty(cls):
+        return cls("", [0], [], np.zeros((0, 4)), [], [])
+
+    @classmethod
+    def from_words(cls, words, page_sizes, meta=None):
+        """[(텍스트, (x0, y0, x1, y1), 신뢰도, 페이지)] 목록으로 생성"""
+        texts, page, boxes, confidence = [], [], [], []
+        for text, box, conf, page_index in words:
+            texts.append(text)
+            boxes.append(box)
+            confidence.append(conf if conf is not None else np.nan)
+            page.append(page_index)
+        offsets = np.zeros(len(texts) + 1, dtype=np.uint32)
+        np.cumsum([len(text) for text in texts], out=offsets[1:])
+        return cls("".join(texts), offsets, page, np.array(boxes, dtype=np.float32).reshape(-1, 4), confidence, page_sizes, meta)
+
+    @classmethod
+    def from_upstage(cls, result, region=None, image_size=None, meta=None):
+        """업스테이지 OCR 응답에서 생성
+
+        region: OCR 전에 잘라낸 영역 (left, top, right, bottom) - 지정하면 image_size 기준 좌표로 변환
+        """
+        words, page_sizes = [], []
+        for page_index, page in enumerate(result.get("pages", [])):
+            width = float(page.get("width") or 1)
+            height = float(page.get("height") or 1)
+            page_sizes.append((width, height))
+            for word in page.get("words", []):
+                vertices = word.get("boundingBox", {}).get("vertices", [])
+                if not vertices:
+                    continue
+                xs = [vertex.get("x", 0) for vertex in vertices]
+                ys = [vertex.get("y", 0) for vertex in vertices]
+                box = (min(xs) / width, min(ys) / height, max(xs) / width, max(ys) / height)
+                words.append((word.get("text", ""), box, word.get("confidence"), page_index))
+        layout = cls.from_words(words, page_sizes, meta)
+        if region is not None and image_size is not None:
+            layout = layout.remap(region, image_size)
+        return layout
+
+    def remap(self, region, image_size):
+        """잘라낸 영역 기준 좌표를 원본 이미지 기준 좌표로 변환"""
+        left, top, right, bottom = region
+        width, height = image_size
+        scale = np.array([(right - left) / width, (bottom - top) / height] * 2, dtype=np.float32)
+        offset = np.array([left / width, top / height] * 2, dtype=np.float32)
+        page_sizes = [image_size for _ in self.page_sizes]
+        return OcrLayout(self.words_text, self.offsets, self.page, self.boxes * scale + offset, self.confidence, page_sizes, self.meta)
+
+    @classmethod
+    def concat(cls, layouts):
+        """페이지별 결과를 페이지 번호를 이어 붙여 하나로 합치기"""
+        layouts = [layout for layout in layouts if layout is not None]
+        if not layouts:
+            return cls.empty()
+        texts, offsets, pages, page_sizes = [], [np.zeros(1, dtype=np.uint32)], [], []
+        text_base, page_base = 0, 0
+        for layout in layouts:
+            texts.append(layout.words_text)
+            offsets.append(layout.offsets[1:] + text_base)
+            pages.append(layout.page + page_base)
+            page_sizes.extend(layout.page_sizes)
+            text_base += len(layout.words_text)
+            page_base += max(len(layout.page_sizes), 1)
+        return cls(
+            "".join(texts),
+            np.concatenate(offsets),
+            np.concatenate(pages),
+            np.concatenate([layout.boxes for layout in layouts]),
+            np.concatenate([layout.confidence for layout in layouts]),
+            page_sizes,
+            {"pages": [layout.meta for layout in layouts]})
+
+    def __len__(self):
+        return len(self.confidence)
+
+    def word(self, index):
+        """index번째 단어 텍스트"""
+        return self.words_text[self.offsets[index]:self.offsets[index + 1]]
+
+    def words(self, page=None):
+        """(텍스트, 상자, 신뢰도, 페이지) 순회"""
+        for index in range(len(self)):
+            if page is None or self.page[index] == page:
+                confidence = float(self.confidence[index])
+                # 신뢰도가 없는 단어는 NaN으로 저장되어 있음
+                yield (self.word(index), tuple(self.boxes[index].tolist()),
+                       None if np.isnan(confidence) else confidence, int(self.page[index]))
+
+    def replace_words(self, replacements):
+        """{단어 인덱스: (새 텍스트, 새 신뢰도)}를 반영한 새 OcrLayout 반환 (좌표는 유지)"""
+        texts = [replacements[index][0] if index in replacements else self.word(index) for index in range(len(self))]
+        offsets = np.zeros(len(texts) + 1, dtype=np.uint32)
+        np.cumsum([len(text) for text in texts], out=offsets[1:])
+        confidence = self.confidence.copy()
+        for index, (_, new_confidence) in replacements.items():
+            confidence[index] = new_confidence if new_confidence is not None else np.nan
+        return OcrLayout("".join(texts), offsets, self.page, self.boxes, confidence, self.page_sizes, dict(self.meta))
+
+    @property
+    def nbytes(self):
+        """배열과 텍스트가 차지하는 대략적인 메모리 (bytes)"""
+        arrays = (self.offsets, self.page, self.boxes, self.confidence)
+        return sum(array.nbytes for array in arrays) + len(self.words_text.encode("utf-8"))
+
+    def to_dict(self):
+        """캐시 저장용 직렬화 (배열은 base64)"""
+        return {
+            "version": 1,
+            "words_text": self.words_text,
+            "offsets": _encode(self.offsets),
+            "page": _encode(self.page),
+            "boxes": _encode(self.boxes),
+            "confidence": _encode(self.confidence),
+            "page_sizes": self.page_sizes,
+            "meta": self.meta,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return None
+        return cls(
+            data["words_text"],
+            _decode(data["offsets"], np.uint32),
+            _decode(data["page"], np.uint16),
+            _decode(data["boxes"], np.float32, (-1, 4)),
+            _decode(data["confidence"], np.float32),
+            data["page_sizes"],
+            data.get("meta"))
+
+
+def to_cache_value(text, layout):
+    """OCR 캐시 저장값 - 텍스트와 단어 위치를 함께 보관"""
+    return {"text": text, "layout": layout.to_dict() if layout is not None else None}
+
+
+def from_cache_value(value):
+    """OCR 캐시 값에서 (텍스트, OcrLayout 또는 None) 복원 - 텍스트만 저장된 이전 항목도 처리"""
+    if value is None:
+        return None, None
+    if isinstance(value, str):
+        return value, None
+    return value["text"], OcrLayout.from_dict(value.get("layout"))
@@ -0,0 +1,90 @@
+# 고해상도 스캔 타일 분할 및 결과 합치기
+# 큰 페이지를 겹치는 타일로 나누어 따로 OCR한 뒤, 겹친 영역에서 두 번 인식된 단어는
+# 타일 가장자리에서 더 먼(잘리지 않았을 가능성이 높은) 쪽만 남기고 페이지 텍스트/좌표를 다시 만듦
+import math
+
+import numpy as np
+
+import prescription_table
+from ocr_layout import OcrLayout
+
+
+def _tile_starts(length, tile_size, overlap):
+    """한 축의 타일 시작 위치 - 마지막 타일이 끝에 맞도록 균등 배치"""
+    if length <= tile_size:
+        return [0]
+    count = math.ceil((length - tile_size) / (tile_size - overlap)) + 1
+    return [round(index * (length - tile_size) / (count - 1)) for index in range(count)]
+
+
+def tile_boxes(size, tile_size, overlap):
+    """페이지를 덮는 타일 영역 [(left, top, right, bottom)] - 이웃 타일은 최소 overlap 픽셀씩 겹침"""
+    width, height = size
+    overlap = min(overlap, tile_size // 2)
+    return [
+        (left, top, min(left + tile_size, width), min(top + tile_size, height))
+        for top in _tile_starts(height, tile_size, overlap)
+        for left in _tile_starts(width, tile_size, overlap)
+    ]
+
+
+def _edge_margins(boxes, tiles, tile_index, size):
+    """각 단어가 자기 타일의 안쪽 경계(페이지 가장자리가 아닌 경계)에서 떨어진 거리 (픽셀)"""
+    width, height = size
+    scale = np.array([width, height, width, height], dtype=np.float32)
+    words = boxes * scale
+    own = tiles[tile_index].astype(np.float32)
+    distances = np.stack([
+        words[:, 0] - own[:, 0],
+        words[:, 1] - own[:, 1],
+        own[:, 2] - words[:, 2],
+        own[:, 3] - words[:, 3],
+    ], axis=1)
+    inner = np.stack([own[:, 0] > 0, own[:, 1] > 0, own[:, 2] < width, own[:, 3] < height], axis=1)
+    return np.where(inner, distances, np.inf).min(axis=1)
+
+
+def stitch(layouts, tiles, size):
+    """타일별 OcrLayout(타일 기준 좌표)을 페이지 좌표로 합치고 겹친 영역의 중복 단어 제거 - (텍스트, OcrLayout)
+
+    두 개 이상의 타일에 걸친 단어만 비교하며, 다른 타일의 단어와 작은 쪽 면적의 절반 이상 겹치면 같은 단어로 봄
+    """
+    tiles = np.asarray(tiles, dtype=np.int32).reshape(-1, 4)
+    page_layouts = [layout.remap(tile, size) for layout, tile in zip(layouts, tiles.tolist())]
+    words, tile_index = [], []
+    for index, layout in enumerate(page_layouts):
+        for text, box, confidence, _ in layout.words():
+            words.append((text, box, confidence, 0))
+            tile_index.append(index)
+    if not words:
+        return "", OcrLayout.from_words([], [size])
+
+    tile_index = np.asarray(tile_index)
+    boxes = np.array([box for _, box, _, _ in words], dtype=np.float32)
+    margins = _edge_margins(boxes, tiles, tile_index, size)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    pixels = boxes * np.array([size[0], size[1], size[0], size[1]], dtype=np.float32)
+    shared = ((pixels[:, None, 0] < tiles[None, :, 2]) & (pixels[:, None, 2] > tiles[None, :, 0])
+              & (pixels[:, None, 1] < tiles[None, :, 3]) & (pixels[:, None, 3] > tiles[None, :, 1])).sum(axis=1) > 1
+
+    # 타일 안쪽 깊숙한 단어부터 채택하고, 여러 타일에 걸친 단어만 이미 채택한 단어와 비교
+    keep = np.zeros(len(words), dtype=bool)
+    for index in np.argsort(-margins, kind="stable"):
+        if not shared[index]:
+            keep[index] = True
+            continue
+        others = np.flatnonzero(keep & (tile_index != tile_index[index]))
+        if len(others):
+            box = boxes[index]
+            inter_w = np.clip(np.minimum(box[2], boxes[others, 2]) - np.maximum(box[0], boxes[others, 0]), 0, None)
+            inter_h = np.clip(np.minimum(box[3], boxes[others, 3]) - np.maximum(box[1], boxes[others, 1]), 0, None)
+            smaller = np.minimum(areas[index], areas[others])
+            if np.any(inter_w * inter_h > 0.5 * smaller):
+                continue
+        keep[index] = True
+
+    layout = OcrLayout.from_words([word for word, kept in zip(words, keep) if kept], [size])
+    # 페이지 텍스트는 합쳐진 좌표에서 줄 단위로 다시 만듦
+    rows = prescription_table.group_rows(layout, 0)
+    text = "\n".join(" ".join(layout.word(index) for index in row) for row in rows)
+    return text, layout
@@ -0,0 +1,78 @@
+# 의약품 제품 사전 인덱스 벤치마크
+# 합성 제품 목록(기본 5만 개)으로 인덱스를 빌드하고 파일 크기, 로드 시간, 정확 일치/접두어/EDI 코드/유사 검색 조회 지연시간을 측정
+# 실제 목록이 있으면 --products로 지정
+#
+# 사용법: python benchmarks/drug_index_bench.py [--count 50000] [--products 제품목록.csv] [--lookups 20000]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import drug_index
+import fuzzy_matcher
+
+SYLLABLES = [chr(code) for code in range(0xAC00, 0xAC00 + 600)]
+FORMS = [("정", "정제"), ("캡슐", "경질캡슐"), ("시럽", "시럽제"), ("주사액", "주사제"), ("크림", "크림제")]
+
+
+def synthetic_products(count, seed=0):
+    """실제 제품명 비슷한 합성 제품 목록"""
+    rng = random.Random(seed)
+    products = []
+    for _ in range(count):
+        suffix, form = rng.choice(FORMS)
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 6)))
+        name += f"{suffix}{rng.choice([1, 2.5, 5, 10, 20, 40, 80])}밀리그램"
+        products.append(drug_index.DrugProduct(
+            name, f"{rng.randrange(10 ** 9):09d}", f"{rng.randrange(10 ** 6):06d}ATB", form))
+    return products
+
+
+def per_lookup_us(func, keys):
+    start = time.perf_counter()
+    for key in keys:
+        func(key)
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="의약품 제품 사전 인덱스 벤치마크")
+    parser.add_argument("--count", type=int, default=50000, help="합성 제품 수")
+    parser.add_argument("--products", help="제품 목록 CSV (지정하면 합성 목록 대신 사용)")
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    products = drug_index.read_products(args.products) if args.products else synthetic_products(args.count)
+    path = os.path.join(tempfile.mkdtemp(), "drug_index.bin")
+    start = time.perf_counter()
+    count = drug_index.build(products, path)
+    print(f"빌드: {count}개 제품, {os.path.getsize(path) / 1024:.1f}KB, {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    start = time.perf_counter()
+    index = drug_index.DrugIndex(path)
+    print(f"로드: {(time.perf_counter() - start) * 1000:.3f}ms")
+
+    rng = random.Random(1)
+    names = [rng.choice(products).name for _ in range(args.lookups)]
+    missing = [name[::-1] for name in names]
+    prefixes = [name[:2] for name in names]
+    codes = [rng.choice(products).edi_code for _ in range(args.lookups)]
+    print(f"정확 일치 (있음): {per_lookup_us(index.get, names):.1f}us")
+    print(f"정확 일치 (없음): {per_lookup_us(index.get, missing):.1f}us")
+    print(f"접두어 2글자 (최대 20개): {per_lookup_us(index.prefix, prefixes):.1f}us")
+    print(f"EDI 코드: {per_lookup_us(index.by_code, codes):.1f}us")
+
+    # 인덱스 파일에 저장한 삭제 변형 색인으로 찾으므로 검색기 생성에 사전 크기만큼의 시간/메모리가 들지 않음
+    start = time.perf_counter()
+    matcher = fuzzy_matcher.FuzzyMatcher((), index.fuzzy["max_distance"], index.fuzzy["prefix_length"], index)
+    print(f"유사 검색기 생성: {(time.perf_counter() - start) * 1000:.3f}ms")
+    typos = [name[:1] + chr(ord(name[1]) + 1) + name[2:] for name in names[:2000]]
+    print(f"유사 검색 (한 글자 오인식): {per_lookup_us(matcher.correct, typos):.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# 약품명 추출 엔진 벤치마크
+# 기존 추출기 두 가지와 지금 FastAPI/Streamlit이 함께 쓰는 medication_extraction 엔진(규칙 집합별)을 합성 처방전으로 비교
+# - 기존 FastAPI: medical_functions의 정규식 3개 + 보정표 순차 비교 (규칙 집합 v1이 같은 결과를 냄)
+# - 기존 Streamlit: medical_record_app의 정규식 6개 + 보정표 + 표준 약품명 순차 비교 (기본 규칙 집합 v2가 대체함)
+# - 처방전 한 장당 처리 시간 (첫 회는 엔진의 보정 결과 캐시가 비어 있는 상태), 정답 약품명 재현율과 정답이 아닌 이름 수
+# - PYTHONHASHSEED를 바꾼 프로세스들에서 결과 순서가 같은지 (기존 추출기는 list(set(...))라 순서가 바뀜)
+# 기본 엔진의 장당 시간이 대체한 기존 Streamlit 추출기의 --max-slowdown배(기본 1.0)를 넘으면 실패로 종료함
+# (정규식 3개만 쓰는 기존 FastAPI 추출기와의 비율도 함께 출력 - FastAPI 경로는 v2로 재현율을 얻는 대신 장당 시간이 늘어남)
+#
+# 사용법: python benchmarks/extraction_bench.py [--prescriptions 500] [--repeat 3] [--hash-seeds 4] [--max-slowdown 1.0]
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import medication_extraction
+
+# 기존 FastAPI 추출기 (medical_functions.extract_medications)
+LEGACY_PATTERNS = [
+    r'(\d{9})\s+(?:\([가-힣A-Za-z]+\))?([\w가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치)?)',
+    r'(?:^|\s)(?:\([가-힣A-Za-z]+\))?((?:[가-힣A-Za-z]{2,})+(?:정|캡슐|주사액|시럽|겔|크림|액|패치))',
+    r'\(\s*(\d+)\s*\)\s*([가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치)?)'
+]
+LEGACY_MAPPING = {
+    '노바人크': '노바스크', '노H스크': '노바스크', '노바스코': '노바스크',
+    '트라젠E': '트라젠타', '트라센타': '트라젠타', '트라전타': '트라젠타',
+    '티지패논': '티지페논', '티지례논': '티지페논', '타피페논': '티지페논',
+    '아토맨': '아토렌', '아토렌지': '아토렌',
+    '피오글리치': '피오글리', '피아글리': '피오글리',
+    '크로나': '크로미정', '크로미': '크로미정', '크로미나': '크로미나정',
+    '크래밍': '크래밍정', '스티렌투엑스': '스티렌투엑스정',
+    '모티리톤': '모티리톤정', '인데놀': '인데놀정'
+}
+
+
+def legacy_extract(text):
+    """기존 FastAPI 추출기"""
+    medications = set()
+    med_section_match = re.search(r'처\s*방\s*의\s*약\s*품\s*의\s*명\s*칭.*?(?=동일성분|주사제|$)', text, re.DOTALL)
+    med_section = med_section_match.group(0) if med_section_match else text
+    for pattern in LEGACY_PATTERNS:
+        for match in re.finditer(pattern, med_section):
+            if len(match.groups()) >= 2:
+                med_name = re.sub(r'\d+mg|\d+\.\d+mg', '', match.group(2).strip())
+                if med_name and len(med_name) > 1:
+                    if not any(keyword in med_name for keyword in ["사유코드", "코드"]):
+                        medications.add(("EXTRACTED", med_name))
+    result = []
+    for code, name in medications:
+        clean_name = name.strip()
+        for wrong, correct in LEGACY_MAPPING.items():
+            if wrong in clean_name:
+                clean_name = clean_name.replace(wrong, correct)
+                break
+        clean_name = re.sub(r'\d+', '', clean_name)
+        if not re.search(r'(정|캡슐|주사액|시럽|겔|크림|액|패치)$', clean_name):
+            clean_name += '정'
+        result.append(("UNKNOWN", clean_name))
+    return list(set(result))
+
+
+# 기존 Streamlit 추출기 (medical_record_app.extract_medications) - 정규식 6개 + 보정표 + 표준 약품명 순차 비교
+LEGACY_STREAMLIT_PATTERNS = [
+    ("CODE", r'(\d{9})\s+(?:\([가-힣A-Za-z]+\))?([\w가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치)?)', 2, 0),
+    ("NAME", r'(?:^|\s)(?:\([가-힣A-Za-z]+\))?((?:[가-힣A-Za-z]{2,})+(?:정|캡슐|주사액|시럽|겔|크림|액|패치))', 1, 0),
+    ("PREFIX", r'(?:^|\s)(?:\([가-힣A-Za-z]+\))?((?:크로|트라|노바|티지|아토|피오|라미|네시|메트|글리|아스|카나|리|엔|코|다|자)[가-힣A-Za-z]+)', 1, 0),
+    ("NUM", r'^\s*\(\s*([0-9]+)\s*\)\s*([가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치)?)', 2, re.MULTILINE),
+    ("BRACKET", r'\(\s*(\d+)\s*\)\s*([가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치)?)', 2, 0),
+]
+LEGACY_STREAMLIT_LINE_PATTERN = r'^\s*([가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치))+'
+LEGACY_STREAMLIT_MAPPING = {
+    '노바人크': '노바스크', '노H스크': '노바스크', '노바스코': '노바스크',
+    '트라젠E': '트라젠타', '트라센타': '트라젠타',
+    '티지패논': '티지페논', '티지례논': '티지페논',
+    '아토맨': '아토렌', '아토렌지': '아토렌',
+    '피오글리치': '피오글리', '피아글리': '피오글리',
+    '트라전타': '트라젠타', '타피페논': '티지페논',
+    '크로나': '크로미정', '크로미': '크로미정', '크로미나': '크로미나정',
+    '톡사펜': '톡사펜정', '톡사렌': '톡사렌정', '알도실': '알도실캡슐', '알리나제': '알리나제정',
+    '레커틴': '레커틴정', '레커팅': '레커틴정',
+    '크래밍': '크래밍정', '스티렌투엑스': '스티렌투엑스정', '모티리톤': '모티리톤정', '인데놀': '인데놀정'
+}
+LEGACY_STREAMLIT_STANDARD_NAMES = [
+    "노바스크정", "티지페논정", "아토렌정", "피오글리정", "트라젠타듀오정", "크로미나정", "크로미정", "톡사펜정",
+    "톡사렌정", "알도실캡슐", "알리나제정", "레커틴정", "크래밍정", "스티렌투엑스정", "모티리톤정", "인데놀정",
+]
+
+
+def _legacy_streamlit_add(medications, kind, med_name):
+    med_name = re.sub(r'\d+mg|\d+\.\d+mg', '', med_name.strip())
+    if med_name and len(med_name) > 1:
+        if not any(keyword in med_name for keyword in ["사유코드", "코드"]):
+            medications.add((kind, med_name))
+
+
+def legacy_streamlit_extract(text):
+    """기존 Streamlit 추출기 (st.session_state 기록 제외)"""
+    medications = set()
+    med_section_match = re.search(r'처\s*방\s*의\s*약\s*품\s*의\s*명\s*칭.*?(?=동일성분|주사제|$)', text, re.DOTALL)
+    med_section = med_section_match.group(0) if med_section_match else text
+    for kind, pattern, group, flags in LEGACY_STREAMLIT_PATTERNS:
+        for match in re.finditer(pattern, med_section, flags):
+            _legacy_streamlit_add(medications, kind, match.group(group))
+    for line in med_section.split('\n'):
+        matches = re.match(LEGACY_STREAMLIT_LINE_PATTERN, line)
+        if matches:
+            _legacy_streamlit_add(medications, "LINE", matches.group(1))
+
+    result = []
+    for code, name in medications:
+        clean_name = name.strip()
+        for wrong, correct in LEGACY_STREAMLIT_MAPPING.items():
+            if wrong in clean_name:
+                clean_name = clean_name.replace(wrong, correct)
+                break
+        clean_name = re.sub(r'\d+', '', clean_name)
+        if not re.search(r'(정|캡슐|주사액|시럽|겔|크림|액|패치)$', clean_name):
+            clean_name += '정'
+        if '트라젠타' in clean_name and not '듀오' in clean_name:
+            clean_name = clean_name.replace('트라젠타', '트라젠타듀오')
+        result.append(("UNKNOWN", clean_name))
+
+    unique_names = {}
+    for code, name in result:
+        if name in LEGACY_STREAMLIT_STANDARD_NAMES:
+            unique_names[name] = code
+        else:
+            for suffix in ["정", "캡슐", "주사액", "시럽", "겔", "크림", "액", "패치"]:
+                pattern = f"({suffix}){suffix}$"
+                if re.search(pattern, name):
+                    name = re.sub(pattern, r"\1", name)
+            for std_name in LEGACY_STREAMLIT_STANDARD_NAMES:
+                if std_name in name or name in std_name:
+                    unique_names[std_name] = code
+                    break
+            else:
+                if len(name) > 2:
+                    unique_names[name] = code
+    if len(unique_names) < 2 and len(result) > 0:
+        unique_names[result[0][1]] = result[0][0]
+        for code, name in result[1:]:
+            if name != result[0][1]:
+                unique_names[name] = code
+                break
+    return [(code, name) for name, code in unique_names.items()]
+
+
+# 정답 약품명 -> OCR로 읽힐 수 있는 표기
+SPELLINGS = {
+    "노바스크정": ["노바스크정", "노바人크정", "노H스크정", "노바스코정"],
+    "티지페논정": ["티지페논정", "티지례논정", "타피페논정"],
+    "아토렌정": ["아토렌정", "아토맨정"],
+    "피오글리정": ["피오글리정", "피아글리정"],
+    "트라젠타듀오정": ["트라젠타듀오정", "트라센타듀오정"],
+    "알도실캡슐": ["알도실캡슐", "알도실"],
+    "레커틴정": ["레커틴정", "레커팅정"],
+    "크래밍정": ["크래밍정", "크래밍"],
+    "모티리톤정": ["모티리톤정"],
+    "인데놀정": ["인데놀정", "인데놀"],
+}
+WORDS = ["처방", "투약량", "횟수", "일수", "용법", "식후", "30분", "사유코드"]
+
+
+def synthetic_prescription(rng):
+    """(처방전 OCR 텍스트, 정답 약품명 집합)"""
+    truth = rng.sample(sorted(SPELLINGS), rng.randint(2, 5))
+    lines = ["처 방 의 약 품 의 명 칭", " ".join(rng.sample(WORDS, 4))]
+    for number, name in enumerate(truth, 1):
+        spelling = rng.choice(SPELLINGS[name])
+        dose = f"{rng.choice([5, 10, 20])}mg"
+        code = "".join(rng.choice("0123456789") for _ in range(9))
+        style = rng.randrange(3)
+        if style == 0:
+            lines.append(f"{code} ({rng.choice(['급여', '비급여'])}){spelling}{dose} 1 1 30")
+        elif style == 1:
+            lines.append(f"({number}) {spelling} {dose} 1.00 1 30")
+        else:
+            lines.append(f"{spelling} {dose} 1 1 7")
+    lines.append("동일성분 중복처방 사유")
+    return "\n".join(lines), set(truth)
+
+
+def corpus(count, seed=0):
+    rng = random.Random(seed)
+    return [synthetic_prescription(rng) for _ in range(count)]
+
+
+def extractors():
+    items = [("기존 FastAPI", legacy_extract), ("기존 Streamlit", legacy_streamlit_extract)]
+    for version in sorted(medication_extraction.RULE_SETS):
+        items.append((f"엔진 {version}", medication_extraction.get_extractor(version).extract))
+    return items
+
+
+def evaluate(func, prescriptions, repeat):
+    """(첫 회 처방전당 ms, 처방전당 ms 중앙값, 재현율, 처방전당 정답이 아닌 이름 수)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [func(text) for text, _ in prescriptions]
+        timings.append(time.perf_counter() - start)
+    found = total = extra = 0
+    for result, (_, truth) in zip(results, prescriptions):
+        medications = result.medications if isinstance(result, medication_extraction.Extraction) else result
+        names = {name for _, name in medications}
+        found += len(names & truth)
+        total += len(truth)
+        extra += len(names - truth)
+    per_prescription = [timing / len(prescriptions) * 1000 for timing in timings]
+    return per_prescription[0], sorted(per_prescription)[len(timings) // 2], found / total, extra / len(prescriptions)
+
+
+def probe(count):
+    """결과 순서 확인용 - 추출기별 결과를 JSON으로 출력"""
+    prescriptions = corpus(count)
+    output = {}
+    for label, func in extractors():
+        output[label] = []
+        for text, _ in prescriptions:
+            result = func(text)
+            medications = result.medications if isinstance(result, medication_extraction.Extraction) else result
+            output[label].append(medications)
+    print(json.dumps(output, ensure_ascii=False))
+
+
+def order_stability(seeds, count):
+    """PYTHONHASHSEED를 바꾼 프로세스들에서 추출기별로 결과 순서까지 같은 처방전 비율"""
+    outputs = []
+    for seed in range(seeds):
+        env = dict(os.environ, PYTHONHASHSEED=str(seed))
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), "--probe", str(count)],
+                                 env=env, capture_output=True, text=True, check=True)
+        outputs.append(json.loads(process.stdout))
+    stability = {}
+    for label in outputs[0]:
+        same = sum(1 for index in range(count) if all(output[label][index] == outputs[0][label][index] for output in outputs))
+        stability[label] = same / count
+    return stability
+
+
+def main():
+    parser = argparse.ArgumentParser(description="약품명 추출 엔진 벤치마크")
+    parser.add_argument("--prescriptions", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--hash-seeds", type=int, default=4, help="결과 순서를 비교할 프로세스 수 (0이면 생략)")
+    parser.add_argument("--max-slowdown", type=float, default=1.0, help="허용할 기본 엔진/기존 Streamlit 추출기 장당 시간 비율")
+    parser.add_argument("--probe", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        probe(args.probe)
+        return
+
+    prescriptions = corpus(args.prescriptions)
+    stability = order_stability(args.hash_seeds, min(args.prescriptions, 100)) if args.hash_seeds > 1 else {}
+    print(f"{'추출기':<14} {'첫 회 ms':>8} {'장당 ms':>8} {'재현율':>7} {'오검출/장':>9} {'순서 일치':>9}")
+    timings = {}
+    for label, func in extractors():
+        first, milliseconds, recall, extra = evaluate(func, prescriptions, args.repeat)
+        timings[label] = milliseconds
+        order = f"{stability[label]:.0%}" if label in stability else "-"
+        print(f"{label:<14} {first:>8.3f} {milliseconds:>8.3f} {recall:>7.1%} {extra:>9.2f} {order:>9}")
+
+    # 기본 엔진이 대체한 기존 Streamlit 추출기보다 느려지지 않았는지, 기존 FastAPI 추출기 대비 얼마나 느린지
+    default = timings[f"엔진 {medication_extraction.get_extractor().rule_set.version}"]
+    slowdown = default / timings["기존 Streamlit"]
+    print(f"\n기본 엔진 / 기존 Streamlit 추출기 장당 시간: {slowdown:.2f}배 (허용 {args.max_slowdown:.2f}배)")
+    print(f"기본 엔진 / 기존 FastAPI 추출기 장당 시간: {default / timings['기존 FastAPI']:.2f}배")
+    if slowdown > args.max_slowdown:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# 업로드 이미지 디코딩 벤치마크
+# 크기별(2/12/24/48MP) 합성 JPEG 사진에서 전체 디코딩과 draft 모드 축소 디코딩(image_preprocess.open_image)의
+# 디코딩 시간과 최대 메모리(RSS 증가량)를 측정 - 최대 메모리는 측정마다 새 프로세스에서 잼
+# draft는 긴 변 상한만 적용, adaptive는 글자 높이로 정한 업로드 해상도까지만 디코딩 (OCR_DECODE_ADAPTIVE 기본값)
+#
+# 사용법: python benchmarks/image_decode_bench.py [--repeat 3] [--max-side 3000] [--sizes 2,12,24,48]
+import argparse
+import glob
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image
+
+import image_preprocess
+
+# 크기 분류 (MP) -> 4:3 사진 크기
+SIZE_CLASSES = {
+    2: (1632, 1224),
+    12: (4000, 3000),
+    24: (5664, 4248),
+    48: (8000, 6000),
+}
+
+
+def _max_rss_mb():
+    """현재 프로세스의 최대 RSS (MB)
+
+    Linux의 ru_maxrss는 부모 프로세스의 최대값을 물려받으므로 /proc의 VmHWM을 우선 사용
+    (macOS의 ru_maxrss는 bytes 단위)
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def make_photo(size, source=None, quality=90):
+    """처방전 샘플(없으면 빈 종이)을 늘려 휴대폰 사진 크기의 JPEG 바이트 생성"""
+    if source:
+        image = Image.open(source).convert("RGB").resize(size, Image.BILINEAR)
+    else:
+        image = Image.new("RGB", size, (235, 232, 225))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def full_decode(data, max_side):
+    """기존 방식 - 원본 해상도 전체 디코딩 (Image.open + load)"""
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def draft_decode(data, max_side):
+    """draft 모드 - 긴 변 상한(max_side)과 흑백으로만 디코딩"""
+    image = image_preprocess.open_image(data, max_side, "L", adaptive=False)
+    image.load()
+    return image
+
+
+def adaptive_decode(data, max_side):
+    """draft 모드 - 미리보기로 추정한 글자 높이에 맞춘 업로드 해상도까지만 디코딩 (미리보기 디코딩 포함)"""
+    image = image_preprocess.open_image(data, max_side, "L", adaptive=True)
+    image.load()
+    return image
+
+
+METHODS = {"full": full_decode, "draft": draft_decode, "adaptive": adaptive_decode}
+
+
+def _measure(method, data, max_side, queue):
+    """새 프로세스에서 한 번 디코딩하여 (디코딩 ms, 후처리 포함 ms, RSS 증가 MB, 디코딩 크기) 반환"""
+    before = _max_rss_mb()
+    start = time.perf_counter()
+    image = METHODS[method](data, max_side)
+    decoded = time.perf_counter() - start
+    # OCR 업로드 전 처리 (흑백 변환 + 업로드 크기로 축소)
+    gray = image if image.mode == "L" else image.convert("L")
+    gray.resize(image_preprocess.fit_size(gray.size, (max_side, max_side)), Image.BILINEAR)
+    total = time.perf_counter() - start
+    queue.put((decoded * 1000, total * 1000, _max_rss_mb() - before, image.size))
+
+
+def measure(method, data, max_side):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(method, data, max_side, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="업로드 이미지 디코딩 벤치마크")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-side", type=int, default=3000, help="draft 모드 디코딩 최대 긴 변 px")
+    parser.add_argument("--sizes", default="2,12,24,48", help="측정할 크기 분류 (MP, 쉼표 구분)")
+    parser.add_argument("--samples", default=os.path.join(ROOT, "samples", "*.png"))
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.samples))
+    source = paths[0] if paths else None
+    print(f"원본: {source or '빈 종이'}, draft 최대 긴 변: {args.max_side}px, 반복: {args.repeat}")
+    print(f"{'크기':>6} {'방식':>6} {'JPEG KB':>8} {'디코딩 크기':>12} {'디코딩 ms':>10} {'전체 ms':>9} {'최대 메모리 MB':>14}")
+    for megapixels in (int(size) for size in args.sizes.split(",")):
+        data = make_photo(SIZE_CLASSES[megapixels], source)
+        for method in METHODS:
+            results = [measure(method, data, args.max_side) for _ in range(args.repeat)]
+            decoded = sorted(result[0] for result in results)[len(results) // 2]
+            total = sorted(result[1] for result in results)[len(results) // 2]
+            peak = max(result[2] for result in results)
+            size = "x".join(str(value) for value in results[0][3])
+            print(f"{megapixels:>4}MP {method:>6} {len(data) / 1024:>8.0f} {size:>12} {decoded:>10.1f} {total:>9.1f} {peak:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
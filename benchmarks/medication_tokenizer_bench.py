@@ -0,0 +1,142 @@
+# 약품명 후보 추출 벤치마크
+# 기존 방식(정규식 6개를 차례로 적용)과 medication_tokenizer(한 번 훑기)의 처리량을 1KB~1MB 합성 OCR 텍스트로 비교하고,
+# --verify를 주면 무작위 텍스트에서 두 방식의 후보 집합이 같은지 확인
+#
+# 사용법: python benchmarks/medication_tokenizer_bench.py [--sizes 1,10,100,1000] [--repeat 3] [--verify 20000]
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import medication_tokenizer
+
+# 기존 extract_medications의 패턴 (medical_record_app.py)
+LEGACY_PATTERNS = [
+    ("CODE", r'(\d{9})\s+(?:\([가-힣A-Za-z]+\))?([\w가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치)?)', 2, 0),
+    ("NAME", r'(?:^|\s)(?:\([가-힣A-Za-z]+\))?((?:[가-힣A-Za-z]{2,})+(?:정|캡슐|주사액|시럽|겔|크림|액|패치))', 1, 0),
+    ("PREFIX", r'(?:^|\s)(?:\([가-힣A-Za-z]+\))?((?:크로|트라|노바|티지|아토|피오|라미|네시|메트|글리|아스|카나|리|엔|코|다|자)[가-힣A-Za-z]+)', 1, 0),
+    ("NUM", r'^\s*\(\s*([0-9]+)\s*\)\s*([가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치)?)', 2, re.MULTILINE),
+    ("BRACKET", r'\(\s*(\d+)\s*\)\s*([가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치)?)', 2, 0),
+]
+LEGACY_LINE_PATTERN = r'^\s*([가-힣A-Za-z]+(?:정|캡슐|주사액|시럽|겔|크림|액|패치))+'
+
+
+def legacy_candidates(section):
+    """기존 방식 - 패턴마다 영역 전체를 다시 훑고, 패턴 6은 줄마다 적용"""
+    medications = set()
+    for kind, pattern, group, flags in LEGACY_PATTERNS:
+        for match in re.finditer(pattern, section, flags):
+            med_name = re.sub(r'\d+mg|\d+\.\d+mg', '', match.group(group).strip())
+            if med_name and len(med_name) > 1:
+                if not any(keyword in med_name for keyword in ["사유코드", "코드"]):
+                    medications.add((kind, med_name))
+    for line in section.split('\n'):
+        matches = re.match(LEGACY_LINE_PATTERN, line)
+        if matches:
+            med_name = re.sub(r'\d+mg|\d+\.\d+mg', '', matches.group(1).strip())
+            if med_name and len(med_name) > 1:
+                if not any(keyword in med_name for keyword in ["사유코드", "코드"]):
+                    medications.add(("LINE", med_name))
+    return medications
+
+
+NAMES = ["노바스크정", "티지페논정", "아토렌정", "피오글리정", "트라젠타듀오정", "크로미나정", "알도실캡슐",
+         "레커틴정", "크래밍정", "스티렌투엑스정", "모티리톤정", "인데놀정", "노바人크", "트라센타"]
+WORDS = ["처방", "의약품", "명칭", "1회", "투약량", "횟수", "일수", "급여", "용법", "식후", "30분", "사유코드"]
+
+
+def synthetic_line(rng):
+    """처방전 약품 표 한 줄 비슷한 OCR 텍스트"""
+    name = rng.choice(NAMES)
+    dose = f"{rng.choice([5, 10, 20, 625])}mg"
+    code = "".join(rng.choice("0123456789") for _ in range(9))
+    style = rng.randrange(4)
+    if style == 0:
+        line = f"{code} ({rng.choice(['급여', '비급여'])}){name}{dose} 1 {rng.randint(1, 3)} {rng.randint(1, 30)}"
+    elif style == 1:
+        line = f"({rng.randint(1, 20)}) {name} {dose} 1.00 {rng.randint(1, 3)} {rng.randint(1, 30)}"
+    elif style == 2:
+        line = f"({code[:8]}){name}{dose} 1 1 7"
+    else:
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8)))
+    return line
+
+
+def synthetic_text(size, seed=0):
+    """size 바이트(UTF-8) 안팎의 합성 약품 영역 텍스트"""
+    rng = random.Random(seed)
+    lines = ["처 방 의 약 품 의 명 칭"]
+    total = 0
+    while total < size:
+        line = synthetic_line(rng)
+        lines.append(line)
+        total += len(line.encode("utf-8")) + 1
+    return "\n".join(lines)
+
+
+def random_text(rng, length):
+    """경계 사례를 찾기 위한 무작위 텍스트"""
+    alphabet = ["가", "나", "정", "캡", "슐", "주", "사", "액", "크", "로", "리", "코", "드", "A", "m", "g",
+                "(", ")", " ", "\n", "\t", "1", "2", "9", "0", ".", "_", "人", "١", "-", "\r"]
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def verify(cases, seed=0):
+    """무작위 텍스트와 9자리 코드가 섞인 텍스트에서 두 방식의 결과 비교 - 다른 사례 수 반환"""
+    rng = random.Random(seed)
+    mismatches = 0
+    for case in range(cases):
+        if case % 2:
+            text = random_text(rng, rng.randint(0, 60))
+        else:
+            parts = [rng.choice(["123456789", "1234567890", "(12)", "( 3 )", "(급여)", "\n", " ", "  "]
+                                + NAMES + WORDS) for _ in range(rng.randint(1, 12))]
+            text = "".join(parts)
+        expected = legacy_candidates(text)
+        actual = medication_tokenizer.scan_candidates(text)
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"불일치: {text!r}\n  기존: {sorted(expected)}\n  토큰: {sorted(actual)}")
+    return mismatches
+
+
+def measure(func, text, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="약품명 후보 추출 벤치마크")
+    parser.add_argument("--sizes", default="1,10,100,1000", help="텍스트 크기 (KB, 쉼표 구분)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--verify", type=int, default=0, help="무작위 텍스트로 결과 일치 확인할 사례 수")
+    args = parser.parse_args()
+
+    if args.verify:
+        mismatches = verify(args.verify)
+        print(f"결과 일치 확인: {args.verify - mismatches}/{args.verify}")
+
+    print(f"{'크기':>8} {'후보 수':>7} {'기존 ms':>9} {'토큰 ms':>9} {'기존 MB/s':>10} {'토큰 MB/s':>10}")
+    for kilobytes in (int(size) for size in args.sizes.split(",")):
+        text = synthetic_text(kilobytes * 1024)
+        megabytes = len(text.encode("utf-8")) / (1024 * 1024)
+        legacy = measure(legacy_candidates, text, args.repeat)
+        tokenizer = measure(medication_tokenizer.scan_candidates, text, args.repeat)
+        if legacy_candidates(text) != medication_tokenizer.scan_candidates(text):
+            print(f"{kilobytes}KB: 결과가 다릅니다")
+        count = len(medication_tokenizer.scan_candidates(text))
+        print(f"{kilobytes:>6}KB {count:>7} {legacy * 1000:>9.1f} {tokenizer * 1000:>9.1f} "
+              f"{megabytes / legacy:>10.1f} {megabytes / tokenizer:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
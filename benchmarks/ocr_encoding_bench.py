@@ -0,0 +1,76 @@
+# OCR 업로드 인코딩 벤치마크
+# samples/*.png 이미지마다 형식별 인코딩 시간, 업로드 크기, (API 키가 있으면) OCR 왕복 시간을 측정
+#
+# 사용법: python benchmarks/ocr_encoding_bench.py [--ocr] [--repeat 5] [--quality 85]
+import argparse
+import difflib
+import glob
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import image_preprocess
+import ocr_client
+
+
+def legacy_png(image):
+    """기존 방식 (PNG optimize=True) 인코딩"""
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True, quality=80)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR 업로드 인코딩 벤치마크")
+    parser.add_argument("--ocr", action="store_true", help="업스테이지 OCR 왕복 시간도 측정 (UPSTAGE_API_KEY 필요)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quality", type=int, default=None)
+    parser.add_argument("--samples", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "samples", "*.png"))
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.samples))
+    if not paths:
+        print(f"샘플 이미지가 없습니다: {args.samples}")
+        return
+
+    print(f"{'sample':<20} {'format':<12} {'encode_ms':>10} {'bytes':>10} {'ocr_ms':>10} {'similarity':>11}")
+    for path in paths:
+        image = image_preprocess.resize_for_ocr(Image.open(path))
+        image.load()
+
+        # 기준: 기존 PNG optimize 인코딩
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            baseline_bytes = legacy_png(image)
+            timings.append((time.perf_counter() - start) * 1000)
+        rows = [("png-optimize", sorted(timings)[len(timings) // 2], baseline_bytes, "image.png", "image/png")]
+
+        for fmt, result in image_preprocess.benchmark_encoding(image, repeat=args.repeat, quality=args.quality).items():
+            img_bytes, filename, mime_type = image_preprocess.encode_for_ocr(image, fmt, args.quality)
+            rows.append((fmt, result["encode_ms"], img_bytes, filename, mime_type))
+
+        baseline_text = None
+        for fmt, encode_ms, img_bytes, filename, mime_type in rows:
+            ocr_ms, similarity = "-", "-"
+            if args.ocr:
+                start = time.perf_counter()
+                try:
+                    text = ocr_client.parse_ocr_text(ocr_client.request_ocr(img_bytes, filename, mime_type))
+                except Exception as e:
+                    print(f"OCR 호출 실패 ({fmt}): {str(e)}")
+                    text = ""
+                ocr_ms = f"{(time.perf_counter() - start) * 1000:.0f}"
+                if baseline_text is None:
+                    baseline_text = text
+                similarity = f"{difflib.SequenceMatcher(None, baseline_text, text).ratio():.3f}"
+            print(f"{os.path.basename(path):<20} {fmt:<12} {encode_ms:>10.1f} {len(img_bytes):>10} {ocr_ms:>10} {similarity:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# 최악 입력/퍼징 벤치마크 (정규식 역추적)
+# 긴 한글 줄, 닫히지 않은 괄호, mg 없는 긴 숫자열처럼 OCR이 만들 수 있는 적대적 텍스트를 크기별로 만들어
+# 약품명 추출(규칙 집합별), 코드 추출, 텍스트 정제의 KB당 처리 시간을 측정
+# 입력이 커져도 KB당 시간이 거의 같아야 함 (크기에 비례 - 가장 큰 입력과 가장 작은 입력의 KB당 시간 비율을 함께 출력)
+# --legacy를 주면 기존 pattern2(중첩 반복)를 별도 프로세스에서 제한 시간과 함께 실행하여 비교
+#
+# 사용법: python benchmarks/redos_bench.py [--sizes 1,4,16] [--fuzz 300] [--limit 4] [--legacy]
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import medication_extraction
+import text_normalizer
+
+HEADER = "처 방 의 약 품 의 명 칭\n"
+HANGUL = [chr(code) for code in range(0xAC00, 0xAC00 + 2000)]
+
+# 기존 추출기의 pattern2 - 제형 접미사가 없는 긴 한글 줄에서 역추적이 지수적으로 늘어남
+LEGACY_PATTERN2 = r'(?:^|\s)(?:\([가-힣A-Za-z]+\))?((?:[가-힣A-Za-z]{2,})+(?:정|캡슐|주사액|시럽|겔|크림|액|패치))'
+
+
+def repeat_to(unit, chars):
+    """unit을 반복하여 chars 글자로 맞춘 문자열"""
+    return (unit * (chars // len(unit) + 1))[:chars]
+
+
+def hangul_run(rng, chars):
+    # 제형 접미사 없이 이어진 한글 (pattern2/3, 유사 검색)
+    return "".join(rng.choice(HANGUL) for _ in range(chars)).replace("정", "가")
+
+
+# 적대적 입력 종류 -> (rng, 글자 수) -> 텍스트 (모두 약품 영역 머리글 뒤에 둠)
+FAMILIES = {
+    "긴 한글 줄": hangul_run,
+    "한글 단어 + 공백": lambda rng, chars: repeat_to(hangul_run(rng, 40)[:3] + " ", chars),
+    "코드 + mg 없는 숫자열": lambda rng, chars: "123456789 mg" + "1" * chars,
+    "코드 + 긴 공백": lambda rng, chars: "123456789" + " " * chars + "가",
+    "닫히지 않은 괄호": lambda rng, chars: repeat_to("(가나다 ", chars),
+    "괄호 + 숫자열": lambda rng, chars: repeat_to("( 1" + "1" * 30, chars),
+    "(급여 + 한글": lambda rng, chars: " (" + hangul_run(rng, chars),
+    "접두어 반복": lambda rng, chars: repeat_to("크로트라노바", chars),
+    "글자 + 정(": lambda rng, chars: repeat_to("가 정(", chars),
+    "코드형 영문 + 숫자": lambda rng, chars: repeat_to("A1", chars // 2) + "A" + "1" * (chars // 2),
+    "머리글 공백": lambda rng, chars: "처" + " " * chars + "방",
+    "기호/전각 문자": lambda rng, chars: repeat_to("!@#%&*＋－（）ｍｇ ", chars),
+}
+
+# 퍼징용 조각 - 처방전 OCR에 자주 나오는 토큰과 잡음
+FUZZ_TOKENS = ["정", "캡슐", "mg", "(", ")", " ", "\n", "1", "123456789", "(급여)", "A12", "노바", "크로",
+               "트라젠타", "가나", "동일성분", "처방", ".", "-", "/", "%", "ㄱ", "ㅏ", "１", "　"]
+
+
+def fuzz_text(rng, chars):
+    parts = []
+    length = 0
+    while length < chars:
+        token = rng.choice(FUZZ_TOKENS) if rng.random() < 0.8 else rng.choice(HANGUL)
+        parts.append(token)
+        length += len(token)
+    return "".join(parts)[:chars]
+
+
+def targets():
+    items = []
+    for version in sorted(medication_extraction.RULE_SETS):
+        items.append((f"약품명 {version}", medication_extraction.get_extractor(version).extract))
+    items.append(("코드", medication_extraction.extract_codes))
+    items.append(("텍스트 정제", text_normalizer.normalize_text))
+    return items
+
+
+def ms_per_kb(func, text, repeat=3):
+    """가장 빠른 실행 기준 KB(UTF-8)당 ms"""
+    kilobytes = len(text.encode("utf-8")) / 1024
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000 / kilobytes
+
+
+def worst_case(sizes, limit):
+    """종류별, 대상별 크기에 따른 KB당 ms - 비율이 limit을 넘는 조합 목록 반환"""
+    items = targets()
+    failures = []
+    print(f"{'입력':<16} {'대상':<10} " + " ".join(f"{f'{size}K ms/KB':>12}" for size in sizes) + f" {'비율':>6}")
+    for family, make in FAMILIES.items():
+        texts = [HEADER + make(random.Random(size), size * 1024) for size in sizes]
+        for label, func in items:
+            timings = [ms_per_kb(func, text) for text in texts]
+            ratio = timings[-1] / max(timings[0], 1e-9)
+            mark = " !" if ratio > limit else ""
+            if mark:
+                failures.append((family, label, ratio))
+            print(f"{family:<16} {label:<10} " + " ".join(f"{timing:>12.4f}" for timing in timings) + f" {ratio:>6.2f}{mark}")
+    return failures
+
+
+def fuzz(count, chars):
+    """무작위 OCR 비슷한 입력에서 대상별 KB당 ms (중앙값, 최대)"""
+    rng = random.Random(0)
+    texts = [HEADER + fuzz_text(rng, rng.randint(chars // 4, chars)) for _ in range(count)]
+    print(f"\n퍼징 {count}개 (최대 {chars}자)")
+    for label, func in targets():
+        timings = sorted(ms_per_kb(func, text, repeat=1) for text in texts)
+        print(f"{label:<10} 중앙값 {timings[len(timings) // 2]:.4f} ms/KB, 최대 {timings[-1]:.4f} ms/KB")
+
+
+def legacy(timeout):
+    """기존 pattern2를 별도 프로세스에서 글자 수를 늘려 가며 실행 (제한 시간을 넘으면 중단)"""
+    print("\n기존 pattern2 (제형 접미사 없는 한글 줄)")
+    for chars in (24, 28, 32, 36, 40):
+        code = f"import re; re.search({LEGACY_PATTERN2!r}, ' ' + '가' * {chars})"
+        start = time.perf_counter()
+        try:
+            subprocess.run([sys.executable, "-c", code], timeout=timeout, check=True)
+        except subprocess.TimeoutExpired:
+            print(f"{chars}자: {timeout}초 안에 끝나지 않음")
+            break
+        print(f"{chars}자: {(time.perf_counter() - start) * 1000:.0f}ms (프로세스 시작 포함)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="최악 입력/퍼징 벤치마크")
+    parser.add_argument("--sizes", default="1,4,16", help="입력 크기 (KB, 쉼표로 구분)")
+    parser.add_argument("--fuzz", type=int, default=300, help="퍼징 입력 수 (0이면 생략)")
+    parser.add_argument("--fuzz-chars", type=int, default=4096)
+    parser.add_argument("--limit", type=float, default=4.0, help="허용할 KB당 시간 비율 (가장 큰 입력 / 가장 작은 입력)")
+    parser.add_argument("--legacy", action="store_true", help="기존 pattern2도 실행")
+    parser.add_argument("--timeout", type=float, default=10.0, help="기존 pattern2 제한 시간 (초)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    failures = worst_case(sizes, args.limit)
+    if args.fuzz:
+        fuzz(args.fuzz, args.fuzz_chars)
+    if args.legacy:
+        legacy(args.timeout)
+    if failures:
+        print(f"\nKB당 시간이 입력 크기에 따라 늘어난 조합 {len(failures)}개")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
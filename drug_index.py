@@ -0,0 +1,366 @@
+# 의약품 제품 사전 인덱스
+# 식약처/심평원 제품 목록 파일(제품명, EDI 코드, 주성분코드, 제형)을 한 번 빌드해 읽기 전용 바이너리 파일로 만들고,
+# 실행 중에는 mmap으로 열어 정렬된 이름 배열/EDI 코드 배열을 이진 탐색함
+# 약품명 유사 검색(fuzzy_matcher)의 삭제 변형 색인도 빌드할 때 함께 만들어 두어 프로세스마다 다시 만들지 않음
+# 파일을 복사하거나 파싱하지 않으므로 시작이 빠르고, 여러 uvicorn 워커와 Streamlit 프로세스가 같은 페이지 캐시를 공유함
+#
+# 빌드: python drug_index.py 제품목록.csv [-o drug_index.bin]
+import argparse
+import bisect
+import csv
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+from collections import namedtuple
+from unicodedata import normalize
+
+from config import get_ocr_config
+
+OCR_CONFIG = get_ocr_config()
+
+MAGIC = b"RXDRUGIX"
+VERSION = 3
+# 매직, 버전, 헤더(JSON) 길이
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGN = 8
+
+# 제품 목록 파일의 열 이름 (공공데이터 파일마다 이름이 달라 여러 이름을 허용)
+COLUMNS = {
+    "name": ("제품명", "품목명", "한글상품명", "name"),
+    "edi_code": ("제품코드", "보험코드", "EDI코드", "edi_code"),
+    "ingredient_code": ("주성분코드", "일반명코드", "ingredient_code"),
+    "form": ("제형", "제형구분", "제형명", "form"),
+}
+
+DrugProduct = namedtuple("DrugProduct", ["name", "edi_code", "ingredient_code", "form"])
+
+# 제품명에서 용량/성분 표기(숫자나 괄호) 앞부분
+BASE_NAME_PATTERN = re.compile(r"[^\d\(\[]*")
+
+
+def normalize_name(name):
+    """사전 키 - NFKC 정규화 후 공백 제거"""
+    return "".join(normalize("NFKC", name or "").split())
+
+
+def base_name(name):
+    """용량/성분 표기를 뺀 제품명 (예: 노바스크정5밀리그램(암로디핀베실산염) -> 노바스크정)"""
+    name = normalize_name(name)
+    return BASE_NAME_PATTERN.match(name).group() or name
+
+
+def same_product(name, product):
+    """name(예: DUR 응답의 ITEM_NAME)이 product와 용량/성분 표기를 뺀 제품명이 같은지"""
+    return base_name(name) == base_name(product.name)
+
+
+def _find_columns(header):
+    columns = {}
+    for field, aliases in COLUMNS.items():
+        for alias in aliases:
+            if alias in header:
+                columns[field] = header.index(alias)
+                break
+    if "name" not in columns:
+        raise ValueError(f"제품명 열을 찾을 수 없습니다: {header}")
+    return columns
+
+
+def read_products(path):
+    """제품 목록 CSV 읽기 - DrugProduct 목록 (UTF-8, 실패하면 CP949)"""
+    for encoding in ("utf-8-sig", "cp949"):
+        try:
+            with open(path, newline="", encoding=encoding) as f:
+                rows = list(csv.reader(f))
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        raise ValueError(f"제품 목록 파일의 인코딩을 알 수 없습니다: {path}")
+    if not rows:
+        return []
+
+    columns = _find_columns([cell.strip() for cell in rows[0]])
+    products = []
+    for row in rows[1:]:
+        values = {field: row[index].strip() if index < len(row) else "" for field, index in columns.items()}
+        name = normalize_name(values["name"])
+        if not name:
+            continue
+        edi_code = values.get("edi_code", "")
+        products.append(DrugProduct(
+            name,
+            edi_code if len(edi_code) == 9 and edi_code.isdigit() else "",
+            values.get("ingredient_code", ""),
+            values.get("form", ""),
+        ))
+    return products
+
+
+def _pad(buffer, fill=b"\0"):
+    buffer.extend(fill * (-len(buffer) % _ALIGN))
+
+
+def _fuzzy_sections(products, max_distance, prefix_length):
+    """유사 검색 색인 구역 - (헤더 정보, 구역)
+
+    제품명(용량 표기를 뺀 이름)마다 첫 제품만 색인하고, 어간 삭제 변형의 해시와 제품 번호를 해시순으로 정렬한 배열 두 개로 저장
+    """
+    # drug_index를 import하는 모듈이므로 빌드할 때만 불러옴
+    import fuzzy_matcher
+
+    entries = set()
+    seen = set()
+    longest = 0
+    for position, product in enumerate(products):
+        name = base_name(product.name)
+        jamo = fuzzy_matcher.to_jamo(fuzzy_matcher.stem(name))
+        if not jamo or name in seen:
+            continue
+        seen.add(name)
+        longest = max(longest, len(jamo))
+        for variant in fuzzy_matcher.deletion_variants(jamo, max_distance, prefix_length):
+            entries.add((fuzzy_matcher.variant_key(variant), position))
+    entries = sorted(entries)
+    info = {"max_distance": max_distance, "prefix_length": prefix_length, "longest": longest}
+    return info, {
+        "fuzzy_keys": struct.pack(f"<{len(entries)}Q", *(key for key, _ in entries)),
+        "fuzzy_positions": struct.pack(f"<{len(entries)}I", *(position for _, position in entries)),
+    }
+
+
+def build(products, path, max_distance=None, prefix_length=None):
+    """제품 목록으로 인덱스 파일 생성 - 임시 파일에 쓴 뒤 교체하므로 이미 열어 둔 프로세스는 이전 파일을 계속 읽음
+
+    max_distance, prefix_length: 유사 검색 색인 설정 (지정하지 않으면 FUZZY_MAX_DISTANCE, FUZZY_PREFIX_LENGTH 설정값)
+    """
+    products = sorted(set(products), key=lambda product: (product.name.encode("utf-8"), product.edi_code))
+    forms = sorted({product.form for product in products})
+    form_index = {form: index for index, form in enumerate(forms)}
+    ingredient_width = max((len(product.ingredient_code.encode("ascii", "ignore")) for product in products), default=0)
+
+    # 구역: 이름 오프셋(uint32 n+1), 이름(UTF-8 연속), EDI 코드(uint32, 없으면 0), 주성분코드(고정 폭 ASCII), 제형 번호(uint16),
+    # 코드 색인(EDI 코드가 있는 제품의 코드와 제품 번호를 코드순으로 정렬한 uint32 배열 두 개)
+    encoded = [product.name.encode("utf-8") for product in products]
+    offsets = [0]
+    for name in encoded:
+        offsets.append(offsets[-1] + len(name))
+    sections = {
+        "name_offsets": struct.pack(f"<{len(offsets)}I", *offsets),
+        "names": b"".join(encoded),
+        "edi_codes": struct.pack(f"<{len(products)}I", *(int(product.edi_code or 0) for product in products)),
+        "ingredient_codes": b"".join(
+            product.ingredient_code.encode("ascii", "ignore").ljust(ingredient_width, b"\0") for product in products),
+        "forms": struct.pack(f"<{len(products)}H", *(form_index[product.form] for product in products)),
+    }
+    coded = sorted((int(product.edi_code), position) for position, product in enumerate(products) if product.edi_code)
+    sections["sorted_codes"] = struct.pack(f"<{len(coded)}I", *(code for code, _ in coded))
+    sections["code_positions"] = struct.pack(f"<{len(coded)}I", *(position for _, position in coded))
+    # 유사 검색 색인 (삭제 변형 해시 uint64, 제품 번호 uint32)
+    fuzzy, fuzzy_sections = _fuzzy_sections(
+        products,
+        max_distance if max_distance is not None else OCR_CONFIG["FUZZY_MAX_DISTANCE"],
+        prefix_length if prefix_length is not None else OCR_CONFIG["FUZZY_PREFIX_LENGTH"])
+    sections.update(fuzzy_sections)
+
+    body = bytearray()
+    layout = {}
+    for key, data in sections.items():
+        layout[key] = [len(body), len(data)]
+        body.extend(data)
+        _pad(body)
+    header = bytearray(json.dumps({
+        "count": len(products),
+        "forms": forms,
+        "ingredient_width": ingredient_width,
+        "fuzzy": fuzzy,
+        "sections": layout,
+    }, ensure_ascii=False).encode("utf-8"))
+    # JSON 뒤 공백은 파싱에 영향 없음
+    _pad(header, b" ")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".drug_index.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            f.write(body)
+        # mkstemp는 0600으로 만들므로, 다른 사용자로 실행되는 워커도 읽을 수 있게 umask 기준 권한으로 바꿈
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp_path, 0o666 & ~umask)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return len(products)
+
+
+class DrugIndex:
+    """mmap으로 연 제품 사전 - 이름 정확 일치/접두어 조회 (이름은 normalize_name 기준), EDI 코드 조회"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_size = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"의약품 사전 인덱스 형식이 다릅니다: {path}")
+        start = _PREAMBLE.size
+        header = json.loads(bytes(self._mmap[start:start + header_size]))
+        base = start + header_size
+
+        view = memoryview(self._mmap)
+        sections = {key: view[base + offset:base + offset + size] for key, (offset, size) in header["sections"].items()}
+        self.count = header["count"]
+        self.forms = header["forms"]
+        self._ingredient_width = header["ingredient_width"]
+        # 복사 없이 mmap 위에 바로 얹은 배열
+        self._offsets = sections["name_offsets"].cast("I")
+        self._names = sections["names"]
+        self._edi_codes = sections["edi_codes"].cast("I")
+        self._ingredient_codes = sections["ingredient_codes"]
+        self._forms = sections["forms"].cast("H")
+        self._sorted_codes = sections["sorted_codes"].cast("I")
+        self._code_positions = sections["code_positions"].cast("I")
+        # 유사 검색 색인 설정 (max_distance, prefix_length, longest)
+        self.fuzzy = header["fuzzy"]
+        self._fuzzy_keys = sections["fuzzy_keys"].cast("Q")
+        self._fuzzy_positions = sections["fuzzy_positions"].cast("I")
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def _key(self, position):
+        return self._names[self._offsets[position]:self._offsets[position + 1]].tobytes()
+
+    def _lower_bound(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def product(self, position):
+        """position번째 제품"""
+        edi_code = self._edi_codes[position]
+        width = self._ingredient_width
+        ingredient_code = self._ingredient_codes[position * width:(position + 1) * width].tobytes()
+        return DrugProduct(
+            self._key(position).decode("utf-8"),
+            f"{edi_code:09d}" if edi_code else "",
+            ingredient_code.rstrip(b"\0").decode("ascii"),
+            self.forms[self._forms[position]],
+        )
+
+    def name(self, position):
+        """position번째 제품명"""
+        return self._key(position).decode("utf-8")
+
+    def names(self):
+        """모든 제품명 (이름순)"""
+        return (self._key(position).decode("utf-8") for position in range(self.count))
+
+    def get(self, name):
+        """이름이 정확히 같은 첫 제품 (없으면 None)"""
+        key = normalize_name(name).encode("utf-8")
+        position = self._lower_bound(key)
+        if position < self.count and self._key(position) == key:
+            return self.product(position)
+        return None
+
+    def by_code(self, code):
+        """9자리 EDI(보험 제품) 코드의 제품 (없으면 None)"""
+        code = str(code or "").strip()
+        if len(code) != 9 or not code.isdigit():
+            return None
+        value = int(code)
+        low, high = 0, len(self._sorted_codes)
+        while low < high:
+            middle = (low + high) // 2
+            if self._sorted_codes[middle] < value:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._sorted_codes) and self._sorted_codes[low] == value:
+            return self.product(self._code_positions[low])
+        return None
+
+    def fuzzy_positions(self, key):
+        """삭제 변형 해시가 key인 제품 번호들 (fuzzy_matcher.variant_key 기준)"""
+        low = bisect.bisect_left(self._fuzzy_keys, key)
+        positions = []
+        while low < len(self._fuzzy_keys) and self._fuzzy_keys[low] == key:
+            positions.append(self._fuzzy_positions[low])
+            low += 1
+        return positions
+
+    def prefix(self, prefix, limit=20):
+        """이름이 prefix로 시작하는 제품 (이름순 최대 limit개)"""
+        key = normalize_name(prefix).encode("utf-8")
+        position = self._lower_bound(key)
+        products = []
+        while position < self.count and len(products) < limit and self._key(position).startswith(key):
+            products.append(self.product(position))
+            position += 1
+        return products
+
+
+# 프로세스 공유 인덱스 (지연 생성, 파일이 없으면 None)
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """설정된 경로의 인덱스 반환 - 인덱스 파일이 없거나 읽을 수 없으면 None"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                path = OCR_CONFIG["DRUG_INDEX_PATH"]
+                if not path or not os.path.exists(path):
+                    _index = False
+                else:
+                    try:
+                        _index = DrugIndex(path)
+                    except (OSError, ValueError) as e:
+                        print(f"의약품 사전 인덱스 로드 중 오류 발생: {str(e)}")
+                        _index = False
+    return _index or None
+
+
+def lookup(name):
+    """기본 인덱스에서 이름이 정확히 같은 제품 (인덱스가 없으면 None)"""
+    index = get_index()
+    return index.get(name) if index is not None else None
+
+
+def lookup_code(code):
+    """기본 인덱스에서 EDI 코드의 제품 (인덱스가 없으면 None)"""
+    index = get_index()
+    return index.by_code(code) if index is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="의약품 제품 사전 인덱스 빌드")
+    parser.add_argument("products", help="제품 목록 CSV (제품명, 제품코드, 주성분코드, 제형 열)")
+    parser.add_argument("-o", "--output", default=OCR_CONFIG["DRUG_INDEX_PATH"], help="인덱스 파일 경로")
+    args = parser.parse_args()
+
+    count = build(read_products(args.products), args.output)
+    print(f"{count}개 제품 -> {args.output} ({os.path.getsize(args.output) / 1024:.1f}KB)")
+
+
+if __name__ == "__main__":
+    main()
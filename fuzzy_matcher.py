@@ -0,0 +1,211 @@
+# 자모 단위 약품명 유사 검색 (SymSpell 방식)
+# 한글 음절을 초성/중성/종성 자모로 풀면 OCR 오인식(페→례, 젠→센 등)이 편집 거리 1~2가 되므로,
+# 사전 약품명 어간의 삭제 변형을 미리 색인해 두고 질의 어간의 삭제 변형 몇십 개만 찾아봐서
+# 사전 크기와 거의 상관없이 편집 거리 한도 안의 후보를 찾음 (손으로 적던 오인식 보정표를 대신함)
+# 의약품 제품 사전의 삭제 변형 색인은 drug_index 빌드 때 인덱스 파일에 함께 저장하고 mmap으로 조회함
+import hashlib
+import re
+import threading
+from collections import namedtuple
+from unicodedata import normalize
+
+import drug_index
+from config import get_ocr_config
+
+OCR_CONFIG = get_ocr_config()
+
+FORM_SUFFIX_PATTERN = re.compile(r"(?:정|캡슐|주사액|시럽|겔|크림|액|패치)$")
+
+# 후보 약품명과 자모 편집 거리
+Candidate = namedtuple("Candidate", ["name", "distance"])
+
+
+def to_jamo(text):
+    """한글 음절을 초성/중성/종성 자모로 분해 (그 밖의 문자는 그대로)"""
+    return normalize("NFD", text)
+
+
+def stem(name):
+    """제형 접미사까지 뺀 약품명 어간 (예: 노바스크정 -> 노바스크)"""
+    name = drug_index.base_name(name)
+    return FORM_SUFFIX_PATTERN.sub("", name) or name
+
+
+def deletion_variants(word, distance, prefix_length=0):
+    """word(앞 prefix_length 자모, 0이면 전체)에서 distance개 이하 문자를 지운 문자열"""
+    if prefix_length:
+        word = word[:prefix_length]
+    variants = {word}
+    frontier = variants
+    for _ in range(distance):
+        frontier = {item[:i] + item[i + 1:] for item in frontier for i in range(len(item))} - variants
+        variants |= frontier
+    return variants
+
+
+def variant_key(variant):
+    """인덱스 파일에 저장하는 삭제 변형 해시 (프로세스마다 같은 64비트 값)"""
+    return int.from_bytes(hashlib.blake2b(variant.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _distance(source, target, limit):
+    """인접 문자 바뀜을 포함한 편집 거리 (limit을 넘으면 limit + 1)"""
+    if abs(len(source) - len(target)) > limit:
+        return limit + 1
+    # OCR 오인식은 대부분 한두 군데라 공통 앞/뒤 부분을 잘라내고 남은 부분만 비교
+    start = 0
+    while start < len(source) and start < len(target) and source[start] == target[start]:
+        start += 1
+    end = 0
+    while end < len(source) - start and end < len(target) - start and source[-1 - end] == target[-1 - end]:
+        end += 1
+    source = source[start:len(source) - end]
+    target = target[start:len(target) - end]
+    if not source or not target:
+        return min(max(len(source), len(target)), limit + 1)
+    before = None
+    previous = list(range(len(target) + 1))
+    for i, source_char in enumerate(source, 1):
+        current = [i] + [0] * len(target)
+        row_min = i
+        for j, target_char in enumerate(target, 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (source_char != target_char))
+            if i > 1 and j > 1 and source_char == target[j - 2] and source[i - 2] == target_char:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class FuzzyMatcher:
+    """사전 약품명 유사 검색기
+
+    max_distance: 색인할 삭제 변형 수 (질의할 수 있는 최대 편집 거리)
+    prefix_length: 어간 앞 몇 자모까지만 삭제 변형을 색인할지 (0이면 전체) - 큰 사전의 색인 크기를 줄임
+    index: 의약품 제품 사전 인덱스 (drug_index.DrugIndex) - names 다음 순서로 인덱스 파일의 색인에서도 찾음
+    """
+
+    def __init__(self, names, max_distance=2, prefix_length=0, index=None):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.index = index
+        self.names = []
+        self.stems = []
+        # 어간 -> 사전 번호 (정확히 같은 어간은 삭제 변형을 만들지 않고 바로 찾음)
+        self.exact = {}
+        self.deletes = {}
+        # 가장 긴 어간 길이 - 이보다 한도 이상 긴 질의는 삭제 변형을 만들지 않고 바로 후보 없음
+        self.longest = index.fuzzy["longest"] if index is not None else 0
+        # 약품명 -> 사전 번호 (인덱스에서 찾은 같은 이름은 건너뜀)
+        self.positions = {}
+        for name in names:
+            name = drug_index.base_name(name)
+            jamo = to_jamo(stem(name))
+            if not jamo or name in self.positions:
+                continue
+            index = self.positions[name] = len(self.names)
+            self.names.append(name)
+            self.stems.append(jamo)
+            self.longest = max(self.longest, len(jamo))
+            self.exact.setdefault(jamo, []).append(index)
+            for variant in deletion_variants(jamo, max_distance, prefix_length):
+                self.deletes.setdefault(variant, []).append(index)
+
+    def __len__(self):
+        return len(self.names) + (len(self.index) if self.index is not None else 0)
+
+    def _index_candidates(self, jamo, limit, variants):
+        """인덱스 파일의 색인에서 찾은 [(거리, 길이 차이, 순서, 약품명)] - 순서는 names 다음부터
+
+        variants: 질의의 삭제 변형 (인덱스 색인 설정이 검색기와 같을 때만 다시 만들지 않고 씀)
+        """
+        fuzzy = self.index.fuzzy
+        if limit > fuzzy["max_distance"] or fuzzy["prefix_length"] != self.prefix_length:
+            limit = min(limit, fuzzy["max_distance"])
+            variants = deletion_variants(jamo, limit, fuzzy["prefix_length"])
+        seen = set()
+        ranked = []
+        for variant in variants:
+            for position in self.index.fuzzy_positions(variant_key(variant)):
+                if position in seen:
+                    continue
+                seen.add(position)
+                name = drug_index.base_name(self.index.name(position))
+                if name in self.positions:
+                    continue
+                target = to_jamo(stem(name))
+                distance = _distance(jamo, target, limit)
+                if distance <= limit:
+                    ranked.append((distance, abs(len(target) - len(jamo)), len(self.names) + position, name))
+        return ranked
+
+    def budget(self, jamo):
+        """질의 길이에 따른 편집 거리 한도 - 짧은 이름은 다른 약품과 쉽게 가까워지므로 자모 3개당 1"""
+        return min(self.max_distance, len(jamo) // 3)
+
+    def lookup(self, name, k=5, max_distance=None):
+        """편집 거리 한도 안의 사전 약품명 후보 (거리, 길이 차이, 사전 순서로 정렬한 최대 k개)"""
+        jamo = to_jamo(stem(name))
+        if not jamo:
+            return []
+        limit = self.budget(jamo) if max_distance is None else min(max_distance, self.max_distance)
+        if len(jamo) > self.longest + limit:
+            # 편집 거리는 길이 차이 이상이므로 후보가 있을 수 없음 (긴 OCR 잡음 줄에서 변형이 길이의 제곱으로 늘지 않게)
+            return []
+        seen = set()
+        ranked = []
+        variants = deletion_variants(jamo, limit, self.prefix_length)
+        for variant in variants:
+            for index in self.deletes.get(variant, ()):
+                if index in seen:
+                    continue
+                seen.add(index)
+                distance = _distance(jamo, self.stems[index], limit)
+                if distance <= limit:
+                    ranked.append((distance, abs(len(self.stems[index]) - len(jamo)), index, self.names[index]))
+        if self.index is not None:
+            ranked.extend(self._index_candidates(jamo, limit, variants))
+        ranked.sort()
+        return [Candidate(name, distance) for distance, _, _, name in ranked[:k]]
+
+    def correct(self, name, k=5):
+        """가장 가까운 사전 약품명과 후보 목록 - (약품명 또는 None, 가장 가까운 거리가 같은 후보가 여럿이면 후보 목록)"""
+        exact = self.exact.get(to_jamo(stem(name)))
+        if exact:
+            # 어간이 같은 사전 약품명이 있으면 그보다 가까운 후보는 없으므로 삭제 변형을 찾지 않음
+            candidates = [Candidate(self.names[index], 0) for index in exact[:k]]
+        else:
+            candidates = self.lookup(name, k)
+            if candidates and candidates[0].distance == 0:
+                # 인덱스 파일에서 어간이 같은 제품명을 찾은 경우도 어간이 같은 후보만 남김
+                candidates = [candidate for candidate in candidates if candidate.distance == 0]
+        if not candidates:
+            return None, []
+        ambiguous = len(candidates) > 1 and candidates[1].distance == candidates[0].distance
+        return candidates[0].name, candidates if ambiguous else []
+
+
+# 사전 약품명 목록별 검색기 (프로세스마다 한 번만 만듦 - 제품 사전은 인덱스 파일의 색인을 그대로 씀)
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+def get_matcher(names=()):
+    """names와 의약품 제품 사전 인덱스의 제품명에서 찾는 검색기 반환"""
+    key = tuple(names)
+    matcher = _matchers.get(key)
+    if matcher is None:
+        with _matchers_lock:
+            matcher = _matchers.get(key)
+            if matcher is None:
+                matcher = FuzzyMatcher(
+                    key,
+                    OCR_CONFIG["FUZZY_MAX_DISTANCE"],
+                    OCR_CONFIG["FUZZY_PREFIX_LENGTH"],
+                    drug_index.get_index())
+                _matchers[key] = matcher
+    return matcher
@@ -0,0 +1,380 @@
+# OCR 업로드 전 이미지 전처리
+# 크기 조정 및 업로드 인코딩 (PNG optimize 대신 빠르고 작은 형식 선택)
+import io
+import math
+import time
+
+import numpy as np
+from PIL import Image
+
+from config import get_ocr_config
+
+OCR_CONFIG = get_ocr_config()
+
+# PIL 버전에 따른 리샘플링 필터 호환성 처리
+_LANCZOS = getattr(Image, "LANCZOS", None) or Image.ANTIALIAS
+
+# 업로드 형식별 (파일명, MIME)
+UPLOAD_FORMATS = {
+    "png": ("image.png", "image/png"),
+    "gray": ("image.png", "image/png"),
+    "binary": ("image.png", "image/png"),
+    "jpeg": ("image.jpg", "image/jpeg"),
+    "webp": ("image.webp", "image/webp"),
+}
+
+
+# 디코딩 배율을 정할 미리보기의 최소 긴 변 px (글자 높이 추정은 너비 800px 이내로 줄여서 함)
+DECODE_PROBE_SIDE = 1000
+
+
+def decode_max_side(engine_name=None):
+    """OCR 엔진에 필요한 디코딩 해상도 - tiled 엔진은 타일마다 원본 해상도가 필요하므로 0(축소 없음)"""
+    engine_name = engine_name or OCR_CONFIG["OCR_ENGINE"]
+    return 0 if engine_name == "tiled" else OCR_CONFIG["OCR_DECODE_MAX_SIDE"]
+
+
+def decode_scale(data, min_text_height=None):
+    """업로드 해상도에 필요한 디코딩 배율 - 긴 변 DECODE_PROBE_SIDE px 이상으로 축소 디코딩한 미리보기에서
+    글자 높이를 추정하여 글자가 min_text_height px 이상 남는 배율 (추정하지 못하면 1.0)
+    """
+    min_text_height = min_text_height or OCR_CONFIG["OCR_MIN_TEXT_HEIGHT"]
+    probe = Image.open(io.BytesIO(data))
+    width, height = probe.size
+    factor = DECODE_PROBE_SIDE / max(width, height)
+    probe.draft("L", (math.ceil(width * factor), math.ceil(height * factor)))
+    text_height = estimate_text_height(probe)
+    if not text_height:
+        return 1.0
+    return min(1.0, min_text_height / (text_height * width / probe.size[0]))
+
+
+def open_image(data, max_side=None, mode=None, adaptive=None):
+    """업로드 바이트에서 OCR에 필요한 해상도까지만 디코딩하는 이미지 열기
+
+    JPEG는 draft 모드로 긴 변이 max_side 이상인 가장 작은 1/2, 1/4, 1/8 배율로 디코딩하여
+    12~48MP 휴대폰 사진 전체를 풀지 않음 (mode="L"이면 색 채널도 디코딩하지 않음)
+    adaptive(None이면 OCR_DECODE_ADAPTIVE 설정값)이면 업로드 해상도(decode_scale)까지만 디코딩하며,
+    이때 미리보기를 디코딩하므로 이벤트 루프 밖에서 호출해야 함
+    실제 디코딩은 픽셀에 처음 접근할 때 일어나며, 그 외 형식은 지연 로딩 그대로 반환
+    """
+    max_side = decode_max_side() if max_side is None else max_side
+    adaptive = OCR_CONFIG["OCR_DECODE_ADAPTIVE"] if adaptive is None else adaptive
+    image = Image.open(io.BytesIO(data))
+    if image.format == "JPEG":
+        width, height = image.size
+        scale = min(1.0, max_side / max(width, height)) if max_side else 1.0
+        # 1/2 배율도 쓸 수 없는 작은 사진은 미리보기 디코딩 없이 그대로 (원본 해상도가 필요한 tiled 엔진 제외)
+        if adaptive and max_side and max(width, height) * scale >= 2 * DECODE_PROBE_SIDE:
+            scale = min(scale, decode_scale(data))
+        image.draft(mode or image.mode, (math.ceil(width * scale), math.ceil(height * scale)))
+    return image
+
+
+def fit_size(size, max_size=(1000, 1000)):
+    """비율을 유지하며 최대 크기 안에 들어가는 크기 (확대하지 않음)"""
+    width, height = size
+    scale = min(1.0, max_size[0] / width, max_size[1] / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def resize_for_ocr(image, max_size=(1000, 1000)):
+    """최대 크기를 넘는 이미지를 비율 유지하며 축소 (원본은 변경하지 않음)"""
+    new_size = fit_size(image.size, max_size)
+    if new_size == image.size:
+        return image
+    return image.resize(new_size, _LANCZOS, reducing_gap=3.0)
+
+
+def to_grayscale(image):
+    """OCR용 흑백 변환 (투명 배경은 흰색으로 합성)"""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image.convert("RGBA"), mask=image.convert("RGBA").getchannel("A"))
+        image = background
+    return image if image.mode == "L" else image.convert("L")
+
+
+def otsu_threshold(gray):
+    """Otsu 방식 이진화 임계값 계산"""
+    hist = np.bincount(np.asarray(gray, dtype=np.uint8).ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if total == 0:
+        return 128
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cum_mean = np.cumsum(hist * levels)
+    mean_bg = cum_mean / np.maximum(weight_bg, 1)
+    mean_fg = (cum_mean[-1] - cum_mean) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+
+def binarize(image):
+    """1비트 흑백 이미지로 변환"""
+    gray = to_grayscale(image)
+    threshold = otsu_threshold(gray)
+    array = np.asarray(gray) > threshold
+    return Image.fromarray(array)
+
+
+def _downscaled_dark_mask(image, max_width):
+    """레이아웃 분석용 축소 이진 마스크 반환 - (마스크, 축소 비율)"""
+    gray = to_grayscale(image)
+    scale = min(1.0, max_width / gray.size[0])
+    if scale < 1.0:
+        # 정수 배율은 reduce로 먼저 빠르게 줄이고 나머지만 보간
+        factor = gray.size[0] // max_width
+        reduced = gray.reduce(factor) if factor > 1 else gray
+        gray = reduced.resize((max(1, round(gray.size[0] * scale)), max(1, round(gray.size[1] * scale))), Image.BILINEAR)
+    array = np.asarray(gray)
+    return array <= otsu_threshold(gray), scale
+
+
+def _runs(flags):
+    """불리언 1차원 배열에서 연속 구간 [(시작, 끝)] 목록 반환 (끝은 포함하지 않음)"""
+    padded = np.concatenate(([False], flags, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def find_horizontal_rules(dark, min_length_ratio=0.25):
+    """표의 가로 괘선 위치 탐지 - 한 행에 연속된 어두운 픽셀이 일정 길이 이상인 구간"""
+    height, width = dark.shape
+    # 약간 기울어진 선도 잡히도록 위아래 한 행씩 합침
+    merged = dark.copy()
+    merged[1:] |= dark[:-1]
+    merged[:-1] |= dark[1:]
+    length = max(1, int(width * min_length_ratio))
+    cumsum = np.zeros((height, width + 1), dtype=np.int32)
+    np.cumsum(merged, axis=1, out=cumsum[:, 1:])
+    is_rule = ((cumsum[:, length:] - cumsum[:, :-length]) == length).any(axis=1)
+    return _runs(is_rule)
+
+
+def remove_vertical_lines(dark, min_length):
+    """세로 괘선 픽셀 제거 - 세로로 min_length 이상 연속된 어두운 픽셀을 지움"""
+    height = dark.shape[0]
+    if height <= min_length:
+        return dark
+    cumsum = np.zeros((height + 1, dark.shape[1]), dtype=np.int32)
+    np.cumsum(dark, axis=0, out=cumsum[1:])
+    # 창 전체가 어두운 시작 위치
+    full = (cumsum[min_length:] - cumsum[:-min_length]) == min_length
+    # 각 픽셀을 덮는 시작 위치가 하나라도 있으면 선 픽셀
+    padded = np.pad(full, ((min_length - 1, min_length - 1), (0, 0)))
+    starts = np.zeros((padded.shape[0] + 1, dark.shape[1]), dtype=np.int32)
+    np.cumsum(padded, axis=0, out=starts[1:])
+    line_mask = (starts[min_length:min_length + height] - starts[:height]) > 0
+    return dark & ~line_mask
+
+
+def vertical_line_length(dark, rules):
+    """세로 괘선으로 볼 최소 연속 길이 (축소 마스크 px) - 이보다 길게 세로로 이어진 잉크는 글자 획이 아니라 괘선
+
+    이미지 높이로 정하면 표 조각이나 작은 사진에서 글자 세로획까지 지워지므로 표/줄 구조에서 구함
+    - 가로 괘선이 둘 이상이면 괘선 사이 가장 좁은 행의 높이: 글자는 행 안에 들어가고 세로 괘선은 행을 가로지름
+      (find_horizontal_rules가 괘선을 위아래 한 행씩 넓혀 잡으므로 그만큼 더함)
+    - 아니면 세로 띠별 가로 투영의 잉크 구간(글자 줄) 높이 중앙값의 두 배
+    """
+    gaps = [next_start - end for (_, end), (next_start, _) in zip(rules, rules[1:])]
+    # 겹선 사이 틈처럼 아주 좁은 구간은 행이 아님
+    rows = [gap for gap in gaps if gap >= 4]
+    if rows:
+        return min(rows) + 3
+    heights = []
+    width = dark.shape[1]
+    edges = np.linspace(0, width, 9).astype(int)
+    for left, right in zip(edges[:-1], edges[1:]):
+        heights.extend(end - start for start, end in _runs(dark[:, left:right].any(axis=1)) if end - start >= 2)
+    if not heights:
+        return max(8, dark.shape[0])
+    return max(8, 2 * int(np.median(heights)))
+
+
+def locate_medication_table(image, include_header=None, max_width=800):
+    """가로 괘선과 투영 프로파일로 약품 표 영역 탐지 - 원본 좌표 (left, top, right, bottom) 또는 None
+
+    괘선 사이 구간 중 텍스트 줄이 두 줄 이상인 가장 높은 구간을 약품 표 본문으로 보고,
+    include_header이면 바로 위 구간(처방 의약품의 명칭 등 열 제목)까지 포함함
+    """
+    if include_header is None:
+        include_header = OCR_CONFIG["OCR_ROI_INCLUDE_HEADER"]
+    dark, scale = _downscaled_dark_mask(image, max_width)
+    height, width = dark.shape
+    rules = find_horizontal_rules(dark)
+    if not rules:
+        return None
+
+    # 괘선으로 나뉜 구간 (이미지 위/아래 경계 포함)
+    bounds = [0] + [edge for rule in rules for edge in rule] + [height]
+    segments = [(bounds[i], bounds[i + 1]) for i in range(0, len(bounds), 2) if bounds[i + 1] > bounds[i]]
+
+    # 세로 괘선을 지운 뒤 가로 투영으로 텍스트 줄 수 계산
+    row_ink = remove_vertical_lines(dark, vertical_line_length(dark, rules)).mean(axis=1)
+    best, best_height = None, 0
+    for index, (top, bottom) in enumerate(segments):
+        if bottom - top < max(height * 0.1, best_height + 1):
+            continue
+        if len(_runs(row_ink[top:bottom] > 0.01)) >= 2:
+            best, best_height = index, bottom - top
+    if best is None:
+        return None
+
+    top, bottom = segments[best]
+    if include_header and best > 0:
+        top = segments[best - 1][0]
+
+    # 세로 투영으로 좌우 여백 제거
+    column_ink = np.flatnonzero(dark[top:bottom].any(axis=0))
+    left, right = (column_ink[0], column_ink[-1] + 1) if column_ink.size else (0, width)
+
+    pad = 4
+    box = (max(0, left - pad), max(0, top - pad), min(width, right + pad), min(height, bottom + pad))
+    return tuple(int(round(value / scale)) for value in box)
+
+
+def estimate_text_height(image, max_width=800, strips=8):
+    """글자 높이 추정 (원본 픽셀) - 추정할 수 없으면 None
+
+    괘선을 지운 뒤 세로 띠별 가로 투영 프로파일에서 잉크가 있는 행 구간의 높이를 구하고,
+    점선/잡티처럼 잉크가 적은 구간에 끌려가지 않도록 잉크 양으로 가중한 중앙값을 사용함
+    (띠로 나누어 좌우 열의 글자 줄이 서로 다른 높이에 있어도 하나로 합쳐지지 않게 함)
+    """
+    dark, scale = _downscaled_dark_mask(image, max_width)
+    width = dark.shape[1]
+    rules = find_horizontal_rules(dark)
+    dark = remove_vertical_lines(dark, vertical_line_length(dark, rules))
+    for start, end in rules:
+        dark[start:end] = False
+    heights, weights = [], []
+    edges = np.linspace(0, width, strips + 1).astype(int)
+    for left, right in zip(edges[:-1], edges[1:]):
+        profile = dark[:, left:right].sum(axis=1)
+        for start, end in _runs(profile > 0):
+            # 1픽셀 높이 잡티는 제외
+            if end - start >= 2:
+                heights.append(end - start)
+                weights.append(profile[start:end].sum())
+    if len(heights) < 3:
+        return None
+    order = np.argsort(heights)
+    cumulative = np.cumsum(np.asarray(weights, dtype=np.float64)[order])
+    median = np.asarray(heights)[order][np.searchsorted(cumulative, cumulative[-1] / 2)]
+    return float(median) / scale
+
+
+def ocr_target_size(image, min_text_height=None, max_side=None):
+    """글자가 최소 높이 이상 유지되는 가장 작은 업로드 크기 선택 - ((너비, 높이), 추정 글자 높이 또는 None)
+
+    확대는 하지 않으며, 글자 높이를 추정하지 못하면 기존처럼 1000x1000 이내로 맞춤
+    """
+    min_text_height = min_text_height or OCR_CONFIG["OCR_MIN_TEXT_HEIGHT"]
+    max_side = max_side or OCR_CONFIG["OCR_MAX_SIDE"]
+    width, height = image.size
+    text_height = estimate_text_height(image)
+    if not text_height:
+        return fit_size(image.size), None
+    scale = min(1.0, min_text_height / text_height, max_side / max(width, height))
+    return (max(1, round(width * scale)), max(1, round(height * scale))), text_height
+
+
+def crop_medication_table(image, include_header=None):
+    """약품 표 영역만 잘라낸 이미지 반환 (탐지 실패 시 원본)"""
+    box = locate_medication_table(image, include_header)
+    return image.crop(box) if box else image
+
+
+def encode_for_ocr(image, fmt=None, quality=None):
+    """업로드용 인코딩 - (바이트, 파일명, MIME) 반환
+
+    fmt: png(무손실 컬러), gray(흑백 PNG), binary(1비트 PNG), jpeg/webp(흑백 손실 압축)
+    """
+    fmt = fmt or OCR_CONFIG["OCR_UPLOAD_FORMAT"]
+    quality = quality or OCR_CONFIG["OCR_UPLOAD_QUALITY"]
+    if fmt not in UPLOAD_FORMATS:
+        raise ValueError(f"지원하지 않는 업로드 형식: {fmt}")
+
+    buffer = io.BytesIO()
+    if fmt == "png":
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        # optimize=True는 CPU 비용이 크므로 빠른 압축 레벨 사용
+        image.save(buffer, format="PNG", compress_level=1)
+    elif fmt == "gray":
+        to_grayscale(image).save(buffer, format="PNG", compress_level=1)
+    elif fmt == "binary":
+        binarize(image).save(buffer, format="PNG", compress_level=1)
+    elif fmt == "jpeg":
+        to_grayscale(image).save(buffer, format="JPEG", quality=quality)
+    elif fmt == "webp":
+        to_grayscale(image).save(buffer, format="WEBP", quality=quality, method=0)
+
+    filename, mime_type = UPLOAD_FORMATS[fmt]
+    return buffer.getvalue(), filename, mime_type
+
+
+def ocr_region(image, crop_table=None):
+    """OCR에 보낼 영역 (left, top, right, bottom) - 잘라내지 않으면 None"""
+    if crop_table is None:
+        crop_table = OCR_CONFIG["OCR_ROI_CROP"]
+    return locate_medication_table(image) if crop_table else None
+
+
+def upload_size(image, resize=True):
+    """업로드 크기 결정 - ((너비, 높이), 추정 글자 높이 또는 None)
+
+    OCR_ADAPTIVE_RESOLUTION이면 글자 높이로 크기를 고르고, 아니면 1000x1000 이내로 축소
+    resize=False이면 이미 글자 높이를 맞춘 조각(재인식)이므로 OCR_MAX_SIDE만 넘지 않게 함
+    """
+    if not resize:
+        return fit_size(image.size, (OCR_CONFIG["OCR_MAX_SIDE"],) * 2), None
+    if OCR_CONFIG["OCR_ADAPTIVE_RESOLUTION"]:
+        return ocr_target_size(image)
+    return fit_size(image.size), None
+
+
+def prepare_ocr_upload(image, fmt=None, quality=None, max_size=None, crop_table=None):
+    """OCR 업로드 준비 (약품 표 잘라내기 + 크기 조정 + 인코딩) - (바이트, 파일명, MIME) 반환"""
+    box = ocr_region(image, crop_table)
+    if box:
+        image = image.crop(box)
+    if max_size is None:
+        max_size = upload_size(image)[0]
+    return encode_for_ocr(resize_for_ocr(image, max_size), fmt, quality)
+
+
+def make_preview(image, width=None, fmt=None, quality=None):
+    """화면 표시용 미리보기 - 표시 너비로 줄여 WebP/JPEG로 압축한 바이트 (원본 대신 브라우저로 전송)"""
+    width = width or OCR_CONFIG["PREVIEW_WIDTH"]
+    fmt = (fmt or OCR_CONFIG["PREVIEW_FORMAT"]).upper()
+    quality = quality or OCR_CONFIG["PREVIEW_QUALITY"]
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", image.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    # 너비만 제한 (세로로 긴 처방전도 표시 너비에 맞춤)
+    preview = resize_for_ocr(image, (width, image.size[1]))
+
+    buffer = io.BytesIO()
+    if fmt == "WEBP":
+        preview.save(buffer, format="WEBP", quality=quality, method=0)
+    else:
+        preview.save(buffer, format="JPEG", quality=quality, optimize=False)
+    return buffer.getvalue()
+
+
+def benchmark_encoding(image, formats=None, repeat=5, quality=None):
+    """형식별 인코딩 시간(ms)과 업로드 크기(bytes) 측정"""
+    results = {}
+    for fmt in formats or UPLOAD_FORMATS:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            img_bytes, _, _ = encode_for_ocr(image, fmt, quality)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[fmt] = {"encode_ms": sorted(timings)[len(timings) // 2], "bytes": len(img_bytes)}
+    return results
@@ -0,0 +1,14 @@
+# 처방전 약품명 추출 엔진 (Streamlit/FastAPI 공용)
+from .engine import Extraction, Extractor, extract_codes, extract_medications, get_extractor
+from .rules import DEFAULT_VERSION, RULE_SETS, RuleSet
+
+__all__ = [
+    "DEFAULT_VERSION",
+    "Extraction",
+    "Extractor",
+    "RULE_SETS",
+    "RuleSet",
+    "extract_codes",
+    "extract_medications",
+    "get_extractor",
+]
@@ -0,0 +1,71 @@
+# 약품명 추출 규칙 집합
+# 후보 유형, 표준 약품명, 유사 검색 사전, 복합제 규칙을 버전별로 선언함
+# 규칙을 바꿀 때는 기존 버전을 고치지 않고 새 버전을 추가하여 진입점별로 같은 결과를 재현할 수 있게 함
+from collections import namedtuple
+
+# version: 규칙 집합 이름
+# candidate_types: medication_tokenizer 후보 유형
+# standard_names: 표준 약품명 (비어 있으면 표준화 단계 없이 보정한 이름을 그대로 사용)
+# known_names: OCR 오인식 보정에 쓰는 유사 검색 사전 (의약품 제품 사전 인덱스의 제품명도 함께 사용)
+# combinations: (포함된 이름, 이미 포함되어 있으면 건너뛸 이름, 바꿀 이름) - 단일제 이름을 복합제 이름으로 바꿈
+# corrections: (오인식 표기, 바꿀 표기) 보정표 - 있으면 유사 검색 대신 보정표에서 가장 먼저 나오는 표기 하나를 바꿈
+RuleSet = namedtuple("RuleSet", ["version", "candidate_types", "standard_names", "known_names", "combinations", "corrections"])
+
+# 기존 FastAPI(medical_functions) 추출 규칙 - 코드 + 약품명, (코드) + 약품명 후보와 기존 보정표만 쓰고 표준화 단계 없음
+# (기존 추출기의 두 번째 정규식은 그룹이 하나라 결과에 쓰이지 않았음)
+# 결과는 기존 추출기와 같은 이름 집합이고 순서만 정렬됨 - 단, 9자리 코드가 제품 사전 인덱스에 있으면 사전의 제품명을 씀
+V1 = RuleSet(
+    version="v1",
+    candidate_types=("CODE", "BRACKET"),
+    standard_names=(),
+    known_names=(),
+    combinations=(),
+    corrections=(
+        ("노바人크", "노바스크"), ("노H스크", "노바스크"), ("노바스코", "노바스크"),
+        ("트라젠E", "트라젠타"), ("트라센타", "트라젠타"), ("트라전타", "트라젠타"),
+        ("티지패논", "티지페논"), ("티지례논", "티지페논"), ("타피페논", "티지페논"),
+        ("아토맨", "아토렌"), ("아토렌지", "아토렌"),
+        ("피오글리치", "피오글리"), ("피아글리", "피오글리"),
+        ("크로나", "크로미정"), ("크로미", "크로미정"), ("크로미나", "크로미나정"),
+        ("크래밍", "크래밍정"), ("스티렌투엑스", "스티렌투엑스정"),
+        ("모티리톤", "모티리톤정"), ("인데놀", "인데놀정"),
+    ),
+)
+
+# 표준화된 약품명 정의 - 올바른 약품명 목록 (기존 Streamlit 추출 규칙)
+V2_STANDARD_NAMES = (
+    "노바스크정",
+    "티지페논정",
+    "아토렌정",
+    "피오글리정",
+    "트라젠타듀오정",
+    "크로미나정",
+    "크로미정",
+    "톡사펜정",
+    "톡사렌정",
+    "알도실캡슐",
+    "알리나제정",
+    "레커틴정",
+    # prescription2.jpg 약품명 추가
+    "크래밍정",
+    "스티렌투엑스정",
+    "모티리톤정",
+    "인데놀정",
+    # 복합제 처리(트라젠타 → 트라젠타듀오정) 전 단일제 이름 - 유사 검색으로 트라센타/트라전타 등을 여기로 보정
+    "트라젠타정",
+)
+
+# 기존 Streamlit 추출 규칙 - 후보 유형 6가지 + 표준 약품명 단계
+V2 = RuleSet(
+    version="v2",
+    candidate_types=("CODE", "NAME", "PREFIX", "NUM", "BRACKET", "LINE"),
+    standard_names=V2_STANDARD_NAMES,
+    known_names=V2_STANDARD_NAMES,
+    combinations=(("트라젠타", "듀오", "트라젠타듀오"),),
+    corrections=(),
+)
+
+RULE_SETS = {rule_set.version: rule_set for rule_set in (V1, V2)}
+
+# 모든 진입점(Streamlit, FastAPI)의 기본 규칙 집합
+DEFAULT_VERSION = "v2"
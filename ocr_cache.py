@@ -0,0 +1,335 @@
+# OCR 결과 디스크 캐시
+# 이미지 내용의 SHA-256을 키로 사용하며, 여러 uvicorn 워커와 Streamlit 세션이 하나의 SQLite 파일을 공유함
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import image_hash
+from config import get_ocr_config
+
+OCR_CONFIG = get_ocr_config()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS image_hashes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    phash TEXT NOT NULL,
+    dhash TEXT NOT NULL
+);
+INSERT OR IGNORE INTO stats(name, value) VALUES ('hits', 0), ('misses', 0), ('evictions', 0), ('total_size', 0), ('similar_hits', 0);
+-- image_hashes 행이 지워질 때마다 증가 (각 프로세스가 메모리 BK-트리를 다시 만들 시점)
+INSERT OR IGNORE INTO stats(name, value) VALUES ('hash_generation', 0);
+"""
+
+
+def content_hash(data):
+    """바이트 데이터의 SHA-256 해시"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(data, namespace="upstage"):
+    """캐시 키 생성 - OCR 엔진/옵션별로 구분"""
+    return f"{namespace}:{content_hash(data)}"
+
+
+def key_for_image(image, namespace="upstage"):
+    """원본 바이트가 없을 때 디코딩된 이미지 픽셀로 캐시 키 생성"""
+    header = f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode()
+    return make_key(header + image.tobytes(), namespace)
+
+
+# OCR 결과를 바꾸는 설정 - 디코딩/기울기 보정/약품 표 자르기/업로드 해상도와 형식/타일/재OCR/문서 렌더링
+RESULT_SETTINGS = (
+    "OCR_DECODE_MAX_SIDE", "OCR_DECODE_ADAPTIVE", "OCR_DESKEW", "OCR_DESKEW_MAX_ANGLE", "OCR_DESKEW_MIN_ANGLE", "OCR_DESKEW_BUDGET_MS",
+    "OCR_ROI_CROP", "OCR_ROI_INCLUDE_HEADER",
+    "OCR_UPLOAD_FORMAT", "OCR_UPLOAD_QUALITY", "OCR_ADAPTIVE_RESOLUTION", "OCR_MIN_TEXT_HEIGHT", "OCR_MAX_SIDE",
+    "OCR_TILE_ENGINE", "OCR_TILE_SIZE", "OCR_TILE_OVERLAP",
+    "OCR_REFINE_ENABLED", "OCR_REFINE_THRESHOLD", "OCR_REFINE_MAX_WORDS", "OCR_REFINE_TEXT_HEIGHT", "OCR_REFINE_ENGINE",
+    "OCR_PDF_DPI", "OCR_MAX_PAGES",
+)
+
+
+def ocr_namespace(engine_name):
+    """OCR 결과 캐시 이름공간 - 엔진 이름 + 결과를 바꾸는 설정의 짧은 해시 (설정이 바뀌면 이전 결과를 쓰지 않음)"""
+    settings = json.dumps([OCR_CONFIG[name] for name in RESULT_SETTINGS])
+    return f"{engine_name}:{content_hash(settings.encode())[:12]}"
+
+
+class OcrCache:
+    """SHA-256 키 기반 LRU 디스크 캐시 (용량 제한 + TTL)"""
+
+    def __init__(self, path, max_bytes, ttl):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        # 지각 해시 색인 (프로세스별 메모리, DB에서 새로 추가된 행만 반영하고 행이 지워지면 다시 만듦)
+        self._tree = image_hash.BKTree()
+        self._tree_last_id = 0
+        self._tree_generation = None
+        self._tree_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        """스레드별 SQLite 연결 반환 (WAL 모드로 다중 프로세스 동시 접근 허용)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, conn, name, amount=1):
+        conn.execute("UPDATE stats SET value = value + ? WHERE name = ?", (amount, name))
+
+    def _delete_hashes(self, conn, where, params=()):
+        """조건에 맞는 지각 해시 행 삭제 - 지운 행이 있으면 BK-트리 세대 증가 (트랜잭션 내부에서 호출)"""
+        if conn.execute(f"DELETE FROM image_hashes WHERE {where}", params).rowcount:
+            self._bump(conn, "hash_generation")
+
+    def get(self, key):
+        """캐시 조회 - 없거나 만료되면 None"""
+        return self._lookup(key, "hits", "misses")
+
+    def _lookup(self, key, hit_stat, miss_stat=None):
+        """캐시 조회 후 hit_stat(없으면 miss_stat) 카운터 증가 - miss_stat이 None이면 미적중은 세지 않음"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, size, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[2] > self.ttl:
+                # 만료된 항목 제거
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._bump(conn, "total_size", -row[1])
+                self._delete_hashes(conn, "key = ?", (key,))
+                row = None
+            if row is None:
+                if miss_stat:
+                    self._bump(conn, miss_stat)
+                conn.execute("COMMIT")
+                return None
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._bump(conn, hit_stat)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """캐시 저장 후 용량 초과분을 LRU 순서로 제거"""
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._bump(conn, "total_size", -old[0])
+            conn.execute(
+                "INSERT OR REPLACE INTO entries(key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, size, now, now))
+            self._bump(conn, "total_size", size)
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn, now):
+        """만료 항목 및 용량 초과 항목 제거 (트랜잭션 내부에서 호출)"""
+        expired = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE created_at < ?",
+            (now - self.ttl,)).fetchone()
+        if expired[0]:
+            conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl,))
+            self._bump(conn, "total_size", -expired[1])
+            self._bump(conn, "evictions", expired[0])
+            self._delete_hashes(conn, "key NOT IN (SELECT key FROM entries)")
+
+        total = conn.execute("SELECT value FROM stats WHERE name = 'total_size'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        removed = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            removed.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", removed)
+        conn.execute("UPDATE stats SET value = ? WHERE name = 'total_size'", (total,))
+        self._bump(conn, "evictions", len(removed))
+        self._delete_hashes(conn, "key NOT IN (SELECT key FROM entries)")
+
+    def put_image_hashes(self, key, hashes):
+        """캐시 항목에 이미지 지각 해시 (pHash, dHash) 연결 - 이미 있는 키는 id를 유지한 채 갱신"""
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO image_hashes(key, phash, dhash) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET phash = excluded.phash, dhash = excluded.dhash",
+            (key, format(hashes[0], "016x"), format(hashes[1], "016x")))
+
+    def _sync_tree(self):
+        """다른 워커가 추가한 해시를 메모리 BK-트리에 반영 - 어느 프로세스든 해시 행을 지웠으면 트리를 다시 만듦"""
+        conn = self._connect()
+        with self._tree_lock:
+            generation = conn.execute("SELECT value FROM stats WHERE name = 'hash_generation'").fetchone()[0]
+            if generation != self._tree_generation:
+                self._tree = image_hash.BKTree()
+                self._tree_last_id = 0
+                self._tree_generation = generation
+            rows = conn.execute(
+                "SELECT id, key, phash, dhash FROM image_hashes WHERE id > ? ORDER BY id",
+                (self._tree_last_id,)).fetchall()
+            for row_id, key, phash, dhash in rows:
+                self._tree.add(int(phash, 16), (key, int(dhash, 16)))
+                self._tree_last_id = row_id
+
+    def find_similar(self, hashes, namespace, max_distance):
+        """pHash와 dHash가 모두 max_distance 이내인 캐시 키 목록 (두 거리의 합이 가까운 순)"""
+        self._sync_tree()
+        prefix = f"{namespace}:"
+        with self._tree_lock:
+            candidates = self._tree.search(hashes[0], max_distance)
+        matches = []
+        for distance, (key, dhash) in candidates:
+            dhash_distance = image_hash.hamming(hashes[1], dhash)
+            if key.startswith(prefix) and dhash_distance <= max_distance:
+                matches.append((distance + dhash_distance, key))
+        matches.sort()
+        return [key for _, key in matches]
+
+    def get_similar(self, hashes, namespace, max_distance):
+        """지각 해시가 가까운 이미지의 캐시 값 조회 - 가까운 순으로 시도하여 만료/삭제된 항목은 건너뜀
+
+        적중하면 similar_hits만 증가 (정확한 키 조회의 미적중은 get에서 이미 셈)
+        """
+        for key in self.find_similar(hashes, namespace, max_distance):
+            value = self._lookup(key, "similar_hits")
+            if value is not None:
+                return value
+        return None
+
+    def stats(self):
+        """적중/미적중 카운터 및 사용량 반환"""
+        conn = self._connect()
+        result = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+        result["entries"] = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = result["hits"] + result["misses"]
+        # 정확한 키로 미적중한 뒤 유사 이미지로 적중한 조회도 적중으로 봄
+        result["hit_rate"] = (result["hits"] + result["similar_hits"]) / lookups if lookups else 0.0
+        return result
+
+    def clear(self):
+        """캐시 전체 삭제 (카운터 포함)"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM entries")
+        conn.execute("DELETE FROM image_hashes")
+        conn.execute("UPDATE stats SET value = 0 WHERE name != 'hash_generation'")
+        self._bump(conn, "hash_generation")
+        conn.execute("COMMIT")
+
+
+# 프로세스 공유 캐시 인스턴스 (지연 생성)
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """설정값으로 만든 기본 캐시 반환 - 비활성화 시 None"""
+    global _cache
+    if not OCR_CONFIG["OCR_CACHE_ENABLED"]:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OcrCache(
+                    OCR_CONFIG["OCR_CACHE_PATH"],
+                    OCR_CONFIG["OCR_CACHE_MAX_BYTES"],
+                    OCR_CONFIG["OCR_CACHE_TTL"])
+    return _cache
+
+
+def get(key):
+    """기본 캐시 조회 (캐시 오류는 미적중으로 처리)"""
+    cache = get_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except sqlite3.Error as e:
+        print(f"OCR 캐시 조회 중 오류 발생: {str(e)}")
+        return None
+
+
+def put(key, value):
+    """기본 캐시 저장 (캐시 오류는 무시)"""
+    cache = get_cache()
+    if cache is None:
+        return
+    try:
+        cache.put(key, value)
+    except sqlite3.Error as e:
+        print(f"OCR 캐시 저장 중 오류 발생: {str(e)}")
+
+
+def image_hashes(image):
+    """유사 이미지 재사용이 켜져 있으면 (pHash, dHash) 반환, 아니면 None"""
+    if not OCR_CONFIG["OCR_SIMILAR_DISTANCE"] or get_cache() is None:
+        return None
+    return image_hash.image_hashes(image)
+
+
+def get_similar(hashes, namespace="upstage"):
+    """지각 해시가 OCR_SIMILAR_DISTANCE 이내인 이전 이미지의 캐시 값 조회"""
+    cache = get_cache()
+    if cache is None or hashes is None:
+        return None
+    try:
+        return cache.get_similar(hashes, namespace, OCR_CONFIG["OCR_SIMILAR_DISTANCE"])
+    except sqlite3.Error as e:
+        print(f"OCR 캐시 조회 중 오류 발생: {str(e)}")
+        return None
+
+
+def put_image_hashes(key, hashes):
+    """캐시 항목에 지각 해시 연결 (캐시 오류는 무시)"""
+    cache = get_cache()
+    if cache is None or hashes is None:
+        return
+    try:
+        cache.put_image_hashes(key, hashes)
+    except sqlite3.Error as e:
+        print(f"OCR 캐시 저장 중 오류 발생: {str(e)}")
+
+
+def stats():
+    """기본 캐시 통계"""
+    cache = get_cache()
+    return cache.stats() if cache is not None else {}
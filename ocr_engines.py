@@ -0,0 +1,447 @@
+# OCR 엔진 레지스트리
+# 업스테이지(원격 API)와 Tesseract(로컬 CPU) 엔진을 같은 인터페이스로 제공하고 엔진별 지연시간/신뢰도 통계를 기록
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+import image_preprocess
+import ocr_client
+import ocr_tiles
+from config import get_ocr_config
+from ocr_layout import OcrLayout
+
+OCR_CONFIG = get_ocr_config()
+
+
+class EngineStats:
+    """엔진별 호출 수, 오류 수, 지연시간 분포, 평균 신뢰도"""
+
+    def __init__(self, window=None):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.empty = 0
+        self.latencies = deque(maxlen=window or OCR_CONFIG["OCR_STATS_WINDOW"])
+        self.confidence_sum = 0.0
+        self.confidence_count = 0
+
+    def record(self, latency, text=None, confidence=None, error=False):
+        with self._lock:
+            self.calls += 1
+            if error:
+                self.errors += 1
+                return
+            self.latencies.append(latency)
+            if not text:
+                self.empty += 1
+            if confidence is not None:
+                self.confidence_sum += confidence
+                self.confidence_count += 1
+
+    def latency_percentile(self, q):
+        """최근 지연시간의 q 백분위수(초) - 기록이 없으면 None"""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self):
+        """통계 요약 (지연시간은 ms)"""
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+
+        with self._lock:
+            successes = self.calls - self.errors
+            result = {
+                "calls": self.calls,
+                "errors": self.errors,
+                "error_rate": self.errors / self.calls if self.calls else 0.0,
+                "empty_rate": self.empty / successes if successes else 0.0,
+                "mean_confidence": self.confidence_sum / self.confidence_count if self.confidence_count else None,
+            }
+        result.update({f"p{q}_ms": ms(self.latency_percentile(q)) for q in (50, 95, 99)})
+        return result
+
+
+def _upload_meta(size, text_height):
+    """요청별 OCR 입력 크기 정보"""
+    return {"upload_size": list(size), "text_height": round(text_height, 1) if text_height else None}
+
+
+class OcrEngine:
+    """OCR 엔진 기본 클래스 - 하위 클래스는 _recognize(image, crop_table, resize) -> (텍스트, 신뢰도, OcrLayout 또는 None)를 구현
+
+    crop_table: 약품 표 영역만 잘라서 인식할지 여부 (None이면 OCR_ROI_CROP 설정값, 타일은 False로 호출)
+    resize: 글자 높이에 맞춰 업로드 크기를 고를지 여부 (재인식처럼 이미 크기를 맞춘 조각은 False로 호출 - OCR_MAX_SIDE 안에서 그대로 보냄)
+    """
+
+    name = None
+
+    def __init__(self):
+        self.stats = EngineStats()
+
+    def is_available(self):
+        return True
+
+    def snapshot(self):
+        """엔진 통계 요약"""
+        return self.stats.snapshot()
+
+    def _recognize(self, image, crop_table=None, resize=True):
+        raise NotImplementedError
+
+    async def _recognize_async(self, image, crop_table=None, resize=True):
+        return await asyncio.to_thread(self._recognize, image, crop_table, resize)
+
+    def recognize_with_layout(self, image, crop_table=None, resize=True):
+        """이미지에서 텍스트와 단어 위치/신뢰도 추출 - (텍스트, OcrLayout 또는 None) (실패 시 예외 발생)"""
+        start = time.perf_counter()
+        try:
+            text, confidence, layout = self._recognize(image, crop_table, resize)
+        except Exception:
+            self.stats.record(time.perf_counter() - start, error=True)
+            raise
+        self.stats.record(time.perf_counter() - start, text, confidence)
+        return text, layout
+
+    async def recognize_with_layout_async(self, image, crop_table=None, resize=True):
+        """비동기 텍스트/단어 위치 추출 (실패 시 예외 발생)"""
+        start = time.perf_counter()
+        try:
+            text, confidence, layout = await self._recognize_async(image, crop_table, resize)
+        except Exception:
+            self.stats.record(time.perf_counter() - start, error=True)
+            raise
+        self.stats.record(time.perf_counter() - start, text, confidence)
+        return text, layout
+
+    def recognize(self, image):
+        """이미지에서 텍스트 추출 (실패 시 예외 발생)"""
+        return self.recognize_with_layout(image)[0]
+
+    async def recognize_async(self, image):
+        """비동기 텍스트 추출 (실패 시 예외 발생)"""
+        return (await self.recognize_with_layout_async(image))[0]
+
+
+class UpstageEngine(OcrEngine):
+    """업스테이지 문서 OCR API"""
+
+    name = "upstage"
+
+    def __init__(self, api_key=None):
+        super().__init__()
+        self.api_key = api_key
+
+    def is_available(self):
+        return bool(self.api_key or ocr_client.API_KEYS["UPSTAGE_API_KEY"])
+
+    def _prepare(self, image, crop_table=None, resize=True):
+        """업로드 데이터, 잘라낸 영역(단어 좌표를 원본 기준으로 되돌리기 위함), 요청 정보 반환"""
+        region = image_preprocess.ocr_region(image, crop_table)
+        target = image.crop(region) if region else image
+        size, text_height = image_preprocess.upload_size(target, resize)
+        upload = image_preprocess.prepare_ocr_upload(target, max_size=size, crop_table=False)
+        return upload, region, _upload_meta(size, text_height)
+
+    def _parse(self, result, region, image, meta):
+        layout = OcrLayout.from_upstage(result, region, image.size, meta)
+        return ocr_client.parse_ocr_text(result), result.get("confidence"), layout
+
+    def _recognize(self, image, crop_table=None, resize=True):
+        (img_bytes, filename, mime_type), region, meta = self._prepare(image, crop_table, resize)
+        result = ocr_client.request_ocr(img_bytes, filename, mime_type, api_key=self.api_key)
+        return self._parse(result, region, image, meta)
+
+    async def _recognize_async(self, image, crop_table=None, resize=True):
+        (img_bytes, filename, mime_type), region, meta = await asyncio.to_thread(self._prepare, image, crop_table, resize)
+        result = await ocr_client.request_ocr_async(img_bytes, filename, mime_type, api_key=self.api_key)
+        return self._parse(result, region, image, meta)
+
+
+class TesseractEngine(OcrEngine):
+    """로컬 Tesseract OCR (pytesseract 및 한국어 언어팩 필요) - 네트워크 없이 동작"""
+
+    name = "tesseract"
+
+    def __init__(self, lang=None):
+        super().__init__()
+        self.lang = lang or OCR_CONFIG["OCR_TESSERACT_LANG"]
+        self._available = None
+
+    def is_available(self):
+        # 설치 여부 확인은 외부 프로세스를 실행하므로 한 번만 수행
+        if self._available is None:
+            try:
+                import pytesseract
+                self._available = set(self.lang.split("+")) <= set(pytesseract.get_languages(config=""))
+            except Exception:
+                self._available = False
+        return self._available
+
+    def _recognize(self, image, crop_table=None, resize=True):
+        import pytesseract
+
+        # 글자 높이에 맞춰 크기를 고르되(끄면 2000x2000 이내) 손실 압축 없이 흑백으로 인식
+        if not resize:
+            size, text_height = image_preprocess.fit_size(image.size, (OCR_CONFIG["OCR_MAX_SIDE"],) * 2), None
+        elif OCR_CONFIG["OCR_ADAPTIVE_RESOLUTION"]:
+            size, text_height = image_preprocess.ocr_target_size(image)
+        else:
+            size, text_height = image_preprocess.fit_size(image.size, (2000, 2000)), None
+        gray = image_preprocess.to_grayscale(image_preprocess.resize_for_ocr(image, size))
+        data = pytesseract.image_to_data(gray, lang=self.lang, output_type=pytesseract.Output.DICT)
+        width, height = gray.size
+
+        # 단어를 (블록, 문단, 줄) 단위로 묶어 줄 텍스트 복원
+        lines = {}
+        confidences = []
+        word_boxes = []
+        for i, word in enumerate(data["text"]):
+            word = word.strip()
+            if not word:
+                continue
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append(word)
+            conf = float(data["conf"][i])
+            if conf >= 0:
+                confidences.append(conf / 100)
+            left, top = data["left"][i], data["top"][i]
+            box = (left / width, top / height, (left + data["width"][i]) / width, (top + data["height"][i]) / height)
+            word_boxes.append((word, box, conf / 100 if conf >= 0 else None, 0))
+        text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+        confidence = sum(confidences) / len(confidences) if confidences else None
+        return text, confidence, OcrLayout.from_words(word_boxes, [image.size], _upload_meta(size, text_height))
+
+
+class HedgedEngine(OcrEngine):
+    """헤지 요청 엔진 - 주 엔진이 최근 지연시간의 일정 백분위 안에 응답하지 않으면
+    보조 엔진(또는 주 엔진 재요청)에 같은 이미지를 보내 먼저 끝난 결과를 사용하고 나머지는 취소함
+    """
+
+    name = "hedged"
+
+    # 동기 호출용 공유 스레드 풀 (진행 중인 HTTP 요청은 중단할 수 없어 결과만 버림)
+    _executor = ThreadPoolExecutor(max_workers=OCR_CONFIG["OCR_POOL_SIZE"] * 2, thread_name_prefix="ocr-hedge")
+
+    def __init__(self, primary=None, secondary=None, percentile=None, min_delay=None):
+        super().__init__()
+        self.primary_name = primary or OCR_CONFIG["OCR_HEDGE_PRIMARY"]
+        self.secondary_name = secondary or OCR_CONFIG["OCR_HEDGE_SECONDARY"]
+        self.percentile = percentile or OCR_CONFIG["OCR_HEDGE_PERCENTILE"]
+        self.min_delay = min_delay if min_delay is not None else OCR_CONFIG["OCR_HEDGE_MIN_DELAY"]
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.wins = {"primary": 0, "secondary": 0}
+
+    @property
+    def primary(self):
+        return get_engine(self.primary_name)
+
+    @property
+    def secondary(self):
+        return get_engine(self.secondary_name)
+
+    def is_available(self):
+        return self.primary.is_available()
+
+    def hedge_delay(self):
+        """헤지 요청까지 기다릴 시간(초) - 표본이 부족하면 최소 대기시간 사용"""
+        stats = self.primary.stats
+        if len(stats.latencies) < OCR_CONFIG["OCR_HEDGE_MIN_SAMPLES"]:
+            return self.min_delay
+        return max(self.min_delay, stats.latency_percentile(self.percentile))
+
+    def _record(self, hedged, winner):
+        with self._lock:
+            self.requests += 1
+            if hedged:
+                self.hedged += 1
+            if winner:
+                self.wins[winner] += 1
+
+    def snapshot(self):
+        result = super().snapshot()
+        with self._lock:
+            result["hedge"] = {
+                "primary": self.primary_name,
+                "secondary": self.secondary_name,
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+                "wins": dict(self.wins),
+            }
+        result["hedge"]["delay_ms"] = round(self.hedge_delay() * 1000, 1)
+        return result
+
+    def _recognize(self, image, crop_table=None, resize=True):
+        futures = {self._executor.submit(self.primary.recognize_with_layout, image, crop_table, resize): "primary"}
+        done, _ = wait(futures, timeout=self.hedge_delay())
+        hedged = not done or next(iter(done)).exception() is not None
+        if hedged:
+            futures[self._executor.submit(self.secondary.recognize_with_layout, image, crop_table, resize)] = "secondary"
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    self._record(hedged, futures[future])
+                    text, layout = future.result()
+                    return text, None, layout
+                error = future.exception()
+        self._record(hedged, None)
+        raise error
+
+    async def _recognize_async(self, image, crop_table=None, resize=True):
+        tasks = {asyncio.ensure_future(self.primary.recognize_with_layout_async(image, crop_table, resize)): "primary"}
+        done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+        hedged = not done or next(iter(done)).exception() is not None
+        if hedged:
+            tasks[asyncio.ensure_future(self.secondary.recognize_with_layout_async(image, crop_table, resize))] = "secondary"
+
+        error = None
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._record(hedged, tasks[task])
+                        text, layout = task.result()
+                        return text, None, layout
+                    error = task.exception()
+        finally:
+            # 늦게 끝난 요청 취소 (HTTP 연결도 함께 정리됨)
+            for task in pending:
+                task.cancel()
+        self._record(hedged, None)
+        raise error
+
+
+class TiledEngine(OcrEngine):
+    """고해상도 스캔용 타일 OCR - 페이지를 겹치는 타일로 나누어 기본 엔진으로 동시에 인식하고,
+    겹친 영역의 중복 단어를 제거하여 페이지 텍스트와 좌표로 합침
+
+    타일 크기/겹침은 업로드 해상도 기준 픽셀이며, 글자 높이로 정한 축소 비율을 적용해 원본에서 잘라냄
+    작은 이미지는 나누지 않고 기본 엔진에 그대로 보냄
+    """
+
+    name = "tiled"
+
+    # 동기 호출용 공유 스레드 풀 (프로세스 전체의 동시 타일 요청 수 제한)
+    _executor = ThreadPoolExecutor(max_workers=OCR_CONFIG["OCR_TILE_CONCURRENCY"], thread_name_prefix="ocr-tile")
+
+    def __init__(self, base=None, tile_size=None, overlap=None, max_concurrency=None):
+        super().__init__()
+        self.base_name = base or OCR_CONFIG["OCR_TILE_ENGINE"]
+        self.tile_size = tile_size or OCR_CONFIG["OCR_TILE_SIZE"]
+        self.overlap = overlap if overlap is not None else OCR_CONFIG["OCR_TILE_OVERLAP"]
+        self.max_concurrency = max_concurrency or OCR_CONFIG["OCR_TILE_CONCURRENCY"]
+
+    @property
+    def base(self):
+        return get_engine(self.base_name)
+
+    def is_available(self):
+        return self.base.is_available()
+
+    def _plan(self, image, crop_table):
+        """(타일로 나눌 페이지, 잘라낸 영역, 타일 영역 목록, 요청 정보)"""
+        region = image_preprocess.ocr_region(image, crop_table)
+        page = image.crop(region) if region else image
+        text_height = image_preprocess.estimate_text_height(page)
+        scale = min(1.0, OCR_CONFIG["OCR_MIN_TEXT_HEIGHT"] / text_height) if text_height else 1.0
+        tiles = ocr_tiles.tile_boxes(page.size, round(self.tile_size / scale), round(self.overlap / scale))
+        meta = _upload_meta(page.size, text_height)
+        meta["tiles"] = len(tiles)
+        return page, region, tiles, meta
+
+    def _merge(self, image, page, region, tiles, meta, results):
+        if len(results) == 1:
+            text, layout = results[0]
+            layout.meta = {**layout.meta, "tiles": 1}
+        else:
+            text, layout = ocr_tiles.stitch([layout for _, layout in results], tiles, page.size)
+            layout.meta = meta
+        if region:
+            layout = layout.remap(region, image.size)
+        confidence = float(np.nanmean(layout.confidence)) if len(layout) else None
+        return text, confidence, layout
+
+    def _recognize(self, image, crop_table=None, resize=True):
+        if not resize:
+            # 크기를 맞춘 조각은 나누지 않고 기본 엔진에 그대로 보냄
+            result = self.base.recognize_with_layout(image, crop_table, False)
+            return self._merge(image, image, None, None, {}, [result])
+        page, region, tiles, meta = self._plan(image, crop_table)
+        if len(tiles) == 1:
+            result = self.base.recognize_with_layout(page, False)
+            return self._merge(image, page, region, tiles, meta, [result])
+        futures = [self._executor.submit(self.base.recognize_with_layout, page.crop(tile), False) for tile in tiles]
+        try:
+            results = [future.result() for future in futures]
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+        return self._merge(image, page, region, tiles, meta, results)
+
+    async def _recognize_async(self, image, crop_table=None, resize=True):
+        if not resize:
+            result = await self.base.recognize_with_layout_async(image, crop_table, False)
+            return self._merge(image, image, None, None, {}, [result])
+        page, region, tiles, meta = await asyncio.to_thread(self._plan, image, crop_table)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(tile):
+            async with semaphore:
+                tile_image = await asyncio.to_thread(page.crop, tile)
+                return await self.base.recognize_with_layout_async(tile_image, False)
+
+        results = await asyncio.gather(*(run(tile) for tile in tiles))
+        return await asyncio.to_thread(self._merge, image, page, region, tiles, meta, results)
+
+
+# 엔진 레지스트리
+OCR_ENGINES = {}
+
+
+def register_engine(engine):
+    """엔진 등록 (같은 이름이면 교체)"""
+    OCR_ENGINES[engine.name] = engine
+    return engine
+
+
+register_engine(UpstageEngine())
+register_engine(TesseractEngine())
+register_engine(HedgedEngine())
+register_engine(TiledEngine())
+
+
+def get_engine(name=None):
+    """이름으로 엔진 조회 - 미지정 시 OCR_ENGINE 설정값 사용"""
+    name = name or OCR_CONFIG["OCR_ENGINE"]
+    if name not in OCR_ENGINES:
+        raise ValueError(f"알 수 없는 OCR 엔진: {name} (사용 가능: {', '.join(OCR_ENGINES)})")
+    return OCR_ENGINES[name]
+
+
+def available_engines():
+    """현재 환경에서 사용 가능한 엔진 이름 목록"""
+    return [name for name, engine in OCR_ENGINES.items() if engine.is_available()]
+
+
+def engine_stats():
+    """엔진별 통계 요약"""
+    return {name: engine.snapshot() for name, engine in OCR_ENGINES.items()}
@@ -0,0 +1,179 @@
+# 신뢰도 낮은 단어 선택적 재인식
+# 약품 표 안에서 신뢰도가 기준보다 낮은 단어만 잘라 확대한 뒤 다시 OCR하여 텍스트와 좌표에 반영
+# 사진 전체를 다시 올리는 대신 작은 조각 몇 개만 업로드함
+# 조각은 OCR_REFINE_TEXT_HEIGHT로 확대해 두었으므로 엔진의 글자 높이 기반 축소 없이 그대로 보냄
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import ocr_engines
+import prescription_table
+from config import get_ocr_config
+
+OCR_CONFIG = get_ocr_config()
+
+# 페이지 텍스트의 공백 기준 토큰
+TOKEN_PATTERN = re.compile(r"\S+")
+
+
+def low_confidence_words(layout, threshold=None, max_words=None):
+    """약품 표(머리글을 찾지 못하면 전체) 안에서 신뢰도가 기준 미만인 단어 인덱스 - 신뢰도 낮은 순으로 최대 max_words개"""
+    threshold = threshold if threshold is not None else OCR_CONFIG["OCR_REFINE_THRESHOLD"]
+    max_words = max_words or OCR_CONFIG["OCR_REFINE_MAX_WORDS"]
+    if layout is None or not len(layout):
+        return []
+    section = [index for _, row, _ in prescription_table.iter_table_rows(layout) for index in row]
+    candidates = np.asarray(section, dtype=np.int64) if section else np.arange(len(layout))
+    # 신뢰도가 없는(NaN) 단어는 비교 결과가 False라 제외됨
+    low = candidates[layout.confidence[candidates] < threshold]
+    low = low[np.argsort(layout.confidence[low], kind="stable")]
+    return low[:max_words].tolist()
+
+
+def crop_word(image, box, text_height=None):
+    """단어 영역을 여백과 함께 잘라 글자 높이가 text_height가 되도록 확대 (최대 4배)"""
+    text_height = text_height or OCR_CONFIG["OCR_REFINE_TEXT_HEIGHT"]
+    width, height = image.size
+    x0, y0, x1, y1 = box[0] * width, box[1] * height, box[2] * width, box[3] * height
+    word_height = max(1.0, y1 - y0)
+    pad = word_height / 2
+    region = (max(0, int(x0 - pad)), max(0, int(y0 - pad)),
+              min(width, int(x1 + pad) + 1), min(height, int(y1 + pad) + 1))
+    crop = image.crop(region)
+    scale = min(4.0, text_height / word_height)
+    if scale > 1:
+        crop = crop.resize((round(crop.size[0] * scale), round(crop.size[1] * scale)), Image.BICUBIC)
+    return crop
+
+
+def _improved(result, old_confidence):
+    """재인식 결과가 기존보다 신뢰도가 높으면 (텍스트, 신뢰도), 아니면 None"""
+    if result is None:
+        return None
+    text, layout = result
+    if layout is None or not len(layout):
+        return None
+    words = [word for word, _, _, _ in layout.words()]
+    confidences = [confidence for _, _, confidence, _ in layout.words() if confidence is not None]
+    new_text = " ".join(words).strip()
+    if not new_text or not confidences:
+        return None
+    new_confidence = min(confidences)
+    if new_confidence <= old_confidence:
+        return None
+    return new_text, new_confidence
+
+
+def merge_text(text, layout, replacements):
+    """페이지 텍스트에서 바뀐 단어만 교체
+
+    텍스트를 공백 기준 토큰으로 나누고 단어 순서대로 같은 토큰을 앞에서부터 짝지어 교체할 토큰을 찾음
+    (부분 문자열로 찾으면 "1"이 "643504311" 안에서 잡히는 식으로 다른 토큰을 고치게 됨)
+    """
+    tokens = {}
+    for match in TOKEN_PATTERN.finditer(text):
+        tokens.setdefault(match.group(), []).append((match.start(), match.end()))
+    # 토큰별로 다음에 짝지을 위치 (이미 짝지은 토큰은 다시 쓰지 않음)
+    cursors = {}
+    spans = []
+    last = -1
+    for index in range(len(layout)):
+        word = layout.word(index)
+        positions = tokens.get(word)
+        if not positions:
+            continue
+        # 앞 단어와 짝지은 토큰 뒤에서 같은 토큰을 찾음 (텍스트에만 있는 토큰은 건너뜀)
+        cursor = cursors.get(word, 0)
+        while cursor < len(positions) and positions[cursor][0] <= last:
+            cursor += 1
+        if cursor == len(positions):
+            continue
+        cursors[word] = cursor + 1
+        start, end = positions[cursor]
+        last = start
+        if index in replacements:
+            spans.append((start, end, replacements[index][0]))
+
+    parts = []
+    cursor = 0
+    for start, end, new_word in spans:
+        parts.append(text[cursor:start])
+        parts.append(new_word)
+        cursor = end
+    parts.append(text[cursor:])
+    return "".join(parts)
+
+
+def _plan(image, layout, engine_name):
+    """(재인식 엔진, 단어 인덱스 목록, 잘라낸 이미지 목록) - 재인식할 단어가 없으면 None"""
+    # 단일 이미지 결과만 처리 (문서는 페이지 이미지를 다시 래스터화해야 하므로 제외)
+    if not OCR_CONFIG["OCR_REFINE_ENABLED"] or layout is None or not len(layout) or layout.page.max() > 0:
+        return None
+    indices = low_confidence_words(layout)
+    if not indices:
+        return None
+    engine = ocr_engines.get_engine(OCR_CONFIG["OCR_REFINE_ENGINE"] or engine_name)
+    return engine, indices, [crop_word(image, layout.boxes[index]) for index in indices]
+
+
+def _apply(text, layout, indices, results):
+    replacements = {}
+    for index, result in zip(indices, results):
+        improved = _improved(result, float(layout.confidence[index]))
+        if improved is not None:
+            replacements[index] = improved
+    if not replacements:
+        layout.meta["refine"] = {"attempted": len(indices), "replaced": []}
+        return text, layout
+    refined = layout.replace_words(replacements)
+    refined.meta["refine"] = {
+        "attempted": len(indices),
+        "replaced": [
+            {"before": layout.word(index), "after": new_text, "confidence": round(new_confidence, 3)}
+            for index, (new_text, new_confidence) in replacements.items()
+        ],
+    }
+    return merge_text(text, layout, replacements), refined
+
+
+def refine(image, text, layout, engine_name=None):
+    """약품 표의 신뢰도 낮은 단어를 확대하여 다시 OCR하고 (텍스트, OcrLayout)에 반영
+
+    재인식 실패는 무시하고 원래 결과를 유지함
+    """
+    plan = _plan(image, layout, engine_name)
+    if plan is None:
+        return text, layout
+    engine, indices, crops = plan
+
+    def recognize(crop):
+        try:
+            return engine.recognize_with_layout(crop, False, resize=False)
+        except Exception as e:
+            print(f"OCR 재인식 중 오류 발생: {str(e)}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(len(crops), OCR_CONFIG["OCR_POOL_SIZE"])) as executor:
+        results = list(executor.map(recognize, crops))
+    return _apply(text, layout, indices, results)
+
+
+async def refine_async(image, text, layout, engine_name=None):
+    """비동기 버전 (FastAPI용)"""
+    plan = await asyncio.to_thread(_plan, image, layout, engine_name)
+    if plan is None:
+        return text, layout
+    engine, indices, crops = plan
+
+    async def recognize(crop):
+        try:
+            return await engine.recognize_with_layout_async(crop, False, resize=False)
+        except Exception as e:
+            print(f"OCR 재인식 중 오류 발생: {str(e)}")
+            return None
+
+    results = await asyncio.gather(*(recognize(crop) for crop in crops))
+    return _apply(text, layout, indices, results)
@@ -0,0 +1,207 @@
+# 처방전 약품 표 복원
+# OCR 단어 좌표를 줄(행)과 열(코드/명칭/1회 투약량/1일 투여횟수/총 투약일수)로 묶어
+# 정규식으로 전체 텍스트를 반복 탐색하는 대신 열 단위로 약품 정보를 읽음
+import re
+from collections import namedtuple
+
+import numpy as np
+
+# 표 한 행 (숫자 열은 읽지 못하면 None)
+MedicationRow = namedtuple(
+    "MedicationRow", ["code", "name", "dose", "times_per_day", "days", "confidence", "page"])
+
+# 열 이름 -> 머리글 단어에 포함되는 키워드
+COLUMN_KEYWORDS = {
+    "code": ("코드",),
+    "name": ("명칭",),
+    "dose": ("투약량", "투여량"),
+    "times_per_day": ("횟수",),
+    "days": ("일수",),
+}
+
+# 약품 표가 끝나는 줄
+TABLE_END_KEYWORDS = ("동일성분", "주사제")
+
+CODE_PATTERN = re.compile(r"\(?\s*(\d{8,9})\s*\)?")
+NUMBER_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(?:\s*/\s*(\d+))?")
+LETTER_PATTERN = re.compile(r"[가-힣A-Za-z]")
+
+
+def group_rows(layout, page):
+    """한 페이지의 단어를 세로 위치로 묶어 행 목록 반환 - 각 행은 x 순서로 정렬된 단어 인덱스 배열
+
+    세로 중심으로 한 번 정렬한 뒤 앞에서부터 한 번만 훑으며, 단어 높이 중앙값의 절반 이내면 같은 행으로 봄
+    """
+    indices = np.flatnonzero(layout.page == page)
+    if not len(indices):
+        return []
+    boxes = layout.boxes[indices]
+    centers = (boxes[:, 1] + boxes[:, 3]) / 2
+    tolerance = float(np.median(boxes[:, 3] - boxes[:, 1])) / 2
+
+    order = np.argsort(centers, kind="stable")
+    rows = []
+    start = 0
+    row_sum = centers[order[0]]
+    for position in range(1, len(order) + 1):
+        if position < len(order):
+            center = centers[order[position]]
+            if center - row_sum / (position - start) <= tolerance:
+                row_sum += center
+                continue
+        row = order[start:position]
+        rows.append(indices[row[np.argsort(boxes[row, 0], kind="stable")]])
+        if position < len(order):
+            start, row_sum = position, centers[order[position]]
+    return rows
+
+
+def _row_text(layout, row):
+    return "".join(layout.word(index) for index in row)
+
+
+def _column_of(word):
+    """머리글 단어가 가리키는 열 이름 (키워드가 없으면 None)"""
+    for column, keywords in COLUMN_KEYWORDS.items():
+        if any(keyword in word for keyword in keywords):
+            return column
+    return None
+
+
+def _header_spans(layout, row):
+    """머리글 행에서 {열 이름: (왼쪽 x, 오른쪽 x)}
+
+    글자 간격 정도로 붙어 있는 단어('1회' '투약량', '처방' '의약품의' '명칭')는 한 머리글로 합쳐 범위를 넓힘
+    (키워드가 있는 단어끼리는 합치지 않음)
+    """
+    boxes = layout.boxes
+    phrases = []
+    for index in row:
+        word = layout.word(index)
+        column = _column_of(word)
+        char_width = float(boxes[index, 2] - boxes[index, 0]) / max(1, len(word))
+        if phrases:
+            phrase = phrases[-1]
+            gap = float(boxes[index, 0]) - phrase["right"]
+            if gap <= 1.5 * max(char_width, phrase["char_width"]) and not (column and phrase["column"]):
+                phrase["right"] = max(phrase["right"], float(boxes[index, 2]))
+                phrase["column"] = phrase["column"] or column
+                phrase["char_width"] = char_width
+                continue
+        phrases.append({"column": column, "left": float(boxes[index, 0]), "right": float(boxes[index, 2]),
+                        "char_width": char_width})
+    spans = {}
+    for phrase in phrases:
+        if phrase["column"] and phrase["column"] not in spans:
+            spans[phrase["column"]] = (phrase["left"], phrase["right"])
+    return spans
+
+
+def find_header(layout, rows):
+    """약품 표 머리글 행 위치와 열 경계 반환 - (마지막 머리글 행 번호, [(열 이름, 왼쪽 경계 x)] x 순서)
+
+    머리글이 두 줄로 나뉜 경우(예: '1회' / '투약량')를 위해 다음 행의 키워드도 함께 확인함
+    열 경계는 이웃한 두 머리글 사이 빈 곳의 가운데 - 가운데 정렬된 값이 머리글 왼쪽 끝보다 왼쪽에 있어도 같은 열로 읽음
+    """
+    for position, row in enumerate(rows):
+        if "명칭" not in _row_text(layout, row):
+            continue
+        spans = _header_spans(layout, row)
+        if position + 1 < len(rows):
+            extra = _header_spans(layout, rows[position + 1])
+            if extra:
+                spans = {**extra, **spans}
+                position += 1
+        # '명칭'이 여러 단어로 나뉘어 인식되면 표 왼쪽 끝부터 첫 머리글까지를 명칭 열로 봄
+        if "name" not in spans:
+            first = min((left for left, _ in spans.values()), default=0.0)
+            spans["name"] = (0.0, first)
+        ordered = sorted(spans.items(), key=lambda span: span[1][0])
+        columns = [(ordered[0][0], ordered[0][1][0])]
+        for (_, (_, previous_right)), (name, (left, _)) in zip(ordered, ordered[1:]):
+            columns.append((name, (previous_right + left) / 2))
+        return position, columns
+    return None, []
+
+
+def parse_number(text):
+    """'1', '0.5', '1/2', '7일' 같은 투약 숫자 읽기 - 없으면 None"""
+    match = NUMBER_PATTERN.search(text)
+    if not match:
+        return None
+    value = float(match.group(1))
+    if match.group(2):
+        denominator = float(match.group(2))
+        value = value / denominator if denominator else None
+    return value
+
+
+def _split_cells(layout, row, columns):
+    """행의 단어를 가운데 x가 속한 열로 나눔 (열 경계는 find_header 기준)"""
+    names = [name for name, _ in columns]
+    edges = np.array([left for _, left in columns[1:]], dtype=np.float32)
+    centers = (layout.boxes[row, 0] + layout.boxes[row, 2]) / 2
+    slots = np.searchsorted(edges, centers, side="right")
+    cells = {}
+    for index, slot in zip(row, slots):
+        cells.setdefault(names[slot], []).append(layout.word(index))
+    return {name: " ".join(words) for name, words in cells.items()}
+
+
+def _make_row(layout, row, cells, page):
+    name = cells.get("name", "")
+    code = cells.get("code", "")
+    code_match = CODE_PATTERN.search(code or name)
+    if code_match:
+        code = code_match.group(1)
+        if not cells.get("code"):
+            name = name[:code_match.start()] + name[code_match.end():]
+    else:
+        code = None
+    name = name.strip()
+    if len(LETTER_PATTERN.findall(name)) < 2:
+        return None
+
+    dose = parse_number(cells.get("dose", ""))
+    times_per_day = parse_number(cells.get("times_per_day", ""))
+    days = parse_number(cells.get("days", ""))
+    if code is None and dose is None and times_per_day is None and days is None:
+        return None
+    confidences = layout.confidence[row]
+    confidences = confidences[~np.isnan(confidences)]
+    confidence = float(confidences.min()) if len(confidences) else None
+    return MedicationRow(code, name, dose, times_per_day, days, confidence, page)
+
+
+def iter_table_rows(layout):
+    """약품 표 본문 행 순회 - (페이지, 단어 인덱스 배열, 열 경계)
+
+    다음 페이지에 머리글이 없으면 앞 페이지의 열 경계를 이어서 사용함
+    """
+    if layout is None or not len(layout):
+        return
+    columns = []
+    for page in range(int(layout.page.max()) + 1):
+        rows = group_rows(layout, page)
+        header, page_columns = find_header(layout, rows)
+        if page_columns:
+            columns = page_columns
+            rows = rows[header + 1:]
+        if not columns:
+            continue
+        for row in rows:
+            if any(keyword in _row_text(layout, row) for keyword in TABLE_END_KEYWORDS):
+                # 표가 끝났으므로 다음 페이지는 새 머리글이 있어야 읽음
+                columns = []
+                break
+            yield page, row, columns
+
+
+def read_medication_table(layout):
+    """OCR 단어 좌표에서 약품 표 행 목록 반환 - 머리글을 찾지 못하면 빈 목록"""
+    result = []
+    for page, row, columns in iter_table_rows(layout):
+        medication = _make_row(layout, row, _split_cells(layout, row, columns), page)
+        if medication is not None:
+            result.append(medication)
+    return result
@@ -0,0 +1,5 @@
+# 저장소 루트 모듈(image_deskew, ocr_refine 등)을 테스트에서 바로 import
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
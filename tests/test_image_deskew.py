@@ -0,0 +1,43 @@
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+import image_deskew
+
+
+def dense_page(seed, width=1600, height=2200):
+    """글자 덩어리(검은 사각형)가 빽빽한 합성 처방전 페이지"""
+    rng = random.Random(seed)
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for y in range(60, height - 60, 30):
+        x = 60
+        while x < width - 60:
+            word = rng.randint(20, 120)
+            draw.rectangle([x, y, min(x + word, width - 60), y + 18], fill=0)
+            x += word + rng.randint(10, 30)
+    return image
+
+
+def rotated(image, angle):
+    return image.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("angle", [0.5, -0.5, 1.5, -1.5, 3.2, -3.2])
+def test_estimate_skew_dense_page(seed, angle):
+    estimated, timeout = image_deskew.estimate_skew(rotated(dense_page(seed), angle), max_angle=10, budget_ms=10000)
+    assert not timeout
+    # image.rotate(각도)로 바로잡히는 각도이므로 회전한 각도와 부호가 반대
+    assert estimated == pytest.approx(-angle, abs=0.3)
+
+
+def test_estimate_skew_straight_page():
+    estimated, _ = image_deskew.estimate_skew(dense_page(0), max_angle=10, budget_ms=10000)
+    assert estimated == 0.0
+
+
+def test_estimate_skew_clamped_to_max_angle():
+    estimated, _ = image_deskew.estimate_skew(rotated(dense_page(0), 3.2), max_angle=2, budget_ms=10000)
+    assert abs(estimated) <= 2
@@ -0,0 +1,76 @@
+import io
+
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+import image_preprocess
+
+LINE = "643504311 NOVASC 10MG 1 30"
+
+
+def table_crop(font_size, rows, ruled=True, width=900):
+    """약품 표 조각 렌더링 - (이미지, 글자 높이 px) (대문자/숫자만 써서 잉크 높이가 글자 높이)"""
+    font = ImageFont.load_default(size=font_size)
+    left, top, right, bottom = font.getbbox(LINE)
+    row = (bottom - top) * 2
+    image = Image.new("L", (width, row * rows + 20), 255)
+    draw = ImageDraw.Draw(image)
+    for index in range(rows):
+        draw.text((30, 10 + index * row + row // 4 - top), LINE, font=font, fill=0)
+    if ruled:
+        for index in range(rows + 1):
+            draw.line((0, 10 + index * row, width, 10 + index * row), fill=0, width=3)
+        for x in (10, 380, width - 10):
+            draw.line((x, 10, x, 10 + rows * row), fill=0, width=3)
+    return image, bottom - top
+
+
+@pytest.mark.parametrize("rows", [1, 2, 4])
+@pytest.mark.parametrize("ruled", [True, False])
+def test_estimate_text_height_on_short_table_crop(rows, ruled):
+    image, text_height = table_crop(60, rows, ruled)
+    assert image_preprocess.estimate_text_height(image) == pytest.approx(text_height, rel=0.1)
+
+
+def test_estimate_text_height_keeps_stems_next_to_vertical_rules():
+    font = ImageFont.load_default(size=50)
+    image = Image.new("L", (700, 200), 255)
+    draw = ImageDraw.Draw(image)
+    draw.text((40, 20), "NOVASC 10MG", font=font, fill=0)
+    draw.text((40, 110), "ATOREN 20MG", font=font, fill=0)
+    for x in (20, 600):
+        draw.line((x, 0, x, 200), fill=0, width=4)
+    left, top, right, bottom = font.getbbox("NOVASC 10MG")
+    assert image_preprocess.estimate_text_height(image) == pytest.approx(bottom - top, rel=0.1)
+
+
+def test_short_table_crop_is_downscaled_to_min_text_height():
+    image, text_height = table_crop(60, 2)
+    (width, _), estimated = image_preprocess.ocr_target_size(image, min_text_height=20)
+    assert estimated == pytest.approx(text_height, rel=0.1)
+    assert width == pytest.approx(image.size[0] * 20 / text_height, rel=0.1)
+
+
+def phone_photo(size=(4000, 3000), font_size=60):
+    """글자 높이가 font_size 정도인 큰 JPEG 사진 바이트"""
+    font = ImageFont.load_default(size=font_size)
+    image = Image.new("L", size, 235)
+    draw = ImageDraw.Draw(image)
+    for y in range(200, size[1] - 200, font_size * 2):
+        draw.text((200, y), LINE, font=font, fill=20)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def test_open_image_decodes_phone_photo_at_upload_resolution():
+    data = phone_photo()
+    assert image_preprocess.open_image(data, 3000, "L", adaptive=False).size == (4000, 3000)
+    image = image_preprocess.open_image(data, 3000, "L", adaptive=True)
+    assert image.size == (2000, 1500)
+    # 업로드 해상도(글자 20px 이상)는 디코딩한 이미지 안에 있음
+    assert image_preprocess.ocr_target_size(image, min_text_height=20)[1] >= 20
+
+
+def test_open_image_keeps_original_for_tiled_engine():
+    assert image_preprocess.open_image(phone_photo(), 0, "L", adaptive=True).size == (4000, 3000)
@@ -0,0 +1,29 @@
+import pytest
+
+import drug_index
+import medication_extraction
+from benchmarks import extraction_bench
+
+
+@pytest.fixture(autouse=True)
+def no_product_index(monkeypatch):
+    # 제품 사전 인덱스가 있으면 9자리 코드가 사전의 제품명으로 바뀌므로 기존 추출기와 비교할 때는 끔
+    monkeypatch.setattr(drug_index, "_index", False)
+
+
+def test_v1_matches_legacy_fastapi_extractor():
+    extractor = medication_extraction.get_extractor("v1")
+    for text, _ in extraction_bench.corpus(500):
+        assert sorted(extractor.extract(text).medications) == sorted(extraction_bench.legacy_extract(text))
+
+
+@pytest.mark.parametrize("line", [
+    "643504311 (급여)트라센타듀오정5mg 1 1 30",
+    "(1) 크로미나정 625mg 1 1 7",
+    "643504311 노바人크정1.5mg 1 1 30",
+    "(2) 피오글리치 1 1 7",
+])
+def test_v1_keeps_legacy_corrections(line):
+    text = f"처 방 의 약 품 의 명 칭\n{line}\n동일성분 중복처방 사유"
+    medications = medication_extraction.extract_medications(text, version="v1")
+    assert sorted(medications) == sorted(extraction_bench.legacy_extract(text))
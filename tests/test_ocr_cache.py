@@ -0,0 +1,55 @@
+import ocr_cache
+
+
+def make_cache(tmp_path, max_bytes=10_000, ttl=3600):
+    return ocr_cache.OcrCache(str(tmp_path / "cache.sqlite3"), max_bytes, ttl)
+
+
+def test_put_image_hashes_twice_keeps_one_tree_node(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("upstage:a", "text")
+    cache.put_image_hashes("upstage:a", (0b1010, 0b1100))
+    cache.find_similar((0b1010, 0b1100), "upstage", 4)
+    cache.put_image_hashes("upstage:a", (0b1010, 0b1100))
+    assert cache.find_similar((0b1010, 0b1100), "upstage", 4) == ["upstage:a"]
+    assert cache._tree.size == 1
+
+
+def test_evicted_entries_leave_the_tree(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=40)
+    for index in range(10):
+        key = f"upstage:{index}"
+        cache.put(key, "x" * 10)
+        cache.put_image_hashes(key, (index, index))
+        cache.find_similar((index, index), "upstage", 0)
+    rows = cache._connect().execute("SELECT COUNT(*) FROM image_hashes").fetchone()[0]
+    assert rows < 10
+    assert cache._tree.size == rows
+
+
+def test_get_similar_skips_evicted_candidate_and_counts_once(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("upstage:near", "near")
+    cache.put("upstage:far", "far")
+    cache.put_image_hashes("upstage:near", (0b1, 0b1))
+    cache.put_image_hashes("upstage:far", (0b111, 0b111))
+    # 다른 워커가 가장 가까운 항목을 지운 것처럼 항목만 삭제 (해시 행은 남음)
+    cache._connect().execute("DELETE FROM entries WHERE key = 'upstage:near'")
+
+    assert cache.find_similar((0, 0), "upstage", 4) == ["upstage:near", "upstage:far"]
+    assert cache.get_similar((0, 0), "upstage", 4) == "far"
+    stats = cache.stats()
+    assert stats["similar_hits"] == 1
+    assert stats["hits"] == 0
+    assert stats["misses"] == 0
+
+
+def test_ocr_namespace_changes_with_result_settings(monkeypatch):
+    base = ocr_cache.ocr_namespace("upstage")
+    assert base.startswith("upstage:")
+    assert ocr_cache.ocr_namespace("upstage") == base
+    for name, value in (("OCR_ROI_CROP", True), ("OCR_DESKEW", False), ("OCR_REFINE_ENABLED", False),
+                        ("OCR_MAX_SIDE", 1234), ("OCR_UPLOAD_FORMAT", "png")):
+        with monkeypatch.context() as patch:
+            patch.setitem(ocr_cache.OCR_CONFIG, name, value)
+            assert ocr_cache.ocr_namespace("upstage") != base, name
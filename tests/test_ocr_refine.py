@@ -0,0 +1,56 @@
+from PIL import Image
+
+from ocr_layout import OcrLayout
+
+import ocr_engines
+import ocr_refine
+
+
+def layout_of(words):
+    return OcrLayout.from_words([(word, (0, 0, 1, 1), 0.9, 0) for word in words], [(1, 1)])
+
+
+def test_merge_text_replaces_whole_token_only():
+    layout = layout_of(["643504311", "노바스크정", "1"])
+    merged = ocr_refine.merge_text("643504311 노바스크정 1", layout, {2: ("7", 0.99)})
+    assert merged == "643504311 노바스크정 7"
+
+
+def test_merge_text_repeated_word_uses_word_order():
+    layout = layout_of(["1", "노바스크정", "1", "30"])
+    merged = ocr_refine.merge_text("1 노바스크정\n1 30", layout, {2: ("2", 0.99)})
+    assert merged == "1 노바스크정\n2 30"
+
+
+def test_merge_text_skips_tokens_missing_from_layout():
+    layout = layout_of(["아토렌정", "1"])
+    merged = ocr_refine.merge_text("처방 아토렌정 10 1", layout, {1: ("3", 0.99)})
+    assert merged == "처방 아토렌정 10 3"
+
+
+class RecordingEngine(ocr_engines.OcrEngine):
+    name = "recording"
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def _recognize(self, image, crop_table=None, resize=True):
+        self.calls.append((image.size, crop_table, resize))
+        return "", None, None
+
+
+def test_refine_sends_crops_without_adaptive_resize(monkeypatch):
+    engine = RecordingEngine()
+    monkeypatch.setitem(ocr_engines.OCR_ENGINES, engine.name, engine)
+    monkeypatch.setitem(ocr_refine.OCR_CONFIG, "OCR_REFINE_ENGINE", "")
+    layout = OcrLayout.from_words([("노바人크정", (0.1, 0.4, 0.5, 0.45), 0.3, 0)], [(1000, 1000)])
+    ocr_refine.refine(Image.new("L", (1000, 1000), 255), "노바人크정", layout, engine.name)
+    assert [(crop_table, resize) for _, crop_table, resize in engine.calls] == [(False, False)]
+
+
+def test_upstage_upload_keeps_refine_crop_size():
+    crop = Image.new("L", (640, 96), 255)
+    _, region, meta = ocr_engines.UpstageEngine()._prepare(crop, False, resize=False)
+    assert region is None
+    assert meta["upload_size"] == [640, 96]
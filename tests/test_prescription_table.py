@@ -0,0 +1,44 @@
+import pytest
+
+import prescription_table
+from ocr_layout import OcrLayout
+
+CHAR_WIDTH = 0.012
+
+
+def words_at(y, placements):
+    """[(텍스트, 왼쪽 x)] -> OcrLayout.from_words 입력 (글자 수에 비례한 너비)"""
+    return [(text, (x, y, x + len(text) * CHAR_WIDTH, y + 0.02), 0.95, 0) for text, x in placements]
+
+
+def centered(text, center):
+    return text, center - len(text) * CHAR_WIDTH / 2
+
+
+def test_centered_values_under_split_headers():
+    header = words_at(0.10, [
+        ("처방", 0.05), ("의약품의", 0.086), ("명칭", 0.146),
+        ("1회", 0.39), ("투약량", 0.426),
+        ("1일", 0.55), ("투여횟수", 0.586),
+        ("총", 0.70), ("투약일수", 0.724),
+    ])
+    # 값은 머리글 전체('1회 투약량')의 가운데 근처에 있어 뒤쪽 키워드 단어('투약량')의 왼쪽 끝보다 왼쪽에 놓임
+    body = words_at(0.15, [
+        ("643504311", 0.05), ("노바스크정", 0.17),
+        centered("1", 0.42), centered("2", 0.59), centered("30", 0.73),
+    ])
+    layout = OcrLayout.from_words(header + body, [(1000, 1400)])
+
+    rows = prescription_table.read_medication_table(layout)
+
+    assert len(rows) == 1
+    row = rows[0]
+    assert (row.code, row.name) == ("643504311", "노바스크정")
+    assert (row.dose, row.times_per_day, row.days) == (1.0, 2.0, 30.0)
+
+
+def test_header_words_merge_into_one_column_span():
+    header = words_at(0.10, [("명칭", 0.10), ("1회", 0.39), ("투약량", 0.426), ("일수", 0.70)])
+    layout = OcrLayout.from_words(header, [(1000, 1400)])
+    spans = prescription_table._header_spans(layout, prescription_table.group_rows(layout, 0)[0])
+    assert spans["dose"] == pytest.approx((0.39, 0.426 + 3 * CHAR_WIDTH))
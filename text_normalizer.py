@@ -0,0 +1,48 @@
+# OCR 텍스트 줄 단위 정제
+# 전체 텍스트에 정규식을 여러 번 적용해 중간 문자열을 만드는 대신, 줄을 하나씩 꺼내 한 번에 정제하여 생성기로 넘김
+# 줄 구조를 유지하므로 줄 시작에 고정된 약품명 패턴(줄 시작의 번호/약품명)이 그대로 동작함
+# 약품명 추출기, GPT 분석 요청, API 응답이 모두 정제된 전체 텍스트를 쓰므로 normalize_text에서 한 번만 합침
+# (추출기의 약품 영역 탐색과 코드 + 약품명 후보는 줄바꿈을 넘어 이어지므로 줄 단위로 나눠 넘기지 않음)
+import re
+from unicodedata import is_normalized, normalize
+
+LINE_PATTERN = re.compile(r"[^\n]+")
+
+# 남길 문자(단어 문자와 . , ( ) / % -)가 아닌 문자와 공백이 이어진 구간 - 공백 하나로 바꿈
+# (특수문자를 공백으로 바꾼 뒤 연속 공백을 줄이던 두 번의 치환을 한 번에 처리)
+SEPARATOR_PATTERN = re.compile(r"[^\w\.,\(\)\/%-]+")
+
+DIGIT_PATTERN = re.compile(r"\d")
+
+
+def iter_lines(source):
+    """문자열 또는 문자열 묶음(페이지별 OCR 결과 등)에서 줄을 하나씩 반환 - 전체를 나눈 목록을 만들지 않음"""
+    if isinstance(source, str):
+        source = (source,)
+    for chunk in source:
+        for match in LINE_PATTERN.finditer(chunk):
+            yield match.group()
+
+
+def normalize_line(line):
+    """한 줄 정제 - 남길 내용이 없으면 None"""
+    line = SEPARATOR_PATTERN.sub(" ", line).strip()
+    if len(line) <= 1:
+        return None
+    # 숫자나 코드가 포함된 줄은 그대로 두고, 나머지 줄 중 정규화되지 않은 줄만 NFKC (한글 자모 결합 오류 수정)
+    if not DIGIT_PATTERN.search(line) and not is_normalized("NFKC", line):
+        line = normalize("NFKC", line)
+    return line
+
+
+def iter_clean_lines(source):
+    """정제된 줄을 하나씩 반환 (빈 줄과 한 글자 줄은 제외)"""
+    for line in iter_lines(source):
+        line = normalize_line(line)
+        if line:
+            yield line
+
+
+def normalize_text(source):
+    """정제된 줄을 줄바꿈으로 합친 텍스트"""
+    return "\n".join(iter_clean_lines(source))